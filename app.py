@@ -1,12 +1,21 @@
 # app.py
+import os
 import streamlit as st
 import datetime
 import pandas as pd
 import plotly.express as px
+from concurrent.futures import ThreadPoolExecutor
 from rag import (
-    load_vector_store, query_kb, ask_llm, 
-    categorize_ticket, save_ticket_to_sheets, assign_agent, sheet
+    load_vector_store, retrieve_kb, ask_llm_stream,
+    triage_ticket, save_ticket_to_sheets,
+    get_customer_history, get_response_cache, find_similar_tickets,
+    get_dashboard_metrics, find_duplicate
 )
+import telemetry
+from resources import get_ticket_queue
+from dedup import apply_duplicate
+from context_builder import HISTORY_CANDIDATES, assemble_context
+from response_cache import cache_key
 
 # -------------------------------
 # Streamlit page config
@@ -14,8 +23,13 @@ from rag import (
 st.set_page_config(page_title="Smart Support Ticket System", layout="wide")
 st.title("📩 Smart Support & Ticket Resolution System")
 
-# Load vector store
-vectorstore = load_vector_store()
+# "inline": run the pipeline in the session (streams the response)
+# "queue": enqueue and return at once; ticket_queue.py workers process tickets
+INTAKE_MODE = os.getenv("TICKET_INTAKE", "inline")
+
+# Optional Prometheus endpoint (TELEMETRY_ENABLED=1, TELEMETRY_METRICS_PORT=<port>);
+# started once per process, Streamlit reruns are no-ops
+telemetry.start_metrics_server()
 
 # -------------------------------
 # Sidebar Menu
@@ -43,36 +57,6 @@ if menu == "Submit Ticket":
 
     if submit_button:
         ticket_id = f"TK-{int(datetime.datetime.now().timestamp())}"
-
-        # Step 1: Retrieve RAG context
-        kb_context = query_kb(ticket_description, vectorstore)
-
-        # Step 2: Include previous tickets of same user
-        historical_data = sheet.get_all_records()
-        historical_tickets = pd.DataFrame(historical_data)
-        history_context = ""
-        if not historical_tickets.empty:
-            customer_history = historical_tickets[historical_tickets['customer_email'] == customer_email]
-            if not customer_history.empty:
-                history_context = "\n".join([
-                    f"Subject: {row['ticket_subject']}, Description: {row['ticket_description']}, Status: {row['ticket_status']}"
-                    for _, row in customer_history.iterrows()
-                ])
-
-        # Step 3: Combine KB + history
-        full_context = f"{kb_context}\n\nPrevious Tickets:\n{history_context}" if history_context else kb_context
-
-        # Step 4: Generate LLM resolution
-        resolution = ask_llm(ticket_description, full_context)
-
-        # Step 5: Categorize ticket
-        cat_info = categorize_ticket(ticket_subject, ticket_description)
-
-        # Step 6: Assign agent
-        agent = assign_agent(cat_info["category"], ticket_description, context=full_context)
-
-        # Step 7: Prepare ticket data
-        first_response_time = datetime.datetime.now()
         ticket_data = {
             "ticket_id": ticket_id,
             "customer_name": customer_name,
@@ -84,29 +68,134 @@ if menu == "Submit Ticket":
             "ticket_type": "Support",
             "ticket_subject": ticket_subject,
             "ticket_description": ticket_description,
-            "ticket_status": cat_info["status"],
-            "resolution": resolution,
-            "ticket_priority": cat_info["priority"],
+            "ticket_status": "",
+            "resolution": "",
+            "ticket_priority": "",
             "ticket_channel": "Web",
-            "first_response_time": first_response_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "first_response_time": "",
             "customer_satisfaction_rating": "",
-            "assigned_agent": agent,
+            "assigned_agent": "",
             "time_to_resolution": ""
         }
 
-        # Step 8: Save to Google Sheets
-        save_ticket_to_sheets(ticket_data)
-        st.session_state.latest_ticket = ticket_data
+        if INTAKE_MODE == "queue":
+            # Return at once; a worker (python ticket_queue.py worker) runs the pipeline
+            get_ticket_queue().enqueue(ticket_data)
+            st.session_state.pending_ticket_id = ticket_id
+            st.session_state.pop("latest_ticket", None)
+        else:
+            # Steps 0-7 are recorded as one ticket trace when telemetry is enabled
+            with telemetry.ticket_trace(ticket_id, source="app"):
+                # Step 0: A resubmission of the customer's open or recent ticket reuses
+                # its resolution, tags and agent instead of running the pipeline;
+                # another customer's near-duplicate is only linked to it
+                duplicate = find_duplicate(ticket_data)
+                if duplicate is not None and apply_duplicate(ticket_data, duplicate):
+                    ticket_data["first_response_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    save_ticket_to_sheets(ticket_data)
+                    st.session_state.latest_ticket = ticket_data
+                    cat_info = {
+                        "category": ticket_data["category"],
+                        "priority": ticket_data["ticket_priority"],
+                        "status": ticket_data["ticket_status"],
+                        "agent": ticket_data["assigned_agent"],
+                    }
+                    agent = cat_info["agent"]
+                    similar_tickets = []
+                    st.subheader("📌 Generated Response")
+                    st.write(ticket_data["resolution"])
+                    st.info(f"🔁 Linked to ticket {ticket_data['duplicate_of']} "
+                            f"({ticket_data['duplicate_reason'].replace('_', ' ')}); its response was reused.")
+                else:
+                    # Step 1: Retrieve RAG context. The vector store is loaded on first
+                    # use (shared across sessions, reloaded only if faiss_store changes)
+                    vectorstore = load_vector_store()
+                    kb_docs = retrieve_kb(ticket_description, vectorstore, product=product_purchased)
+
+                    # Step 2: Include previous tickets of same user (most recent only)
+                    customer_history = get_customer_history(customer_email, limit=HISTORY_CANDIDATES)
 
-        # Step 9: Display results
-        st.success("✅ Ticket submitted successfully!")
-        st.subheader("📌 Generated Response")
-        st.write(resolution)
-        st.subheader("📝 Automatic Tags")
-        st.write(f"Category: {cat_info['category']}")
-        st.write(f"Priority: {cat_info['priority']}")
-        st.write(f"Status: {cat_info['status']}")
-        st.write(f"Assigned Agent: {agent}")
+                    # Step 3: Combine KB + similar resolved tickets + history within the token budget,
+                    # once, for both the resolution and the triage call
+                    similar_tickets = find_similar_tickets(ticket_subject, ticket_description, product_purchased)
+                    full_context = assemble_context(
+                        f"{ticket_subject}\n{ticket_description}",
+                        kb_chunks=[d.page_content for d in kb_docs],
+                        similar_tickets=similar_tickets,
+                        history=customer_history,
+                    )
+
+                    # Step 4: Stream the LLM resolution to the page
+                    # Step 5: Meanwhile, categorize + assign agent in one concurrent LLM call
+                    with ThreadPoolExecutor(max_workers=1) as pool:
+                        triage_future = pool.submit(telemetry.bind(triage_ticket), ticket_subject, ticket_description,
+                                                    full_context, product_purchased)
+                        st.subheader("📌 Generated Response")
+                        resolution = st.write_stream(
+                            ask_llm_stream(ticket_description, full_context, cache=get_response_cache(),
+                                           cache_key=cache_key([d.page_content for d in kb_docs], similar_tickets,
+                                                               customer_history))
+                        )
+                        cat_info = triage_future.result()
+                    agent = cat_info["agent"]
+
+                    # Step 6: Fill in the generated fields
+                    ticket_data.update({
+                        "category": cat_info["category"],
+                        "ticket_status": cat_info["status"],
+                        "resolution": resolution,
+                        "ticket_priority": cat_info["priority"],
+                        "first_response_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "assigned_agent": agent,
+                    })
+
+                    # Step 7: Save to Google Sheets
+                    save_ticket_to_sheets(ticket_data)
+                    st.session_state.latest_ticket = ticket_data
+                    if ticket_data.get("duplicate_of"):
+                        st.info(f"🔗 Linked to ticket {ticket_data['duplicate_of']} from another customer "
+                                "with a similar issue.")
+
+            # Step 8: Display results
+            st.success("✅ Ticket submitted successfully!")
+            st.subheader("📝 Automatic Tags")
+            st.write(f"Category: {cat_info['category']}")
+            st.write(f"Priority: {cat_info['priority']}")
+            st.write(f"Status: {cat_info['status']}")
+            st.write(f"Assigned Agent: {agent}")
+            if similar_tickets:
+                with st.expander("🔎 Similar resolved tickets"):
+                    for t in similar_tickets:
+                        st.write(f"**{t['ticket_subject']}** ({t['product_purchased']}, score {t['score']:.2f}): {t['resolution']}")
+
+    # -------------------------------
+    # Queued Ticket Status
+    # -------------------------------
+    if INTAKE_MODE == "queue" and "pending_ticket_id" in st.session_state:
+        pending_id = st.session_state.pending_ticket_id
+        job = get_ticket_queue().status(pending_id)
+        st.button("🔄 Check status")  # any click reruns the page and re-reads the queue
+
+        if job is None:
+            st.error(f"Ticket {pending_id} was not found in the queue.")
+        elif job["status"] == "done":
+            ticket = job["result"]
+            st.success(f"✅ Ticket {pending_id} processed!")
+            st.subheader("📌 Generated Response")
+            st.write(ticket["resolution"])
+            st.subheader("📝 Automatic Tags")
+            st.write(f"Category: {ticket.get('category', '')}")
+            st.write(f"Priority: {ticket['ticket_priority']}")
+            st.write(f"Status: {ticket['ticket_status']}")
+            st.write(f"Assigned Agent: {ticket['assigned_agent']}")
+            if st.session_state.get("latest_ticket", {}).get("ticket_id") != pending_id:
+                st.session_state.latest_ticket = ticket
+        elif job["status"] == "failed":
+            st.error(f"❌ Ticket {pending_id} could not be processed: {job['error']}")
+        else:
+            waiting = f", {job['position']} ahead in the queue" if job["position"] else ""
+            st.info(f"⏳ Ticket {pending_id} is {job['status']}{waiting}. "
+                    "You can keep using the app; check back for the response.")
 
     # -------------------------------
     # Customer Satisfaction Input
@@ -141,37 +230,42 @@ if menu == "Submit Ticket":
 elif menu == "Dashboard":
     st.subheader("📊 Ticket Overview & Agent Performance")
 
-    # Fetch tickets
-    data = sheet.get_all_records()
-    if not data:
-        st.warning("No tickets found in Google Sheets.")
+    # Read materialized metrics (updated incrementally as tickets are saved)
+    metrics = get_dashboard_metrics()
+    if not metrics["total_tickets"]:
+        st.warning("No tickets found.")
         st.stop()
-    df = pd.DataFrame(data)
 
     # -------------------------------
     # Ticket Overview
     # -------------------------------
     st.markdown("### 🗂 Ticket Overview")
-    st.write(f"Total Tickets: {len(df)}")
+    st.write(f"Total Tickets: {metrics['total_tickets']}")
 
     # Tickets by Status (Closed vs Open)
-    df['ticket_status'] = df['ticket_status'].replace({'In Progress': 'Open'})  # merge In Progress as Open
-    status_counts = df['ticket_status'].value_counts().reindex(['Open', 'Closed'], fill_value=0).reset_index()
-    status_counts.columns = ['ticket_status', 'count']
+    status_totals = {"Open": 0, "Closed": 0}
+    for status, count in metrics["tickets_by_status"].items():
+        status = "Open" if status == "In Progress" else status  # merge In Progress as Open
+        if status in status_totals:
+            status_totals[status] += count
+    status_counts = pd.DataFrame(list(status_totals.items()), columns=['ticket_status', 'count'])
     status_fig = px.pie(status_counts, names='ticket_status', values='count', title='Tickets by Status')
     st.plotly_chart(status_fig, use_container_width=True)
 
     # Tickets by Priority (Low, Medium, High, Critical)
     priority_order = ['Low', 'Medium', 'High', 'Critical']
-    df['ticket_priority'] = pd.Categorical(df['ticket_priority'], categories=priority_order, ordered=True)
-    priority_counts = df['ticket_priority'].value_counts().reindex(priority_order, fill_value=0).reset_index()
-    priority_counts.columns = ['ticket_priority', 'count']
+    priority_counts = pd.DataFrame(
+        [(p, metrics["tickets_by_priority"].get(p, 0)) for p in priority_order],
+        columns=['ticket_priority', 'count']
+    )
     priority_fig = px.bar(priority_counts, x='ticket_priority', y='count', text='count', title='Tickets by Priority')
     st.plotly_chart(priority_fig, use_container_width=True)
 
     # Tickets by Channel
-    channel_counts = df['ticket_channel'].value_counts().reset_index()
-    channel_counts.columns = ['ticket_channel', 'count']
+    channel_counts = pd.DataFrame(
+        sorted(metrics["tickets_by_channel"].items(), key=lambda kv: -kv[1]),
+        columns=['ticket_channel', 'count']
+    )
     channel_fig = px.pie(channel_counts, names='ticket_channel', values='count', title='Tickets by Channel')
     st.plotly_chart(channel_fig, use_container_width=True)
 
@@ -179,11 +273,10 @@ elif menu == "Dashboard":
     # Agent Performance (Selected Roles)
     # -------------------------------
     st.markdown("### 👩‍💼 Agent Performance")
-    df['assigned_agent'] = df['assigned_agent'].fillna('General Support')
     valid_agents = ['Sales', 'Marketing', 'Engineering', 'General Support']
-    df_agents = df[df['assigned_agent'].isin(valid_agents)]
-
-    agent_counts = df_agents['assigned_agent'].value_counts().reindex(valid_agents, fill_value=0).reset_index()
-    agent_counts.columns = ['assigned_agent', 'count']
+    agent_counts = pd.DataFrame(
+        [(a, metrics["tickets_per_agent"].get(a, 0)) for a in valid_agents],
+        columns=['assigned_agent', 'count']
+    )
     tickets_agent_fig = px.bar(agent_counts, x='assigned_agent', y='count', text='count', title='Tickets Assigned per Agent')
     st.plotly_chart(tickets_agent_fig, use_container_width=True)
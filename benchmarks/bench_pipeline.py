@@ -0,0 +1,297 @@
+# benchmarks/bench_pipeline.py
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+import subprocess
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from ticket_csv import TICKETS_CSV, iter_ticket_chunks  # noqa: E402
+from ticket_store import HEADERS  # noqa: E402
+
+# ================================
+# Configuration
+# ================================
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+KB_SOURCES = [os.path.join(REPO_ROOT, "data", "terms.txt")]
+DEFAULT_CONCURRENCY = [1, 4, 8, 16]
+# Fields the pipeline fills in; cleared so every ticket is processed from scratch
+PIPELINE_FIELDS = ["ticket_status", "resolution", "ticket_priority", "first_response_time",
+                   "customer_satisfaction_rating", "assigned_agent"]
+
+
+# ================================
+# Workload
+# ================================
+def load_workload(csv_path, limit, tag=""):
+    """First `limit` tickets of the CSV as new-ticket dicts (IDs suffixed with `tag`)."""
+    tickets = []
+    for chunk in iter_ticket_chunks(csv_path):
+        for row in chunk.to_dict("records"):
+            ticket = {h: row.get(h, "") for h in HEADERS}
+            ticket.update({f: "" for f in PIPELINE_FIELDS})
+            ticket["ticket_id"] = f"{ticket['ticket_id']}{tag}"
+            ticket["ticket_description"] = ticket["ticket_description"].replace(
+                "{product_purchased}", ticket["product_purchased"] or "the product")
+            tickets.append(ticket)
+            if len(tickets) >= limit:
+                return tickets
+    return tickets
+
+
+def install_fakes(args):
+    """
+    Point the process at a scratch directory (tickets.db, cache/) and swap
+    Groq, Sheets and the embedding model for the offline fakes. Must run
+    before rag first touches a shared handle (its getters create them lazily).
+    """
+    os.environ["SHEETS_SYNC_INTERVAL"] = "3600"  # flushes are measured explicitly
+    os.chdir(tempfile.mkdtemp(prefix="ticket-bench-"))
+
+    import resources
+    from llm_client import LLMClient, LLM_MAX_CONCURRENCY
+    from benchmarks.fakes import FakeLLMBackend, FakeWorksheet, fake_embeddings
+
+    worksheet = FakeWorksheet(rows=[HEADERS], latency=args.sheets_latency, error_rate=args.sheets_error_rate,
+                              seed=args.seed)
+    backend = FakeLLMBackend(latency=args.llm_latency, error_rate=args.llm_error_rate, seed=args.seed)
+    llm_client = LLMClient(backend, max_concurrency=args.llm_concurrency or LLM_MAX_CONCURRENCY,
+                           backoff_base=args.llm_latency)
+    resources.override(embeddings=fake_embeddings(), llm_client=llm_client, sheet=worksheet)
+    return worksheet, backend, llm_client
+
+
+# ================================
+# Measurement helpers
+# ================================
+def summarize(samples):
+    """Latency samples (seconds) → count/mean/percentiles in milliseconds."""
+    ms = np.asarray(samples, dtype=float) * 1000
+    if not len(ms):
+        return {"count": 0}
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def timed(samples, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ================================
+# Benchmarks
+# ================================
+def bench_stages(rag, vectorstore, tickets):
+    """Per-stage latency, one ticket at a time."""
+    stages = {name: [] for name in [
+        "query_kb", "ask_llm", "ask_llm_cached", "triage_ticket",
+        "save_ticket_to_sheets", "process_ticket",
+    ]}
+    cache = rag.get_response_cache()
+    for ticket in tickets:
+        description = ticket["ticket_description"]
+        context = timed(stages["query_kb"], rag.query_kb, description, vectorstore)
+        timed(stages["ask_llm"], rag.ask_llm, description, context)
+        rag.ask_llm(description, context, cache=cache)  # warm the entry
+        timed(stages["ask_llm_cached"], rag.ask_llm, description, context, cache=cache)
+        timed(stages["triage_ticket"], rag.triage_ticket, ticket["ticket_subject"], description, context)
+        timed(stages["save_ticket_to_sheets"], rag.save_ticket_to_sheets, dict(ticket, ticket_id=f"{ticket['ticket_id']}-save"))
+        timed(stages["process_ticket"], rag.process_ticket, dict(ticket), vectorstore)
+
+    # Write-behind flush of everything saved above, then the dashboard reads
+    timed(stages.setdefault("sheet_flush", []), rag.get_sheet_syncer().flush)
+    for _ in range(5):
+        timed(stages.setdefault("dashboard_metrics", []), rag.get_dashboard_metrics)
+    for _ in range(5):
+        timed(stages.setdefault("ticket_snapshot", []), rag.load_ticket_snapshot)
+    try:
+        import dashboard
+    except ImportError as e:
+        print(f"⚠️ Skipping dashboard aggregations ({e})")
+    else:
+        df = rag.load_ticket_snapshot()
+        for _ in range(5):
+            timed(stages.setdefault("dashboard_aggregations", []), lambda: (
+                dashboard.ticket_overview_metrics(df), dashboard.agent_performance_metrics(df.copy())))
+    return {name: summarize(samples) for name, samples in stages.items()}
+
+
+def bench_throughput(rag, vectorstore, csv_path, n_tickets, levels, llm_client):
+    """End-to-end process_tickets throughput at each concurrency level."""
+    results = {}
+    for level in levels:
+        tickets = load_workload(csv_path, n_tickets, tag=f"-c{level}")
+        retries_before = llm_client.stats["retries"]
+        start = time.perf_counter()
+        processed = list(rag.process_tickets(tickets, vectorstore, concurrency=level))
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for t in processed if "processing_error" in t)
+        results[str(level)] = {
+            "tickets": len(processed),
+            "seconds": round(elapsed, 3),
+            "tickets_per_sec": round(len(processed) / elapsed, 2),
+            "errors": errors,
+            "llm_retries": llm_client.stats["retries"] - retries_before,
+        }
+        print(f"   concurrency {level:>3}: {results[str(level)]['tickets_per_sec']:8.2f} tickets/s "
+              f"({errors} error(s))")
+    return results
+
+
+def bench_memory(rag, vectorstore, csv_path, n_tickets, concurrency):
+    """Peak Python heap (tracemalloc) for one batch, run separately so tracing does not skew latency."""
+    tickets = load_workload(csv_path, n_tickets, tag="-mem")
+    tracemalloc.start()
+    list(rag.process_tickets(tickets, vectorstore, concurrency=concurrency))
+    rag.get_sheet_syncer().flush()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"tracemalloc_peak_mb": round(peak / 1e6, 2), "max_rss_mb": max_rss_mb()}
+
+
+# ================================
+# Regression comparison
+# ================================
+def compare(current, baseline, tolerance):
+    """Print metric deltas vs a baseline result; returns the list of regressions."""
+    rows, regressions = [], []
+
+    def check(name, new, old, higher_is_better=False, floor=0.0):
+        if new is None or not old:
+            return
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if abs(new - old) < floor:  # sub-millisecond stages are mostly timer noise
+            worse = 0.0
+        flag = "❌" if worse > tolerance else ("✅" if worse < -tolerance else "  ")
+        rows.append(f"{flag} {name:<42} {old:>10.2f} → {new:>10.2f} ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append(name)
+
+    for stage, summary in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        check(f"{stage} p95 ms", summary.get("p95_ms"), old.get("p95_ms"), floor=1.0)
+    for level, result in current["throughput"].items():
+        old = baseline.get("throughput", {}).get(level, {})
+        check(f"throughput @ {level} tickets/s", result["tickets_per_sec"], old.get("tickets_per_sec"), True)
+    check("tracemalloc peak MB", current["memory"]["tracemalloc_peak_mb"],
+          baseline.get("memory", {}).get("tracemalloc_peak_mb"))
+
+    if baseline.get("config") != current["config"]:
+        print("⚠️ Baseline was run with a different configuration; deltas may not be comparable")
+    print(f"📊 Compared with baseline ({baseline.get('commit') or 'unknown commit'}, "
+          f"tolerance {tolerance:.0%}):")
+    for row in rows:
+        print(f"   {row}")
+    return regressions
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the ticket pipeline (fake Groq, Sheets and embeddings).")
+    parser.add_argument("--csv", default=os.path.join(REPO_ROOT, TICKETS_CSV))
+    parser.add_argument("--stage-samples", type=int, default=50, help="Tickets for the per-stage latency pass")
+    parser.add_argument("--tickets", type=int, default=200, help="Tickets per throughput run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Mean fake LLM latency (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM calls failing with 429/503")
+    parser.add_argument("--llm-concurrency", type=int, help="LLMClient concurrency limit (default LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="Fake Sheets request latency (s)")
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0, help="Fraction of Sheets requests failing with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--telemetry", action="store_true", help="Enable tracing (to measure its overhead)")
+    parser.add_argument("--out", help="Result file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression before failing")
+    args = parser.parse_args()
+
+    # Resolve paths before install_fakes() changes into the scratch directory
+    csv_path = os.path.abspath(args.csv)
+    out = os.path.abspath(args.out or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    worksheet, backend, llm_client = install_fakes(args)
+    if args.telemetry:
+        import telemetry
+        telemetry.enable(os.path.join(os.getcwd(), "traces.jsonl"))
+        print(f"📊 Tracing to {telemetry.TRACE_PATH}")
+
+    import rag
+    from resources import get_embeddings
+    from benchmarks.fakes import build_fake_vector_store
+
+    # One-time sheet import, kept out of the timings and free of injected failures
+    worksheet.error_rate, error_rate = 0.0, worksheet.error_rate
+    rag.bootstrap_ticket_store()
+    worksheet.error_rate = error_rate
+    print("⏳ Building in-memory KB index...")
+    vectorstore = build_fake_vector_store(get_embeddings(), KB_SOURCES)
+
+    print(f"⏳ Per-stage latency over {args.stage_samples} ticket(s)...")
+    stages = bench_stages(rag, vectorstore, load_workload(csv_path, args.stage_samples, tag="-stage"))
+    for name, s in stages.items():
+        print(f"   {name:<24} p50 {s['p50_ms']:9.2f} ms   p95 {s['p95_ms']:9.2f} ms   p99 {s['p99_ms']:9.2f} ms")
+
+    print(f"⏳ Throughput over {args.tickets} ticket(s)...")
+    throughput = bench_throughput(rag, vectorstore, csv_path, args.tickets, args.concurrency, llm_client)
+
+    print("⏳ Peak memory...")
+    memory = bench_memory(rag, vectorstore, csv_path, args.tickets, max(args.concurrency))
+    print(f"   tracemalloc peak {memory['tracemalloc_peak_mb']} MB, max RSS {memory['max_rss_mb']} MB")
+
+    result = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "stages": stages,
+        "throughput": throughput,
+        "memory": memory,
+        "calls": {"llm": dict(backend.log.calls), "sheets": dict(worksheet.log.calls), "llm_client": dict(llm_client.stats)},
+    }
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved at '{out}'")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
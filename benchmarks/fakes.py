@@ -0,0 +1,241 @@
+# benchmarks/fakes.py
+import re
+import json
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+from collections import Counter
+
+from llm_client import register_backend
+
+# ================================
+# Offline stand-ins for Groq, Google Sheets and the embedding model
+# ================================
+# Every fake is deterministic for a given seed and input, and injects
+# configurable latency (and optionally errors) so the pipeline can be
+# measured with no network or credentials.
+EMBEDDING_SIZE = 384  # same as all-MiniLM-L6-v2
+
+FAKE_CATEGORIES = ["Billing inquiry", "Technical issue", "Refund request", "Product inquiry", "Cancellation request"]
+FAKE_PRIORITIES = ["Low", "Medium", "High", "Critical"]
+FAKE_AGENTS = ["Sales", "Marketing", "Engineering", "General Support"]
+
+
+def stable_fraction(*parts):
+    """Deterministic float in [0, 1) for the given parts."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+class FakeAPIError(Exception):
+    """Shaped like groq/gspread HTTP errors: status_code plus response.status_code/headers."""
+
+    def __init__(self, status_code, message="injected failure"):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={})
+
+
+class CallLog:
+    """Thread-safe per-method call counter shared by the fakes."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name):
+        with self._lock:
+            self.calls[name] += 1
+            return self.calls[name]
+
+
+# ================================
+# Fake LLM backend
+# ================================
+class FakeLLMBackend:
+    """
+    Groq-shaped chat completions with injected latency and errors.
+    Latency is `latency` seconds ± `jitter` (as a fraction), derived from a
+    hash of the prompt so the same workload sees the same delays. A fraction
+    `error_rate` of calls raises a retryable 429/503 FakeAPIError.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.5, error_rate=0.0, seed=0, stream_chunks=8):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stream_chunks = stream_chunks
+        self.log = CallLog()
+
+    def _delay(self, key):
+        return max(0.0, self.latency * (1 + self.jitter * (2 * stable_fraction(self.seed, "latency", key) - 1)))
+
+    def create(self, messages, model, stream=False, **kwargs):
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        call = self.log.record("create")
+        time.sleep(self._delay(prompt))
+        if self.error_rate and stable_fraction(self.seed, "error", prompt, call) < self.error_rate:
+            self.log.record("errors")
+            raise FakeAPIError(429 if call % 2 else 503)
+
+        if (kwargs.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(self._triage(prompt))
+        else:
+            content = self._resolution(prompt)
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        if stream:
+            return self._stream(content, usage, prompt)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+
+    def _stream(self, content, usage, prompt):
+        words = content.split(" ")
+        step = max(1, len(words) // self.stream_chunks)
+        for start in range(0, len(words), step):
+            time.sleep(self._delay(f"{prompt}:{start}") / self.stream_chunks)
+            piece = " ".join(words[start:start + step]) + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], x_groq=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage))
+
+    def _triage(self, prompt):
+        return {
+            "category": FAKE_CATEGORIES[int(stable_fraction(self.seed, "category", prompt) * len(FAKE_CATEGORIES))],
+            "priority": FAKE_PRIORITIES[int(stable_fraction(self.seed, "priority", prompt) * len(FAKE_PRIORITIES))],
+            "status": "Open",
+            "agent": FAKE_AGENTS[int(stable_fraction(self.seed, "agent", prompt) * len(FAKE_AGENTS))],
+        }
+
+    def _resolution(self, prompt):
+        token = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return (f"Thank you for reaching out. We have reviewed your request ({token}) against our "
+                "policies and the steps below should resolve it. Please reply if the issue persists.")
+
+
+register_backend("fake", FakeLLMBackend)
+
+
+# ================================
+# Fake worksheet
+# ================================
+_A1 = re.compile(r"^(?:.*!)?([A-Z]+)(\d+)")
+
+
+def _a1_start(range_name):
+    match = _A1.match(range_name or "A1")
+    col = 0
+    for ch in match.group(1):
+        col = col * 26 + ord(ch) - 64
+    return int(match.group(2)), col
+
+
+class FakeWorksheet:
+    """
+    In-memory gspread Worksheet covering the calls made by SheetSyncer,
+    bulk_sync and rag.py. Each request sleeps `latency` seconds and a
+    fraction `error_rate` of them raises a 429 FakeAPIError.
+    """
+
+    def __init__(self, rows=None, title="Sheet2", latency=0.05, error_rate=0.0, seed=0, row_count=1000):
+        self.rows = [list(r) for r in rows or []]
+        self.title = title
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.row_count = max(row_count, len(self.rows))
+        self.log = CallLog()
+        self._lock = threading.Lock()
+
+    def _request(self, name):
+        call = self.log.record(name)
+        time.sleep(self.latency)
+        if self.error_rate and stable_fraction(self.seed, name, call) < self.error_rate:
+            self.log.record("errors")
+            raise FakeAPIError(429, "Quota exceeded")
+
+    def _write(self, row, col, values):
+        for r, values_row in enumerate(values, start=row):
+            while len(self.rows) < r:
+                self.rows.append([])
+            target = self.rows[r - 1]
+            target.extend([""] * (col - 1 + len(values_row) - len(target)))
+            target[col - 1:col - 1 + len(values_row)] = [str(v) for v in values_row]
+        self.row_count = max(self.row_count, len(self.rows))
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def get_all_values(self):
+        self._request("get_all_values")
+        with self._lock:
+            return [list(r) for r in self.rows]
+
+    def get_all_records(self):
+        self._request("get_all_records")
+        with self._lock:
+            if not self.rows:
+                return []
+            headers = self.rows[0]
+            return [dict(zip(headers, r + [""] * (len(headers) - len(r)))) for r in self.rows[1:]]
+
+    def col_values(self, col):
+        self._request("col_values")
+        with self._lock:
+            return [r[col - 1] if len(r) >= col else "" for r in self.rows]
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def append_rows(self, values, **kwargs):
+        self._request("append_rows")
+        with self._lock:
+            first = len(self.rows) + 1
+            self._write(first, 1, values)
+            last = first + len(values) - 1
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:Q{last}", "updatedRows": len(values)}}
+
+    def batch_update(self, data, **kwargs):
+        self._request("batch_update")
+        with self._lock:
+            for item in data:
+                self._write(*_a1_start(item["range"]), item["values"])
+        return {"totalUpdatedRows": len(data)}
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._request("update")
+        with self._lock:
+            self._write(*_a1_start(range_name), values or [])
+        return {"updatedRange": f"{self.title}!{range_name}"}
+
+    def update_cell(self, row, col, value):
+        self._request("update_cell")
+        with self._lock:
+            self._write(row, col, [[value]])
+
+    def resize(self, rows=None, cols=None):
+        self._request("resize")
+        with self._lock:
+            if rows is not None:
+                self.row_count = rows
+                del self.rows[rows:]
+
+
+# ================================
+# Fake embeddings + KB index
+# ================================
+def fake_embeddings(size=EMBEDDING_SIZE):
+    """Deterministic hash-seeded embeddings with MiniLM's dimension (no model download)."""
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=size)
+
+
+def build_fake_vector_store(embeddings, sources):
+    """In-memory FAISS KB built from `sources` exactly as build_kb.py chunks them."""
+    from langchain_community.vectorstores import FAISS
+    from build_kb import load_documents, split_documents
+
+    chunks = split_documents(load_documents(sources))
+    return FAISS.from_documents(chunks, embeddings)
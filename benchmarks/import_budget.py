@@ -0,0 +1,99 @@
+# benchmarks/import_budget.py
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ================================
+# Configuration
+# ================================
+# Cold-import budget (ms) per module, measured in a fresh interpreter. These
+# are the modules CLIs and workers import just to reach a helper.
+BUDGETS_MS = {
+    "rag": 250,
+    "resources": 150,
+    "ticket_store": 100,
+    "ticket_queue": 100,
+    "telemetry": 50,
+    "llm_client": 50,
+}
+# Heavy dependencies and remote clients none of them may pull in at import time
+FORBIDDEN = ("groq", "gspread", "oauth2client", "langchain", "langchain_community", "faiss",
+             "sentence_transformers", "torch", "numpy", "pandas")
+DEFAULT_RUNS = 3
+
+_PROBE = "import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+
+
+# ================================
+# Measurement
+# ================================
+def measure(module):
+    """
+    Import `module` in a fresh `python -X importtime` process. Returns
+    (cumulative ms for the module itself, [(ms, name)] slowest direct imports,
+    names of every module loaded).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    total_us, children, timings = None, [], []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"; a package's
+        # imports are listed before it, indented two more spaces per level
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip())
+        if depth == 3:
+            children.append((int(cumulative) / 1000, name.strip()))
+        elif depth == 1:
+            if name.strip() == module:
+                total_us, timings = int(cumulative), children
+            children = []
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total_us / 1000, sorted(timings, reverse=True)[:5], loaded
+
+
+def check(module, budget_ms, runs=DEFAULT_RUNS):
+    """Best-of-`runs` import time plus any budget / forbidden-import violations."""
+    samples = [measure(module) for _ in range(runs)]
+    best_ms, slowest, loaded = min(samples, key=lambda s: s[0])
+    heavy = sorted({name.split(".")[0] for name in loaded} & set(FORBIDDEN))
+    problems = []
+    if best_ms > budget_ms:
+        problems.append(f"{best_ms:.0f} ms > {budget_ms} ms budget")
+    if heavy:
+        problems.append(f"imports {', '.join(heavy)}")
+    return {"module": module, "ms": round(best_ms, 1), "budget_ms": budget_ms,
+            "slowest": slowest, "heavy": heavy, "problems": problems}
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fail if importing the pipeline modules is slow or pulls in heavy dependencies.")
+    parser.add_argument("modules", nargs="*", help=f"Modules to check (default: {', '.join(BUDGETS_MS)})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Fresh imports per module; the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on slow CI runners")
+    args = parser.parse_args()
+
+    failed = 0
+    for module in args.modules or BUDGETS_MS:
+        result = check(module, BUDGETS_MS.get(module, 250) * args.scale, args.runs)
+        status = "❌" if result["problems"] else "✅"
+        print(f"{status} {module:<14} {result['ms']:8.1f} ms (budget {result['budget_ms']:.0f} ms)")
+        if result["problems"]:
+            failed += 1
+            print(f"   {'; '.join(result['problems'])}")
+            for ms, name in result["slowest"]:
+                print(f"   {ms:8.1f} ms  {name}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,279 @@
+# benchmarks/replay.py
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from ticket_csv import TICKETS_CSV  # noqa: E402
+from ticket_store import HEADERS  # noqa: E402
+from benchmarks.bench_pipeline import (  # noqa: E402
+    KB_SOURCES, PIPELINE_FIELDS, RESULTS_DIR, git_commit, install_fakes, load_workload, summarize,
+)
+
+# ================================
+# Configuration
+# ================================
+# Open-loop load test: tickets arrive on a schedule that does not wait for
+# earlier ones to finish, like customers submitting the form. Latency is
+# measured from each ticket's scheduled arrival, so time spent waiting for
+# a free worker counts (a slow pipeline cannot hide behind a slow client).
+DEFAULT_RATES = [1, 2, 5, 10, 20, 50]
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds
+MIN_THROUGHPUT = 0.9           # completed / offered below this means the pipeline is falling behind
+TARGETS = {
+    "app": True,               # inline app.py submit: KB + history context, resolution + triage
+    "process_ticket": False,   # batch / queue triage only
+}
+
+
+# ================================
+# Workload
+# ================================
+def load_log(path, limit):
+    """Tickets from a JSONL log (one ticket dict per line; missing fields are blank)."""
+    tickets = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            ticket = {h: str(record.get(h, "") or "") for h in HEADERS}
+            ticket.update({f: "" for f in PIPELINE_FIELDS})
+            tickets.append(ticket)
+            if len(tickets) >= limit:
+                break
+    return tickets
+
+
+def arrivals(pattern, rate, duration, burst_size, rng):
+    """
+    Arrival offsets (seconds from the start of the step) at `rate` tickets/s:
+    "poisson" has exponential gaps; "burst" submits `burst_size` tickets at
+    once every burst_size / rate seconds.
+    """
+    times = []
+    if pattern == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+    else:
+        period = burst_size / rate
+        t = 0.0
+        while t < duration:
+            times.extend([t] * burst_size)
+            t += period
+    return times
+
+
+# ================================
+# Replay
+# ================================
+def histogram(samples, buckets=HISTOGRAM_BUCKETS):
+    """Latency counts per bucket, as [(label, count)] (the last bucket is open-ended)."""
+    counts = np.histogram(samples, bins=[0, *buckets, np.inf])[0]
+    labels = [f"≤{b:g}s" for b in buckets] + [f">{buckets[-1]:g}s"]
+    return list(zip(labels, (int(c) for c in counts)))
+
+
+def run_step(rag, vectorstore, tickets, schedule, resolve, dedup, max_inflight, drain_timeout, tag):
+    """
+    Submit one ticket per scheduled arrival and wait for them to finish.
+    Arrivals that find `max_inflight` tickets already in progress are
+    dropped (counted, not queued), so the offered rate never slows down.
+    Latency percentiles cover successful tickets finished within the drain
+    timeout; later stragglers are waited for but only counted as timed out.
+    """
+    latencies, errors, lock = [], {}, threading.Lock()
+    stats = {"dropped": 0, "peak_inflight": 0, "inflight": 0}
+
+    def handle(ticket, scheduled):
+        try:
+            result = rag.process_ticket(ticket, vectorstore, resolve=resolve, dedup=dedup)
+            error = result.get("processing_error")
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        with lock:
+            stats["inflight"] -= 1
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            else:
+                latencies.append(finished - scheduled)
+
+    futures = []
+    pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="replay")
+    try:
+        start = time.perf_counter()
+        for i, offset in enumerate(schedule):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                if stats["inflight"] >= max_inflight:
+                    stats["dropped"] += 1
+                    continue
+                stats["inflight"] += 1
+                stats["peak_inflight"] = max(stats["peak_inflight"], stats["inflight"])
+            ticket = dict(tickets[i % len(tickets)])
+            ticket["ticket_id"] = f"{ticket['ticket_id']}-{tag}-{i}"
+            futures.append(pool.submit(handle, ticket, start + offset))
+        sent_seconds = time.perf_counter() - start
+        _, not_done = wait(futures, timeout=drain_timeout)
+        elapsed = time.perf_counter() - start
+        with lock:
+            measured, measured_errors = list(latencies), dict(errors)
+        # Stragglers past the drain timeout are left out of this step's numbers,
+        # but finished here so they do not overlap (and skew) the next step
+        wait(not_done)
+        straggler_seconds = time.perf_counter() - start - elapsed
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    completed = len(measured)
+    failed = sum(measured_errors.values())
+    return {
+        "offered": len(schedule),
+        "completed": completed,
+        "errors": measured_errors,
+        "error_rate": round(failed / len(schedule), 4) if schedule else 0.0,
+        "dropped": stats["dropped"],
+        "timed_out": len(not_done),
+        "straggler_seconds": round(straggler_seconds, 3),
+        "peak_inflight": stats["peak_inflight"],
+        "send_seconds": round(sent_seconds, 3),
+        "seconds": round(elapsed, 3),
+        "throughput": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(measured),
+        "histogram": histogram(measured),
+    }
+
+
+def saturated(step, rate, slo_ms, max_error_rate):
+    """Reasons the pipeline did not sustain `rate` in this step ([] if it did)."""
+    reasons = []
+    p95 = step["latency"].get("p95_ms")
+    if p95 is not None and p95 > slo_ms:
+        reasons.append(f"p95 {p95:.0f} ms > {slo_ms:.0f} ms SLO")
+    if step["error_rate"] > max_error_rate:
+        reasons.append(f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}")
+    if step["dropped"] or step["timed_out"]:
+        reasons.append(f"{step['dropped']} dropped, {step['timed_out']} timed out")
+    if step["offered"] and step["completed"] / step["offered"] < MIN_THROUGHPUT - max_error_rate:
+        reasons.append(f"only {step['completed']}/{step['offered']} completed")
+    return reasons
+
+
+def print_step(rate, step):
+    lat = step["latency"]
+    print(f"   {rate:g}/s: {step['completed']}/{step['offered']} ok, {step['throughput']:.2f} tickets/s, "
+          f"p50 {lat.get('p50_ms', 0):.0f} ms, p95 {lat.get('p95_ms', 0):.0f} ms, p99 {lat.get('p99_ms', 0):.0f} ms, "
+          f"errors {step['error_rate']:.1%}, peak in flight {step['peak_inflight']}")
+    if step["timed_out"]:
+        print(f"      {step['timed_out']} ticket(s) still running after the drain timeout took another "
+              f"{step['straggler_seconds']:.1f}s (not counted)")
+    top = max((count for _, count in step["histogram"]), default=0) or 1
+    for label, count in step["histogram"]:
+        if count:
+            print(f"      {label:>7} {'█' * max(1, round(30 * count / top))} {count}")
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay tickets against the pipeline at fixed arrival rates (fake Groq, Sheets and embeddings) "
+                    "to find the rate it can sustain.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--csv", default=os.path.join(REPO_ROOT, TICKETS_CSV))
+    source.add_argument("--log", help="JSONL file of recorded tickets to replay instead of the CSV")
+    parser.add_argument("--tickets", type=int, default=500, help="Distinct tickets to load (replayed round-robin)")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="app")
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_RATES, help="Offered rates (tickets/s), in order")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of arrivals per rate")
+    parser.add_argument("--pattern", choices=["poisson", "burst"], default="poisson")
+    parser.add_argument("--burst-size", type=int, default=10, help="Tickets per burst with --pattern burst")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Tickets in progress before arrivals are dropped")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Seconds to wait for in-flight tickets after a step")
+    parser.add_argument("--slo-ms", type=float, default=5000, help="p95 latency above this counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate above this counts as saturated")
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate instead of stopping at saturation")
+    parser.add_argument("--dedup", action="store_true", help="Let replayed resubmissions short-circuit the pipeline (TICKET_DEDUP=1)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean fake LLM latency (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM calls failing with 429/503")
+    parser.add_argument("--llm-concurrency", type=int, help="LLMClient concurrency limit (default LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--sheets-latency", type=float, default=0.2, help="Fake Sheets request latency (s)")
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0, help="Fraction of Sheets requests failing with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Result file (default benchmarks/results/replay-<timestamp>.json)")
+    args = parser.parse_args()
+
+    # Resolve paths before install_fakes() changes into the scratch directory
+    source_path = os.path.abspath(args.log or args.csv)
+    out = os.path.abspath(args.out or os.path.join(
+        RESULTS_DIR, f"replay-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+    tickets = load_log(source_path, args.tickets) if args.log else load_workload(source_path, args.tickets)
+    if not tickets:
+        parser.error(f"no tickets in {source_path}")
+    if args.dedup:
+        os.environ["TICKET_DEDUP"] = "1"  # read when dedup.py is first imported
+    worksheet, backend, llm_client = install_fakes(args)
+
+    import rag
+    from resources import get_embeddings
+    from benchmarks.fakes import build_fake_vector_store
+
+    # One-time sheet import, kept out of the timings and free of injected failures
+    worksheet.error_rate, error_rate = 0.0, worksheet.error_rate
+    rag.bootstrap_ticket_store()
+    worksheet.error_rate = error_rate
+    print("⏳ Building in-memory KB index...")
+    vectorstore = build_fake_vector_store(get_embeddings(), KB_SOURCES)
+
+    rng = random.Random(args.seed)
+    steps, saturation, sustained = {}, None, None
+    print(f"🚦 Replaying {len(tickets)} ticket(s) against {args.target} ({args.pattern} arrivals, "
+          f"{args.duration:g}s per rate)")
+    for i, rate in enumerate(args.rates):
+        schedule = arrivals(args.pattern, rate, args.duration, args.burst_size, rng)
+        step = run_step(rag, vectorstore, tickets, schedule, TARGETS[args.target], args.dedup,
+                        args.max_inflight, args.drain_timeout, tag=f"r{i}")
+        step["reasons"] = saturated(step, rate, args.slo_ms, args.max_error_rate)
+        steps[f"{rate:g}"] = step
+        print_step(rate, step)
+        if not step["reasons"]:
+            sustained = rate
+        elif saturation is None:
+            saturation = rate
+            print(f"⚠️ Saturated at {rate:g}/s: {'; '.join(step['reasons'])}")
+            if not args.keep_going:
+                break
+
+    rag.get_sheet_syncer().flush()
+    result = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "steps": steps,
+        "sustained_rate": sustained,
+        "saturation_rate": saturation,
+        "calls": {"llm": dict(backend.log.calls), "sheets": dict(worksheet.log.calls), "llm_client": dict(llm_client.stats)},
+    }
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    if saturation is None:
+        print(f"✅ Sustained every offered rate (up to {args.rates[-1]:g}/s)")
+    else:
+        print(f"📈 Highest sustained rate: {f'{sustained:g}/s' if sustained else 'none'}; saturation at {saturation:g}/s")
+    print(f"✅ Results saved at '{out}'")
@@ -1,9 +1,13 @@
 import os
+import argparse
 from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
+from resources import INDEX_DIR, get_embeddings
+from hybrid_retriever import BM25_FILE, BM25Index, split_sections
+import vector_format
+from vector_format import chunk_id
 
 # ================================
 # Load environment variables
@@ -12,43 +16,136 @@ load_dotenv()  # loads .env file
 
 groq_key = os.getenv("GROQ_API_KEY")
 
+# Default KB sources: the original terms file plus any documents in data/kb/
+DEFAULT_SOURCES = ["data/terms.txt", "data/kb"]
+# Default sources of a KB shard (--shard NAME): data/kb_shards/NAME/
+SHARD_SOURCES_DIR = "data/kb_shards"
+KB_EXTENSIONS = (".txt", ".md")
+
+
 # STEP 1: Load Documents
-def load_documents():
-    file_path = "data/terms.txt"
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"{file_path} not found! Please add your terms.txt file.")
-    
-    loader = TextLoader(file_path)
-    docs = loader.load()
+def _source_files(sources):
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in sorted(os.walk(source)):
+                for name in sorted(files):
+                    if name.endswith(KB_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(source):
+            yield source
+
+
+def load_documents(sources=None):
+    sources = sources or DEFAULT_SOURCES
+    files = list(_source_files(sources))
+    if not files:
+        raise FileNotFoundError(f"No KB documents found in {sources}! Please add your terms.txt file.")
+
+    docs = []
+    for file_path in files:
+        docs.extend(TextLoader(file_path, encoding="utf-8").load())
     print(f"✅ Loaded {len(docs)} document(s)")
     return docs
 
 
 # STEP 2: Split Documents
 def split_documents(docs):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents(docs)
+    """
+    Chunks never cross a numbered section ("2. Billing & Payments"); each
+    chunk carries section / section_number metadata and its start_index
+    within the source file, for filtering and citing.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    chunks = []
+    for doc in docs:
+        for number, title, offset, text in split_sections(doc.page_content):
+            metadata = dict(doc.metadata, section=title, section_number=number)
+            for chunk in splitter.create_documents([text], metadatas=[metadata]):
+                chunk.metadata["start_index"] += offset
+                chunks.append(chunk)
     print(f"✅ Split into {len(chunks)} chunks")
     return chunks
 
 
-# STEP 3: Embed + Store in FAISS
-def build_vector_store(chunks):
+# STEP 3: Embed + Store in FAISS (incremental)
+def _load_existing(embeddings, index_dir=INDEX_DIR):
+    if not vector_format.exists(index_dir) and os.path.exists(os.path.join(index_dir, vector_format.LEGACY_FILE)):
+        # Index saved by an older build_kb.py: its vectors are kept, only the docstore is rewritten
+        print(f"⏳ Converting the pickled {index_dir} to the chunks.bin format")
+        vector_format.convert_pickle(index_dir, embeddings)
+    if vector_format.exists(index_dir):
+        return vector_format.MmapVectorStore.load(index_dir, embeddings, verify=True).to_langchain()
+    return None
+
+
+def _swap_in(vectorstore, index_dir=INDEX_DIR):
+    """
+    Write FAISS + chunks.bin + the BM25 inverted index as a new version of
+    `index_dir` and make it live atomically (vector_format.publish).
+    """
+    def write(version_dir):
+        vector_format.save(vectorstore, version_dir)
+        BM25Index.from_vectorstore(vectorstore).save(os.path.join(version_dir, BM25_FILE))
+
+    vector_format.publish(index_dir, write)
+
+
+def build_vector_store(chunks, full=False, index_dir=INDEX_DIR):
     # ✅ Use Hugging Face local embeddings — no quota or API key needed
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = get_embeddings()
 
-    # Build FAISS vectorstore from chunks
-    vectorstore = FAISS.from_documents(chunks, embeddings)
+    # Deduplicate by content hash (same text in the same source → one chunk)
+    wanted = {}
+    for chunk in chunks:
+        wanted.setdefault(chunk_id(chunk), chunk)
 
-    # Save locally
-    os.makedirs("faiss_store", exist_ok=True)
-    vectorstore.save_local("faiss_store")
+    vectorstore = None if full else _load_existing(embeddings, index_dir)
+    if vectorstore is None:
+        if not wanted:
+            raise ValueError("No chunks to index.")
+        vectorstore = FAISS.from_documents(list(wanted.values()), embeddings, ids=list(wanted))
+        print(f"✅ Embedded {len(wanted)} chunk(s) (full build)")
+    else:
+        existing = set(vectorstore.index_to_docstore_id.values())
+        added = [cid for cid in wanted if cid not in existing]
+        removed = [cid for cid in existing if cid not in wanted]
+        if not added and not removed:
+            live_dir = vector_format.current_dir(index_dir)
+            if os.path.exists(os.path.join(live_dir, BM25_FILE)) and vector_format.exists(index_dir):
+                print("✅ FAISS vector store already up to date")
+                return
+            print("✅ FAISS vector store up to date, rewriting the index files")
+        if removed:
+            vectorstore.delete(removed)
+        if added:
+            vectorstore.add_documents([wanted[cid] for cid in added], ids=added)
+        print(f"✅ Embedded {len(added)} new/changed chunk(s), removed {len(removed)}, "
+              f"kept {len(wanted) - len(added)}")
 
-    print("✅ FAISS vector store built and saved at 'faiss_store/'")
+    _swap_in(vectorstore, index_dir)
+    print(f"✅ FAISS vector store + BM25 index built and saved at '{index_dir}/'")
 
 
 # MAIN
 if __name__ == "__main__":
-    docs = load_documents()
-    chunks = split_documents(docs)
-    build_vector_store(chunks)
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS knowledge base.")
+    parser.add_argument("sources", nargs="*", help=f"KB files or directories (default: {' '.join(DEFAULT_SOURCES)})")
+    parser.add_argument("--full", action="store_true", help="Re-embed everything instead of updating incrementally")
+    parser.add_argument("--shard", help="Build the named KB shard in kb_shards/ instead of faiss_store "
+                                        f"(default sources: {SHARD_SOURCES_DIR}/<shard>)")
+    parser.add_argument("--products", nargs="+", default=[], help="Products routed to --shard")
+    parser.add_argument("--categories", nargs="+", default=[], help="Ticket types/categories routed to --shard")
+    args = parser.parse_args()
+
+    if args.shard:
+        from kb_registry import register_shard, shard_dir
+        docs = load_documents(args.sources or [os.path.join(SHARD_SOURCES_DIR, args.shard)])
+        chunks = split_documents(docs)
+        os.makedirs(os.path.dirname(shard_dir(args.shard)), exist_ok=True)
+        build_vector_store(chunks, full=args.full, index_dir=shard_dir(args.shard))
+        entry = register_shard(args.shard, args.products, args.categories)
+        print(f"✅ Shard '{args.shard}' routes products {entry['products']}, categories {entry['categories']}")
+    else:
+        docs = load_documents(args.sources)
+        chunks = split_documents(docs)
+        build_vector_store(chunks, full=args.full)
@@ -0,0 +1,236 @@
+# bulk_sync.py
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+
+import telemetry
+from ticket_csv import TICKETS_CSV, iter_ticket_chunks
+from ticket_store import HEADERS, column_letter
+
+# ================================
+# Configuration
+# ================================
+CHECKPOINT_PATH = "bulk_sync_checkpoint.json"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+# ================================
+# Adaptive batch size / rate
+# ================================
+class AdaptiveRate:
+    """
+    AIMD pacing for Sheets writes: batches grow and the inter-request delay
+    shrinks while requests succeed; a quota/5xx response halves the batch,
+    doubles the delay and backs off exponentially with jitter.
+    """
+
+    def __init__(self, batch_size=200, min_batch=20, max_batch=2000,
+                 delay=0.5, min_delay=0.0, max_delay=30.0, max_retries=8):
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.delay = delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+
+    def on_success(self):
+        self.batch_size = min(self.max_batch, int(self.batch_size * 1.25) + 1)
+        self.delay = max(self.min_delay, self.delay * 0.8)
+
+    def on_throttle(self, attempt, retry_after=None):
+        self.batch_size = max(self.min_batch, self.batch_size // 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, 0.5))
+        backoff = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+        time.sleep(max(backoff, retry_after or 0))
+
+    def pace(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(rate, fn, *args, **kwargs):
+    """Run one Sheets request, retrying 429/5xx and connection errors with backoff."""
+    import requests
+
+    for attempt in range(rate.max_retries + 1):
+        try:
+            telemetry.count("sheets_api_calls", method=getattr(fn, "__name__", "call"))
+            result = fn(*args, **kwargs)
+            rate.on_success()
+            return result
+        except Exception as e:
+            retryable = _status_code(e) in RETRYABLE_STATUS or isinstance(e, requests.ConnectionError)
+            if not retryable or attempt == rate.max_retries:
+                raise
+            telemetry.count("sheets_retries")
+            print(f"⏳ Sheets throttled ({_status_code(e) or type(e).__name__}), "
+                  f"retry {attempt + 1}/{rate.max_retries}")
+            rate.on_throttle(attempt, _retry_after(e))
+
+
+# ================================
+# Checkpointing
+# ================================
+def _source_fingerprint(csv_path):
+    st = os.stat(csv_path)
+    return f"{os.path.abspath(csv_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_checkpoint(path, csv_path):
+    """Rows already synced from this exact CSV (0 if none or the CSV changed)."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != _source_fingerprint(csv_path):
+        print("⚠️ CSV changed since the last run, ignoring checkpoint")
+        return 0
+    return checkpoint.get("rows_done", 0)
+
+
+def save_checkpoint(path, csv_path, rows_done):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": _source_fingerprint(csv_path), "rows_done": rows_done}, f)
+    os.replace(tmp_path, path)
+
+
+# ================================
+# Diff + sync
+# ================================
+def row_hash(values):
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode("utf-8")).hexdigest()
+
+
+def _chunk_rows(chunk):
+    for col in HEADERS:
+        if col not in chunk.columns:
+            chunk[col] = ""
+    return chunk[HEADERS].fillna("").astype(str).values.tolist()
+
+
+def bulk_sync(sheet, csv_path=TICKETS_CSV, chunksize=1000, checkpoint_path=CHECKPOINT_PATH,
+              resume=True, rate=None):
+    """
+    Stream `csv_path` into `sheet` without clearing it first: new ticket IDs
+    are written below the last row, changed rows are rewritten in place and
+    unchanged rows are skipped. Progress is checkpointed after every chunk,
+    and rows are written to explicit ranges, so an interrupted run can be
+    resumed or simply re-run without duplicating rows.
+    """
+    rate = rate or AdaptiveRate()
+    last_col = column_letter(len(HEADERS))
+
+    # One read of the current sheet for diffing
+    values = call_with_backoff(rate, sheet.get_all_values)
+    if not values or not any(values[0]):
+        call_with_backoff(rate, sheet.update, values=[HEADERS], range_name="A1")
+        values = [HEADERS] + values[1:] if values else [HEADERS]
+    elif values[0][:len(HEADERS)] != HEADERS:
+        # Never overwrite row 1: it may be a data row or an older column layout
+        raise ValueError(f"❌ Row 1 of worksheet '{sheet.title}' is not the expected header row "
+                         f"({', '.join(HEADERS)}); got {values[0]}. Fix the header or sync into an empty worksheet.")
+    width = len(HEADERS)
+    existing = {
+        row[0]: (i, row_hash((row + [""] * width)[:width]))  # Sheets trims trailing empty cells
+        for i, row in enumerate(values[1:], start=2) if row and row[0]
+    }
+    next_row = len(values) + 1
+    grid_rows = sheet.row_count
+
+    rows_done = load_checkpoint(checkpoint_path, csv_path) if resume else 0
+    if rows_done:
+        print(f"↩️ Resuming after {rows_done} already-synced row(s)")
+    seen = 0
+    stats = {"appended": 0, "updated": 0, "unchanged": 0}
+
+    for chunk in iter_ticket_chunks(csv_path, chunksize):
+        if seen + len(chunk) <= rows_done:
+            seen += len(chunk)
+            continue
+        rows = _chunk_rows(chunk)[max(0, rows_done - seen):]
+        seen += len(chunk)
+
+        updates, appends = [], []
+        for row in rows:
+            known = existing.get(row[0])
+            if known is None:
+                appends.append(row)
+            elif known[1] != row_hash(row):
+                updates.append((known[0], row))
+            else:
+                stats["unchanged"] += 1
+
+        while updates:
+            batch, updates = updates[:rate.batch_size], updates[rate.batch_size:]
+            call_with_backoff(rate, sheet.batch_update, [
+                {"range": f"A{r}:{last_col}{r}", "values": [row]} for r, row in batch
+            ])
+            for r, row in batch:
+                existing[row[0]] = (r, row_hash(row))
+            stats["updated"] += len(batch)
+            rate.pace()
+
+        if appends and next_row + len(appends) - 1 > grid_rows:
+            grid_rows = next_row + len(appends) - 1
+            call_with_backoff(rate, sheet.resize, rows=grid_rows)
+        while appends:
+            batch, appends = appends[:rate.batch_size], appends[rate.batch_size:]
+            call_with_backoff(rate, sheet.update, values=batch, range_name=f"A{next_row}")
+            for offset, row in enumerate(batch):
+                existing[row[0]] = (next_row + offset, row_hash(row))
+            next_row += len(batch)
+            stats["appended"] += len(batch)
+            rate.pace()
+
+        save_checkpoint(checkpoint_path, csv_path, seen)
+        print(f"   {seen} row(s) processed — {stats['appended']} appended, "
+              f"{stats['updated']} updated, {stats['unchanged']} unchanged (batch size {rate.batch_size})")
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+
+def main():
+    from resources import open_worksheet
+
+    parser = argparse.ArgumentParser(description="Resumable, adaptive-rate bulk upload of a ticket CSV to Google Sheets.")
+    parser.add_argument("--csv", default=TICKETS_CSV)
+    parser.add_argument("--worksheet", help="Target worksheet (default: first worksheet, as g-sheets-int.py did)")
+    parser.add_argument("--chunksize", type=int, default=1000, help="CSV rows read per chunk")
+    parser.add_argument("--batch-size", type=int, default=200, help="Initial rows per Sheets request")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    print("Uploading to Google Sheet...")
+    stats = bulk_sync(
+        open_worksheet(args.worksheet), csv_path=args.csv, chunksize=args.chunksize,
+        checkpoint_path=args.checkpoint, resume=not args.restart,
+        rate=AdaptiveRate(batch_size=args.batch_size),
+    )
+    print(f"✅ Sync complete: {stats['appended']} appended, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged")
+
+
+# MAIN
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# context_builder.py
+import os
+import math
+import datetime
+
+import telemetry
+from llm_client import estimate_tokens
+from hybrid_retriever import tokenize
+from ticket_index import format_similar_tickets
+
+# ================================
+# Configuration
+# ================================
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Share of the budget per part; whatever a part leaves unused flows to the next one
+BUDGET_SHARES = {"kb": 0.5, "history": 0.3}  # similar tickets get the rest
+HISTORY_CANDIDATES = 50        # most recent tickets considered for ranking
+HISTORY_FULL_ITEMS = 3         # best-ranked tickets shown in full; the rest as one-liners
+HISTORY_HALF_LIFE_DAYS = 90    # recency weight halves every 90 days
+HISTORY_SIMILARITY_WEIGHT = 0.7
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHUNK_OVERLAP_CHARS = 200      # chunk_overlap in build_kb.py
+MIN_OVERLAP_CHARS = 20         # a shorter repeat between chunk end and start is a coincidence
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut `text` to roughly `max_tokens` (same 4 chars/token estimate as llm_client), on a word boundary."""
+    text = str(text or "").strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    cut = text[:max_tokens * 4].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + " …"
+
+
+# ================================
+# Knowledge base
+# ================================
+def _overlap(previous, chunk):
+    """Length of the longest start of `chunk` that repeats the end of `previous`."""
+    for n in range(min(len(previous), len(chunk), CHUNK_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(chunk[:n]):
+            return n
+    return 0
+
+
+def dedupe_chunks(chunks):
+    """
+    Drop text already sent in an earlier chunk: the start of a chunk that
+    repeats the end of an earlier one (neighbouring KB chunks overlap by up
+    to CHUNK_OVERLAP_CHARS), then lines identical to an earlier line.
+    Lines are compared whole, so a short line ("Yes", "Refunds") is kept
+    unless the very same line came before.
+    """
+    seen_chunks, seen_lines, out = [], set(), []
+    for chunk in chunks:
+        chunk = str(chunk).strip()
+        trim = max((_overlap(previous, chunk) for previous in seen_chunks), default=0)
+        lines = [line.strip() for line in chunk[trim:].splitlines()]
+        kept = [line for line in lines if line and line not in seen_lines]
+        seen_chunks.append(chunk)
+        seen_lines.update(line.strip() for line in chunk.splitlines())
+        if kept:
+            out.append("\n".join(kept))
+    return out
+
+
+def _fit(parts, budget, sep="\n\n"):
+    """Greedily keep whole parts (in order) within `budget` tokens; truncate the first that does not fit."""
+    kept, used = [], 0
+    for part in parts:
+        cost = estimate_tokens(part) + 1  # + separator
+        if used + cost <= budget:
+            kept.append(part)
+            used += cost
+            continue
+        remaining = budget - used
+        if remaining >= 32:  # a fragment shorter than this is noise
+            kept.append(truncate_to_tokens(part, remaining))
+        break
+    return sep.join(kept)
+
+
+# ================================
+# Customer history
+# ================================
+def _similarity(query_terms, text):
+    terms = set(tokenize(text))
+    if not query_terms or not terms:
+        return 0.0
+    return len(query_terms & terms) / math.sqrt(len(query_terms) * len(terms))
+
+
+def _age_days(ticket, now):
+    try:
+        opened = datetime.datetime.strptime(str(ticket.get("first_response_time")), TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+    return max(0.0, (now - opened).total_seconds() / 86400)
+
+
+def rank_history(query, history, embed_fn=None, now=None):
+    """
+    Customer tickets ordered by a blend of similarity to `query` and
+    recency. Similarity is lexical unless `embed_fn` (texts → vectors) is
+    given. `history` is oldest first, as TicketStore.customer_history
+    returns it; tickets without a timestamp fall back to list position.
+    """
+    history = list(history)[-HISTORY_CANDIDATES:]
+    if not history:
+        return []
+    now = now or datetime.datetime.now()
+    texts = [f"{t.get('ticket_subject', '')} {t.get('ticket_description', '')}" for t in history]
+
+    if embed_fn is not None:
+        import numpy as np
+        vectors = np.asarray(embed_fn([query] + texts), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+        similarities = (vectors[1:] @ vectors[0]).tolist()
+    else:
+        query_terms = set(tokenize(query))
+        similarities = [_similarity(query_terms, text) for text in texts]
+
+    scored = []
+    for position, (ticket, similarity) in enumerate(zip(history, similarities)):
+        age = _age_days(ticket, now)
+        if age is None:
+            age = (len(history) - 1 - position) * 7  # assume roughly weekly tickets
+        recency = 0.5 ** (age / HISTORY_HALF_LIFE_DAYS)
+        score = HISTORY_SIMILARITY_WEIGHT * similarity + (1 - HISTORY_SIMILARITY_WEIGHT) * recency
+        scored.append((score, position, ticket))
+    scored.sort(key=lambda s: (-s[0], -s[1]))
+    return [ticket for _, _, ticket in scored]
+
+
+def format_history(ranked, budget, full_items=HISTORY_FULL_ITEMS, total=None):
+    """
+    Best-ranked tickets in full (description truncated), then the rest as
+    one-line summaries, within `budget` tokens. `total` is the customer's
+    full ticket count when only part of it was ranked.
+    """
+    lines = []
+    for ticket in ranked[:full_items]:
+        line = (f"Subject: {ticket.get('ticket_subject', '')}, "
+                f"Description: {truncate_to_tokens(ticket.get('ticket_description', ''), 80)}, "
+                f"Status: {ticket.get('ticket_status', '')}")
+        if ticket.get("resolution"):
+            line += f", Resolution: {truncate_to_tokens(ticket['resolution'], 60)}"
+        lines.append(line)
+    older = ranked[full_items:]
+    summaries = [
+        f"- {ticket.get('ticket_subject', '')} ({ticket.get('ticket_status', '') or 'unknown status'}"
+        f"{', ' + str(ticket['first_response_time'])[:10] if ticket.get('first_response_time') else ''})"
+        for ticket in older
+    ]
+
+    out, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        out.append(line)
+        used += cost
+    full_shown, summarized = len(out), 0
+    for summary in summaries:
+        cost = estimate_tokens(summary) + 1
+        if used + cost > budget - 8:  # keep room for the "more" note
+            break
+        if not summarized:
+            out.append("Other previous tickets:")
+        out.append(summary)
+        used += cost
+        summarized += 1
+    omitted = max(total or 0, len(ranked)) - full_shown - summarized
+    if omitted > 0:
+        out.append(f"(+{omitted} more previous ticket(s) omitted)")
+    return "\n".join(out)
+
+
+# ================================
+# Assembly
+# ================================
+def assemble_context(query, kb_chunks=(), similar_tickets=(), history=(),
+                     budget=CONTEXT_TOKEN_BUDGET, embed_fn=None):
+    """
+    One prompt context within `budget` estimated tokens, built once and
+    shared by the resolution and triage calls:
+      KB chunks (deduped) → similar resolved tickets → customer history
+      (ranked by similarity + recency, older tickets summarized).
+    """
+    sections, used = [], 0
+
+    kb = _fit(dedupe_chunks(kb_chunks), int(budget * BUDGET_SHARES["kb"]))
+    if kb:
+        sections.append(kb)
+        used += estimate_tokens(kb)
+
+    if similar_tickets:
+        cap = budget - int(budget * BUDGET_SHARES["history"]) if history else budget
+        similar = _fit(format_similar_tickets(similar_tickets).split("\n"), cap - used - 6, sep="\n")
+        if similar:
+            sections.append(f"Similar Resolved Tickets:\n{similar}")
+            used += estimate_tokens(sections[-1])
+
+    if history:
+        ranked = rank_history(query, history, embed_fn=embed_fn)
+        rendered = format_history(ranked, budget - used - 6, total=len(history))
+        if rendered:
+            sections.append(f"Previous Tickets:\n{rendered}")
+
+    context = "\n\n".join(sections)
+    if estimate_tokens(context) > budget:  # per-part estimates round down
+        context = truncate_to_tokens(context, budget)
+    telemetry.count("context_tokens", estimate_tokens(context))
+    return context
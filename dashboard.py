@@ -1,16 +1,23 @@
 # dashboard.py
 import pandas as pd
 import matplotlib.pyplot as plt
-from rag import sheet  # import your Google Sheet object from rag.py
+from rag import get_dashboard_metrics, load_ticket_snapshot
+from ticket_snapshot import parse_durations
 
 # ================================
 # Fetch Tickets
 # ================================
 def fetch_all_tickets():
-    """Fetch all tickets from Google Sheets as a DataFrame"""
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
-    return df
+    """Fetch all tickets as a typed DataFrame (Parquet snapshot of the ticket store)"""
+    return load_ticket_snapshot()
+
+def fetch_metrics():
+    """
+    Materialized metrics from the local ticket store: the keys of
+    ticket_overview_metrics and agent_performance_metrics combined,
+    read at constant cost instead of recomputed from every row.
+    """
+    return get_dashboard_metrics()
 
 # ================================
 # Ticket Overview Metrics
@@ -29,14 +36,16 @@ def ticket_overview_metrics(df):
 # ================================
 def agent_performance_metrics(df):
     """Compute metrics for each agent"""
-    # Convert numeric fields
-    df['time_to_resolution'] = pd.to_numeric(df['time_to_resolution'], errors='coerce')
+    # Convert numeric fields (already typed when df comes from the snapshot)
+    if not pd.api.types.is_numeric_dtype(df['time_to_resolution']):
+        # "123s"-style durations; plain to_numeric would turn them all into NaN
+        df['time_to_resolution'] = parse_durations(df['time_to_resolution'], df.get('first_response_time'))
     df['customer_satisfaction_rating'] = pd.to_numeric(df['customer_satisfaction_rating'], errors='coerce')
     
     tickets_per_agent = df['assigned_agent'].value_counts().to_dict()
-    avg_resolution = df.groupby('assigned_agent')['time_to_resolution'].mean().to_dict()
-    avg_csat = df.groupby('assigned_agent')['customer_satisfaction_rating'].mean().to_dict()
-    resolved_pending = df.groupby(['assigned_agent', 'ticket_status']).size().unstack(fill_value=0).to_dict('index')
+    avg_resolution = df.groupby('assigned_agent', observed=True)['time_to_resolution'].mean().to_dict()
+    avg_csat = df.groupby('assigned_agent', observed=True)['customer_satisfaction_rating'].mean().to_dict()
+    resolved_pending = df.groupby(['assigned_agent', 'ticket_status'], observed=True).size().unstack(fill_value=0).to_dict('index')
     
     return {
         "tickets_per_agent": tickets_per_agent,
@@ -75,7 +84,8 @@ def plot_agent_performance(metrics):
     plt.show()
     
     plt.figure(figsize=(6,4))
-    plt.bar(metrics['avg_resolution_time'].keys(), metrics['avg_resolution_time'].values(), color='red')
+    # avg_resolution_time is in seconds
+    plt.bar(metrics['avg_resolution_time'].keys(), [v / 3600 for v in metrics['avg_resolution_time'].values()], color='red')
     plt.title("Average Resolution Time per Agent")
     plt.ylabel("Time to Resolution (hrs)")
     plt.show()
@@ -97,13 +107,11 @@ def plot_agent_performance(metrics):
 # Main Execution
 # ================================
 if __name__ == "__main__":
-    df = fetch_all_tickets()
+    metrics = fetch_metrics()
     
     # Ticket Overview
-    overview = ticket_overview_metrics(df)
-    print(f"Total Tickets: {overview['total_tickets']}")
-    plot_ticket_overview(overview)
+    print(f"Total Tickets: {metrics['total_tickets']}")
+    plot_ticket_overview(metrics)
     
     # Agent Performance
-    metrics = agent_performance_metrics(df)
     plot_agent_performance(metrics)
@@ -0,0 +1,262 @@
+# dedup.py
+import os
+import re
+import time
+import zlib
+import datetime
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+import telemetry
+
+# ================================
+# Configuration
+# ================================
+DEDUP_ENABLED = os.getenv("TICKET_DEDUP", "0").lower() in ("1", "true", "yes")
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+LSH_BANDS = 16                 # 16 bands x 4 rows: candidates from ~50% shingle overlap
+MIN_JACCARD = float(os.getenv("DEDUP_MIN_JACCARD", "0.8"))   # estimated from the MinHash signatures
+MIN_COSINE = float(os.getenv("DEDUP_MIN_COSINE", "0.92"))    # embedding check on LSH candidates
+WINDOW_DAYS = float(os.getenv("DEDUP_WINDOW_DAYS", "14"))    # closed tickets older than this are not matched
+OPEN_WINDOW_DAYS = float(os.getenv("DEDUP_OPEN_WINDOW_DAYS", "30"))  # nor are open tickets older than this
+REFRESH_SECONDS = 2            # how often the index picks up tickets saved by other processes
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Reason codes stored in ticket["duplicate_reason"]
+SAME_CUSTOMER = "same_customer_resubmission"
+NEAR_DUPLICATE = "near_duplicate"
+REUSED_FIELDS = ("resolution", "category", "ticket_priority", "assigned_agent")
+
+# Multiply-shift hashing: (a * x + b) mod 2^64, top 32 bits (a odd)
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def ticket_text(ticket):
+    return f"{ticket.get('ticket_subject', '')}\n{ticket.get('ticket_description', '')}"
+
+
+def shingles(text, k=SHINGLE_WORDS):
+    """Overlapping k-word shingles of the lowercased text (the whole text if shorter)."""
+    words = _WORD.findall(str(text).lower())
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash(shingle_set):
+    """NUM_PERM-value MinHash signature (multiply-shift hashes of crc32 shingle hashes)."""
+    if not shingle_set:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64)
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) >> np.uint64(32)
+    return permuted.min(axis=0)
+
+
+def _opened_at(ticket, fallback):
+    try:
+        return datetime.datetime.strptime(str(ticket.get("first_response_time")), TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        return fallback
+
+
+# ================================
+# MinHash / LSH index
+# ================================
+class DuplicateIndex:
+    """
+    LSH buckets over MinHash signatures of ticket subject + description.
+    Candidates sharing a bucket are confirmed by estimated Jaccard
+    similarity and, when `embed_fn` (texts → vectors) is given, by cosine
+    similarity of their embeddings.
+    """
+
+    def __init__(self, embed_fn=None, bands=LSH_BANDS, min_jaccard=MIN_JACCARD, min_cosine=MIN_COSINE):
+        self.embed_fn = embed_fn
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.min_jaccard = min_jaccard
+        self.min_cosine = min_cosine
+        self._tickets = {}                # ticket_id -> (signature, ticket)
+        self._buckets = defaultdict(set)  # (band, band signature) -> ticket_ids
+        self._vectors = {}                # ticket_id -> unit embedding, computed on first comparison
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, ticket):
+        ticket_id = str(ticket["ticket_id"])
+        self.remove(ticket_id)
+        signature = minhash(shingles(ticket_text(ticket)))
+        if signature is None:
+            return
+        self._tickets[ticket_id] = (signature, ticket)
+        for key in self._band_keys(signature):
+            self._buckets[key].add(ticket_id)
+
+    def remove(self, ticket_id):
+        entry = self._tickets.pop(ticket_id, None)
+        self._vectors.pop(ticket_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(entry[0]):
+            self._buckets[key].discard(ticket_id)
+            if not self._buckets[key]:
+                del self._buckets[key]
+
+    def _unit_vectors(self, texts):
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
+
+    def find(self, ticket):
+        """
+        Best indexed near-duplicate of `ticket` as {"ticket", "jaccard",
+        "cosine"}, or None. The ticket itself and tickets for a different
+        product are never matched.
+        """
+        signature = minhash(shingles(ticket_text(ticket)))
+        if signature is None:
+            return None
+        ticket_id = str(ticket.get("ticket_id", ""))
+        product = str(ticket.get("product_purchased") or "").strip().lower()
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(ticket_id)
+
+        scored = []
+        for cid in candidates:
+            other_signature, other = self._tickets[cid]
+            other_product = str(other.get("product_purchased") or "").strip().lower()
+            if product and other_product and product != other_product:
+                continue
+            jaccard = float(np.mean(signature == other_signature))
+            if jaccard >= self.min_jaccard:
+                scored.append((jaccard, cid))
+        if not scored:
+            return None
+        scored.sort(reverse=True)
+
+        cosines = [None] * len(scored)
+        if self.embed_fn is not None:
+            missing = [cid for _, cid in scored if cid not in self._vectors]
+            if missing:
+                for cid, vec in zip(missing, self._unit_vectors([ticket_text(self._tickets[c][1]) for c in missing])):
+                    self._vectors[cid] = vec
+            query = self._unit_vectors([ticket_text(ticket)])[0]
+            cosines = [float(self._vectors[cid] @ query) for _, cid in scored]
+
+        for (jaccard, cid), cosine in zip(scored, cosines):
+            if cosine is None or cosine >= self.min_cosine:
+                return {"ticket": self._tickets[cid][1], "jaccard": round(jaccard, 3),
+                        "cosine": None if cosine is None else round(cosine, 3)}
+        return None
+
+
+# ================================
+# Detector over the ticket store
+# ================================
+def _indexable(ticket):
+    # Only tickets with something to reuse; duplicates link to their original instead
+    return bool(ticket.get("resolution")) and not ticket.get("duplicate_of")
+
+
+class DuplicateDetector:
+    """
+    Keeps a DuplicateIndex of open and recent tickets from the local ticket
+    store (tickets.db). Tickets saved by this process are added at once
+    (see add); those saved by other processes are picked up every
+    REFRESH_SECONDS. Closed tickets drop out WINDOW_DAYS after they opened,
+    tickets still open after OPEN_WINDOW_DAYS.
+    """
+
+    def __init__(self, store, embed_fn=None, window_days=WINDOW_DAYS, open_window_days=OPEN_WINDOW_DAYS):
+        self.store = store
+        self.index = DuplicateIndex(embed_fn)
+        self.window = window_days * 86400
+        self.open_window = open_window_days * 86400
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._refreshed = 0.0
+        self._opened = {}  # ticket_id -> (opened timestamp, ticket), for expiry
+
+    def _active(self, ticket, opened, now):
+        closed = str(ticket.get("ticket_status", "")).strip().lower() == "closed"
+        return now - opened <= (self.window if closed else self.open_window)
+
+    def _index(self, ticket, updated_at, now):
+        ticket_id = str(ticket["ticket_id"])
+        opened = _opened_at(ticket, updated_at)
+        if _indexable(ticket) and self._active(ticket, opened, now):
+            self.index.add(ticket)
+            self._opened[ticket_id] = (opened, ticket)
+        else:
+            self.index.remove(ticket_id)
+            self._opened.pop(ticket_id, None)
+
+    def add(self, ticket):
+        """
+        Index a ticket this process just saved, so a resubmission right
+        after it is matched without waiting for the next refresh.
+        """
+        now = time.time()
+        with self._lock:
+            self._index(dict(ticket), now, now)
+
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - self._refreshed < REFRESH_SECONDS:
+            return
+        for updated_at, ticket in self.store.updated_since(self._synced_at):
+            self._index(ticket, updated_at, now)
+            self._synced_at = max(self._synced_at, updated_at)
+        for ticket_id, (opened, ticket) in list(self._opened.items()):
+            if not self._active(ticket, opened, now):
+                self.index.remove(ticket_id)
+                del self._opened[ticket_id]
+        self._refreshed = now
+
+    def find(self, ticket):
+        """
+        {"ticket", "jaccard", "cosine", "reason"} for the ticket's original,
+        or None when it is not a near-duplicate.
+        """
+        with self._lock:
+            self.refresh()
+            match = self.index.find(ticket)
+        if match is None:
+            return None
+        same_customer = (str(ticket.get("customer_email") or "").strip().lower()
+                         == str(match["ticket"].get("customer_email") or "").strip().lower() != "")
+        match["reason"] = SAME_CUSTOMER if same_customer else NEAR_DUPLICATE
+        telemetry.count("duplicates_detected", reason=match["reason"])
+        return match
+
+
+def apply_duplicate(ticket, match):
+    """
+    Link `ticket` to its original. A same-customer resubmission also reuses
+    the original's resolution, tags and agent; another customer's ticket is
+    only linked, as the original's resolution may draw on its customer's
+    history. Returns True when the resolution was reused (nothing left to
+    generate).
+    """
+    original = match["ticket"]
+    ticket["duplicate_of"] = str(original["ticket_id"])
+    ticket["duplicate_reason"] = match["reason"]
+    if match["reason"] != SAME_CUSTOMER:
+        return False
+    for field in REUSED_FIELDS:
+        ticket[field] = ticket.get(field) or original.get(field, "")
+    ticket["ticket_status"] = "Open"
+    return True
@@ -0,0 +1,241 @@
+# hybrid_retriever.py
+import os
+import re
+import json
+import math
+import time
+import hashlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+import telemetry
+
+# ================================
+# Configuration
+# ================================
+BM25_FILE = "bm25.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = int(os.getenv("KB_RRF_K", "60"))
+FETCH_K = int(os.getenv("KB_FETCH_K", "20"))  # candidates taken from each retriever before fusion
+RERANK_BUDGET_MS = float(os.getenv("KB_RERANK_BUDGET_MS", "150"))
+RERANK_BATCH = 8
+
+SECTION_HEADING = re.compile(r"^(\d+)\.\s+(\S.*)$", re.MULTILINE)
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how i if in is it its my of on or our "
+    "that the their this to was we were what when where which will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase alphanumeric terms ("2FA" → "2fa"), stopwords dropped, plural "s" stripped."""
+    terms = []
+    for term in _TOKEN.findall(str(text).lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+# ================================
+# Section metadata
+# ================================
+def split_sections(text):
+    """
+    (section_number, title, start offset, section text) for each numbered
+    heading ("2. Billing & Payments") in `text`. Text before the first
+    heading, or a file without headings, becomes section 0.
+    """
+    matches = list(SECTION_HEADING.finditer(text))
+    if not matches:
+        return [(0, "", 0, text)]
+    sections = []
+    if text[:matches[0].start()].strip():
+        sections.append((0, "", 0, text[:matches[0].start()]))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append((int(match.group(1)), match.group(2).strip(), match.start(), text[match.start():end]))
+    return sections
+
+
+# ================================
+# BM25 inverted index
+# ================================
+class BM25Index:
+    """
+    Okapi BM25 over the KB chunks, keyed by FAISS docstore ID. Built by
+    build_kb.py and stored next to the FAISS files as bm25.json.
+    """
+
+    def __init__(self, doc_ids, postings, doc_len, k1=BM25_K1, b=BM25_B):
+        self.doc_ids = doc_ids
+        self.postings = postings  # term -> [[doc position, term frequency], ...]
+        self.doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_len.mean()) if len(doc_len) else 0.0
+        n = len(doc_ids)
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+    @classmethod
+    def build(cls, doc_ids, texts):
+        postings = defaultdict(list)
+        doc_len = []
+        for pos, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            doc_len.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings[term].append([pos, tf])
+        return cls(list(doc_ids), dict(postings), doc_len)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        doc_ids = list(vectorstore.index_to_docstore_id.values())
+        return cls.build(doc_ids, [vectorstore.docstore.search(i).page_content for i in doc_ids])
+
+    @staticmethod
+    def fingerprint(doc_ids):
+        return hashlib.sha256("\n".join(sorted(doc_ids)).encode("utf-8")).hexdigest()
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": self.fingerprint(self.doc_ids),
+                "k1": self.k1, "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_len": self.doc_len.astype(int).tolist(),
+                "postings": self.postings,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["doc_ids"], data["postings"], data["doc_len"], data["k1"], data["b"])
+
+    def search(self, query, k):
+        """[(docstore ID, score)] for the top-k chunks sharing terms with `query`."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for pos, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[pos] / self.avgdl)
+                scores[pos] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(self.doc_ids[pos], float(score)) for pos, score in best]
+
+
+# ================================
+# Hybrid retriever
+# ================================
+def _matches(metadata, filter):
+    for key, wanted in filter.items():
+        value = metadata.get(key)
+        if isinstance(wanted, (list, tuple, set)):
+            if value not in wanted:
+                return False
+        elif value != wanted:
+            return False
+    return True
+
+
+class HybridRetriever:
+    """
+    Dense (FAISS) + lexical (BM25) retrieval fused with reciprocal-rank
+    fusion, an optional metadata filter, and an optional cross-encoder
+    reranker that stops scoring once its latency budget is spent.
+    Created once per loaded vector store (see resources.get_kb_retriever).
+    """
+
+    def __init__(self, vectorstore, bm25, reranker=None, rerank_budget_ms=RERANK_BUDGET_MS):
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+        self.reranker = reranker
+        self.rerank_budget_ms = rerank_budget_ms
+
+    @classmethod
+    def load(cls, vectorstore, index_dir=None, reranker=None):
+        """Use index_dir/bm25.json when it matches the store's chunks, else build BM25 in memory."""
+        path = os.path.join(index_dir, BM25_FILE) if index_dir else None
+        bm25 = None
+        if path and os.path.exists(path):
+            bm25 = BM25Index.load(path)
+            if BM25Index.fingerprint(bm25.doc_ids) != BM25Index.fingerprint(vectorstore.index_to_docstore_id.values()):
+                bm25 = None
+        if bm25 is None:
+            bm25 = BM25Index.from_vectorstore(vectorstore)
+        return cls(vectorstore, bm25, reranker)
+
+    def _dense(self, query, k, query_vector=None):
+        if query_vector is None:
+            query_vector = self.vectorstore.embeddings.embed_query(query)
+        vec = np.asarray([query_vector], dtype=np.float32)
+        _, positions = self.vectorstore.index.search(vec, min(k, self.vectorstore.index.ntotal))
+        return [self.vectorstore.index_to_docstore_id[p] for p in positions[0] if p >= 0]
+
+    def retrieve(self, query, top_k=3, filter=None, fetch_k=FETCH_K, rerank=True, query_vector=None):
+        """
+        Top-k KB chunks (langchain Documents) for `query`. `filter` keeps
+        only chunks whose metadata matches, e.g. {"section_number": 2} or
+        {"section": ["Billing & Payments", "Feature Requests"]}.
+        `query_vector` skips embedding `query` when the caller already
+        embedded it (e.g. in a batch). With a filter, the candidate count
+        doubles until top_k chunks match (or the whole KB was searched).
+        """
+        if filter and query_vector is None:
+            query_vector = self.vectorstore.embeddings.embed_query(query)  # once for every round
+        total = self.vectorstore.index.ntotal
+        while True:
+            docs = self._fused(query, fetch_k, query_vector, filter)
+            if not filter or len(docs) >= top_k or fetch_k >= total:
+                break
+            fetch_k = min(fetch_k * 2, total)
+
+        if rerank and self.reranker is not None and len(docs) > 1:
+            docs = self._rerank(query, docs[:max(fetch_k, top_k)])
+        return docs[:top_k]
+
+    def _fused(self, query, fetch_k, query_vector, filter):
+        ranked_lists = [
+            self._dense(query, fetch_k, query_vector),
+            [doc_id for doc_id, _ in self.bm25.search(query, fetch_k)],
+        ]
+        fused = defaultdict(float)
+        for ranked in ranked_lists:
+            for rank, doc_id in enumerate(ranked):
+                fused[doc_id] += 1.0 / (RRF_K + rank + 1)
+        docs = []
+        for doc_id in sorted(fused, key=lambda d: -fused[d]):
+            doc = self.vectorstore.docstore.search(doc_id)
+            if filter and not _matches(doc.metadata, filter):
+                continue
+            docs.append(doc)
+        return docs
+
+    def _rerank(self, query, docs):
+        """
+        Cross-encoder scores in small batches, best-first within what was
+        scored before the budget ran out; unscored docs keep fused order.
+        """
+        with telemetry.span("rerank"):
+            deadline = time.perf_counter() + self.rerank_budget_ms / 1000
+            scored = []
+            for start in range(0, len(docs), RERANK_BATCH):
+                batch = docs[start:start + RERANK_BATCH]
+                scores = self.reranker.predict([(query, d.page_content) for d in batch])
+                scored.extend(zip(scores, range(start, start + len(batch))))
+                if time.perf_counter() > deadline:
+                    telemetry.count("kb_rerank_budget_exceeded")
+                    break
+            order = [i for _, i in sorted(scored, key=lambda s: -s[0])]
+            return [docs[i] for i in order] + docs[len(scored):]
@@ -0,0 +1,191 @@
+# kb_registry.py
+import os
+import json
+import argparse
+import threading
+from collections import OrderedDict, defaultdict
+
+import telemetry
+from hybrid_retriever import RRF_K
+
+# ================================
+# Configuration
+# ================================
+# One KB per product line / department under kb_shards/<name>/ (same files
+# as faiss_store, built with `python build_kb.py --shard <name> ...`), plus
+# kb_shards/registry.json mapping products and ticket categories to shards.
+# Tickets that match no shard use the global faiss_store as before.
+SHARDS_DIR = os.getenv("KB_SHARDS_DIR", "kb_shards")
+REGISTRY_FILE = "registry.json"
+SHARD_CACHE_MB = float(os.getenv("KB_SHARD_CACHE_MB", "512"))  # loaded shards kept within this size
+SHARD_FILES = ("index.faiss", "chunks.bin", "bm25.json")
+
+
+def _key(value):
+    return str(value or "").strip().lower()
+
+
+def shard_dir(name, shards_dir=SHARDS_DIR):
+    return os.path.join(shards_dir, name)
+
+
+def shard_size(path):
+    """On-disk size of a shard's index files, used as its memory estimate."""
+    from vector_format import current_dir
+    path = current_dir(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in SHARD_FILES if os.path.exists(os.path.join(path, f)))
+
+
+# ================================
+# Registry file
+# ================================
+def load_registry(shards_dir=SHARDS_DIR):
+    """{"shards": {name: {"products": [...], "categories": [...]}}} ({} shards if there is no registry)."""
+    path = os.path.join(shards_dir, REGISTRY_FILE)
+    if not os.path.exists(path):
+        return {"shards": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def register_shard(name, products=(), categories=(), shards_dir=SHARDS_DIR):
+    """Add or update a shard's routing entry in registry.json (written atomically)."""
+    registry = load_registry(shards_dir)
+    entry = registry["shards"].setdefault(name, {"products": [], "categories": []})
+    entry["products"] = sorted(set(entry["products"]) | set(products))
+    entry["categories"] = sorted(set(entry["categories"]) | set(categories))
+    os.makedirs(shards_dir, exist_ok=True)
+    path = os.path.join(shards_dir, REGISTRY_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return entry
+
+
+# ================================
+# Sharded retrieval
+# ================================
+class KBRegistry:
+    """
+    Routes a ticket to the KB shard(s) for its product / category and
+    merges their results. Shards are loaded on first use and kept in an
+    LRU bounded by `cache_mb` of index files; the coldest are evicted.
+    """
+
+    def __init__(self, load_shard, shards_dir=SHARDS_DIR, cache_mb=SHARD_CACHE_MB):
+        self.load_shard = load_shard  # shard directory -> HybridRetriever
+        self.shards_dir = shards_dir
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self._lock = threading.RLock()
+        self._loaded = OrderedDict()  # name -> (version, size, retriever)
+        self._routes = None
+        self._routes_version = None
+
+    # -------------------------------
+    # Routing
+    # -------------------------------
+    def _routing(self):
+        path = os.path.join(self.shards_dir, REGISTRY_FILE)
+        version = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        with self._lock:
+            if self._routes is None or version != self._routes_version:
+                routes = {"products": defaultdict(list), "categories": defaultdict(list)}
+                for name, entry in load_registry(self.shards_dir)["shards"].items():
+                    for product in entry.get("products", []):
+                        routes["products"][_key(product)].append(name)
+                    for category in entry.get("categories", []):
+                        routes["categories"][_key(category)].append(name)
+                self._routes, self._routes_version = routes, version
+            return self._routes
+
+    def route(self, product=None, category=None):
+        """Shard names for a ticket: product matches first, then category matches; [] if none."""
+        routes = self._routing()
+        names = routes["products"].get(_key(product), []) + routes["categories"].get(_key(category), [])
+        return list(dict.fromkeys(names))
+
+    # -------------------------------
+    # Shard cache
+    # -------------------------------
+    def get(self, name):
+        """Retriever for one shard, loading it (and evicting cold shards) as needed."""
+        from response_cache import index_version
+
+        path = shard_dir(name, self.shards_dir)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"❌ KB shard '{name}' not found in {self.shards_dir}. "
+                                    f"Run build_kb.py --shard {name} first.")
+        version = index_version(path)
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached is not None and cached[0] == version:
+                self._loaded.move_to_end(name)
+                telemetry.count("kb_shard_cache", result="hit")
+                return cached[2]
+            telemetry.count("kb_shard_cache", result="miss")
+            self._loaded[name] = (version, shard_size(path), self.load_shard(path))
+            self._loaded.move_to_end(name)
+            self._evict()
+            return self._loaded[name][2]
+
+    def _evict(self):
+        while len(self._loaded) > 1 and self.loaded_bytes() > self.cache_bytes:
+            # Not closed here: a query may still hold it; its mmap is released with the last reference
+            name, _ = self._loaded.popitem(last=False)
+            telemetry.count("kb_shard_evictions")
+            print(f"♻️ Evicted KB shard '{name}'")
+
+    def loaded_bytes(self):
+        return sum(size for _, size, _ in self._loaded.values())
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    # -------------------------------
+    # Retrieval
+    # -------------------------------
+    @staticmethod
+    def _tagged(doc, name):
+        # A copy: the shard's Documents are shared by every query through its cached retriever
+        return type(doc)(page_content=doc.page_content, metadata={**doc.metadata, "kb_shard": name})
+
+    def retrieve(self, query, shards, top_k=3, filter=None, query_vector=None):
+        """
+        Top-k chunks across `shards`, merged with reciprocal-rank fusion so
+        no shard's score scale dominates. Each returned Document is a copy
+        carrying its shard name in metadata["kb_shard"].
+        """
+        if len(shards) == 1:
+            docs = self.get(shards[0]).retrieve(query, top_k=top_k, filter=filter, query_vector=query_vector)
+            return [self._tagged(doc, shards[0]) for doc in docs]
+
+        fused, docs_by_key = defaultdict(float), {}
+        for name in shards:
+            docs = self.get(name).retrieve(query, top_k=top_k, filter=filter, query_vector=query_vector)
+            for rank, doc in enumerate(docs):
+                key = (name, doc.page_content)
+                docs_by_key[key] = self._tagged(doc, name)
+                fused[key] += 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused, key=lambda k: -fused[k])[:top_k]
+        return [docs_by_key[key] for key in best]
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the KB shard registry and how tickets are routed.")
+    parser.add_argument("--shards-dir", default=SHARDS_DIR)
+    parser.add_argument("--product", help="Show the shard(s) a ticket for this product is routed to")
+    parser.add_argument("--category", help="Show the shard(s) a ticket of this category is routed to")
+    args = parser.parse_args()
+
+    shards = load_registry(args.shards_dir)["shards"]
+    if not shards:
+        print(f"ℹ️ No KB shards registered in {args.shards_dir}/; every ticket uses faiss_store")
+    for name, entry in sorted(shards.items()):
+        size_mb = shard_size(shard_dir(name, args.shards_dir)) / 1024 / 1024
+        print(f"📚 {name} ({size_mb:.1f} MB): products {entry.get('products', [])}, "
+              f"categories {entry.get('categories', [])}")
+    if args.product or args.category:
+        registry = KBRegistry(load_shard=None, shards_dir=args.shards_dir)
+        print(f"➡️ Routed to: {registry.route(args.product, args.category) or ['faiss_store']}")
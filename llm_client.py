@@ -0,0 +1,224 @@
+# llm_client.py
+import os
+import time
+import random
+import threading
+
+import telemetry
+
+# ================================
+# Configuration
+# ================================
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # e.g. a local OpenAI-compatible stand-in server
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 = unlimited
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+
+RETRYABLE_STATUS = {408, 429}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for rate limiting and budgeting."""
+    return max(1, len(text or "") // 4)
+
+
+# ================================
+# Rate limiting
+# ================================
+class TokenBucket:
+    """Blocking token-per-minute limiter shared by all threads."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n):
+        n = min(float(n), self.capacity)  # a single huge request must still be able to proceed
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ================================
+# Backends
+# ================================
+class GroqBackend:
+    """
+    One Groq SDK client over a keep-alive httpx connection pool. `base_url`
+    points it at any OpenAI-compatible server (e.g. a local stand-in).
+    SDK-level retries are disabled; LLMClient owns the retry policy.
+    """
+
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, timeout=LLM_TIMEOUT, pool_size=LLM_POOL_SIZE):
+        import httpx
+        from groq import Groq
+
+        http_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60,
+            ),
+        )
+        self.client = Groq(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=http_client,
+        )
+
+    def create(self, **kwargs):
+        return self.client.chat.completions.create(**kwargs)
+
+
+BACKENDS = {"groq": GroqBackend}
+
+
+def register_backend(name, factory):
+    """Make a backend selectable with LLM_BACKEND=<name>; factory(**kwargs) → object with create(**kwargs)."""
+    BACKENDS[name] = factory
+
+
+# ================================
+# Shared client
+# ================================
+class LLMError(Exception):
+    """
+    An LLM call failed for good (non-retryable error, or retries exhausted),
+    whatever the backend. The backend's own exception is its __cause__.
+    """
+
+
+def _is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    The one LLM entry point for rag.py: bounded concurrency, optional
+    token-rate limiting, per-call timeouts (in the backend) and jittered
+    exponential-backoff retries on 429/5xx/connection errors.
+    """
+
+    def __init__(self, backend, max_retries=LLM_MAX_RETRIES, max_concurrency=LLM_MAX_CONCURRENCY,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE, backoff_base=0.5, backoff_cap=20.0):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+        telemetry.count(f"llm_{key}", n)
+
+    def _record_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._count("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+            self._count("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+    def _backoff(self, attempt, error):
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        time.sleep(max(delay, _retry_after(error) or 0))
+
+    def complete(self, messages, model, stream=False, max_tokens=None, **kwargs):
+        """
+        Chat completion with the shared retry/limit policy. Returns the backend
+        response, or for stream=True an iterator of chunks that holds its
+        concurrency slot until it is exhausted or closed. Raises LLMError
+        when the call fails for good.
+        """
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if self._bucket is not None:
+            prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+            self._bucket.acquire(prompt_tokens + (max_tokens or 256))
+
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._slots.acquire()
+            try:
+                response = self.backend.create(messages=messages, model=model, stream=stream, **kwargs)
+            except Exception as e:
+                self._slots.release()
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise LLMError(f"{type(e).__name__}: {e}") from e
+                self._count("retries")
+                self._backoff(attempt, e)
+                continue
+
+            if stream:
+                return _SlotStream(self, response)
+            self._slots.release()
+            self._record_usage(response)
+            return response
+
+
+class _SlotStream:
+    """Chunk iterator that releases its LLMClient concurrency slot exactly once."""
+
+    def __init__(self, client, response):
+        self._client = client
+        self._chunks = iter(response)
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+        x_groq = getattr(chunk, "x_groq", None)  # Groq reports usage on the last chunk
+        if x_groq is not None:
+            self._client._record_usage(x_groq)
+        return chunk
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._client._slots.release()
+
+    def __del__(self):
+        self.close()
+
+
+def create_llm_client(backend=LLM_BACKEND, **backend_kwargs):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}'. Registered: {', '.join(BACKENDS)}")
+    return LLMClient(BACKENDS[backend](**backend_kwargs))
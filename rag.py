@@ -1,35 +1,38 @@
 import os
 import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from langchain_community.vectorstores import FAISS
-from groq import Groq
-from dotenv import load_dotenv
-from langchain_community.embeddings import HuggingFaceEmbeddings
 import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import telemetry
+from llm_client import LLMError
+from resources import (
+    get_vector_store, get_kb_retriever, get_llm_client, get_sheet, get_response_cache,
+    get_ticket_index, get_ticket_classifier, get_ticket_store, get_sheet_syncer,
+    get_kb_registry, get_duplicate_detector
+)
+# groq, langchain/FAISS, numpy, pandas and gspread are imported inside the
+# functions that need them, and Google Sheets is only authorized on first
+# use, so `import rag` is cheap (see benchmarks/import_budget.py).
 
 # ================================
 # Load environment variables
 # ================================
-load_dotenv()
+# resources.py calls load_dotenv() before anything reads the environment
 groq_key = os.getenv("GROQ_API_KEY")
 gemini_key = os.getenv("GOOGLE_API_KEY")
 
 # ================================
 # Google Sheets Setup
 # ================================
-SHEET_NAME = "TicketDatabase"
-WORKSHEET = "Sheet2"
+# `sheet`, `ticket_store` and `sheet_syncer` stay importable from rag but are
+# created on first access (PEP 562); new code should call the getters.
+_LAZY_HANDLES = {"sheet": get_sheet, "ticket_store": get_ticket_store, "sheet_syncer": get_sheet_syncer}
 
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
-creds = ServiceAccountCredentials.from_json_keyfile_name(
-    "credentials/credentials.json", scope
-)
-gc = gspread.authorize(creds)
-sheet = gc.open(SHEET_NAME).worksheet(WORKSHEET)
+def __getattr__(name):
+    if name in _LAZY_HANDLES:
+        return _LAZY_HANDLES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ================================
 # Static Keyword Mapping for fallback
@@ -40,28 +43,67 @@ AGENT_MAPPING = {
     "Engineering": ["bug", "error", "technical", "login", "feature"]
 }
 
+# Ticket types predicted by the local classifier → agent
+CATEGORY_AGENT = {
+    "Billing inquiry": "Sales",
+    "Refund request": "Sales",
+    "Cancellation request": "Sales",
+    "Technical issue": "Engineering",
+    "Product inquiry": "General Support"
+}
+
 # ================================
 # FAISS Vector Store Functions
 # ================================
 def load_vector_store():
-    if not os.path.exists("faiss_store"):
-        raise FileNotFoundError("❌ faiss_store not found. Run build_kb.py first.")
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.load_local("faiss_store", embeddings, allow_dangerous_deserialization=True)
-    return vectorstore
-
-def query_kb(query, vectorstore, top_k=3):
-    retriever = vectorstore.as_retriever(search_kwargs={"k": top_k})
-    docs = retriever.get_relevant_documents(query)
+    """Shared FAISS store; cheap to call on every Streamlit rerun (see resources.py)."""
+    return get_vector_store()
+
+@telemetry.traced("retrieval")
+def retrieve_kb(query, vectorstore, top_k=3, filter=None, product=None, category=None, query_vector=None):
+    """
+    Top-k KB chunks from the hybrid retriever: BM25 + FAISS fused with
+    reciprocal-rank fusion, optionally filtered on chunk metadata
+    (e.g. {"section_number": 2}) and reranked (KB_RERANKER).
+    When kb_shards/registry.json routes the ticket's product or category
+    to one or more KB shards, those are searched (and merged) instead of
+    `vectorstore`. `query_vector` is the query's embedding when the caller
+    has already computed it (e.g. batched in retriage.py).
+    """
+    if product or category:
+        registry = get_kb_registry()
+        shards = registry.route(product, category)
+        if shards:
+            return registry.retrieve(query, shards, top_k=top_k, filter=filter, query_vector=query_vector)
+    return get_kb_retriever(vectorstore).retrieve(query, top_k=top_k, filter=filter, query_vector=query_vector)
+
+def query_kb(query, vectorstore, top_k=3, filter=None, product=None, category=None):
+    docs = retrieve_kb(query, vectorstore, top_k=top_k, filter=filter, product=product, category=category)
     context = "\n\n".join([d.page_content for d in docs])
     return context
 
+@telemetry.traced("similar_tickets")
+def find_similar_tickets(subject, description, product="", top_k=3, query_vector=None, exclude_ids=()):
+    """
+    Top-k similar resolved historical tickets ([] if ticket_index is not
+    built). `query_vector` is the embedding of ticket_csv.ticket_text(subject,
+    description, product) when the caller already computed it. Pass the
+    ticket's own ID in `exclude_ids` when it may be in the index (e.g.
+    re-triaging the CSV the index was built from), so it is not returned
+    as its own similar ticket.
+    """
+    ticket_index = get_ticket_index()
+    if ticket_index is None:
+        return []
+    if query_vector is not None:
+        return ticket_index.search_by_vector(query_vector, top_k=top_k, exclude_ids=exclude_ids)
+    return ticket_index.search(subject, description, product, top_k=top_k, exclude_ids=exclude_ids)
+
 # ================================
 # LLM Functions
 # ================================
-def ask_llm(query, context):
-    client = Groq(api_key=groq_key)
-    prompt = f"""
+def _resolution_prompt(query, context):
+    return f"""
 You are a helpful AI assistant for customer support.
 Use the following context from the knowledge base to answer the question.
 
@@ -73,15 +115,79 @@ Question:
 
 Answer in a concise and professional way:
 """
-    chat_completion = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
+
+@telemetry.traced("generation")
+def ask_llm(query, context, cache=None, cache_key=None):
+    """
+    Generates a resolution from the KB context.
+    With a SemanticCache, near-identical queries over the same context
+    are answered from the cache instead of a new generation. `cache_key`
+    (response_cache.cache_key over the same KB chunks, similar tickets and
+    history) replaces `context` as the cache context.
+    """
+    cache_context = context if cache_key is None else cache_key
+    if cache is not None:
+        cached, query_vec = cache.lookup(query, cache_context)
+        if cached is not None:
+            return cached
+
+    chat_completion = get_llm_client().complete(
+        messages=[{"role": "user", "content": _resolution_prompt(query, context)}],
         model="llama-3.1-8b-instant",
         temperature=0.4
     )
-    return chat_completion.choices[0].message.content.strip()
+    answer = chat_completion.choices[0].message.content.strip()
+    if cache is not None:
+        cache.store(query, cache_context, answer, vec=query_vec)
+    return answer
+
+def ask_llm_stream(query, context, cache=None, cache_key=None):
+    """
+    Streaming variant of ask_llm: yields text fragments as Groq produces them.
+    A cache hit is yielded in one piece; a full generation is cached once the
+    stream completes.
+    """
+    cache_context = context if cache_key is None else cache_key
+    with telemetry.span("generation"):
+        if cache is not None:
+            cached, query_vec = cache.lookup(query, cache_context)
+            if cached is not None:
+                yield cached
+                return
+
+        stream = get_llm_client().complete(
+            messages=[{"role": "user", "content": _resolution_prompt(query, context)}],
+            model="llama-3.1-8b-instant",
+            temperature=0.4,
+            stream=True
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        if cache is not None:
+            cache.store(query, cache_context, "".join(parts).strip(), vec=query_vec)
+
+def classify_locally(subject, description, product=""):
+    """
+    Local classifier fast path: {category, priority, confidence} when the
+    model is trained and confident, else None (→ use the LLM). `product`
+    fills the dataset's {product_purchased} placeholder, as in training.
+    """
+    classifier = get_ticket_classifier()
+    if classifier is None:
+        return None
+    return classifier.predict(subject, description, product)
+
+@telemetry.traced("categorization")
+def categorize_ticket(subject, description, product=""):
+    local = classify_locally(subject, description, product)
+    if local:
+        return {"category": local["category"], "priority": local["priority"], "status": "Open"}
 
-def categorize_ticket(subject, description):
-    client = Groq(api_key=groq_key)
     prompt = f"""
 You are a customer support assistant.
 Categorize the ticket based on subject and description.
@@ -90,7 +196,7 @@ Return a JSON with keys: category, priority, status.
 Ticket Subject: {subject}
 Ticket Description: {description}
 """
-    response = client.chat.completions.create(
+    response = get_llm_client().complete(
         messages=[{"role": "user", "content": prompt}],
         model="llama-3.1-8b-instant",
         temperature=0
@@ -98,14 +204,37 @@ Ticket Description: {description}
     try:
         output = json.loads(response.choices[0].message.content)
         return output
-    except:
+    except (ValueError, TypeError):
         return {"category": "General", "priority": "Medium", "status": "Open"}
 
 # ================================
 # Agent Assignment
 # ================================
+AGENTS = ["Sales", "Marketing", "Engineering", "General Support"]
+
+def normalize_agent(agent_name):
+    """Map free-form LLM output onto one of AGENTS (General Support if none match)."""
+    agent_name = str(agent_name or "").strip().lower()
+    return next((a for a in AGENTS if a.lower() in agent_name), "General Support")
+
+def keyword_agent(category, description):
+    """Fallback keyword scoring; returns None when no AGENT_MAPPING keyword matches."""
+    text = f"{category} {description}".lower()
+    scores = {agent: 0 for agent in AGENT_MAPPING}
+    for agent, keywords in AGENT_MAPPING.items():
+        for k in keywords:
+            if k.lower() in text:
+                scores[agent] += 1
+    if max(scores.values()) > 0:
+        return max(scores, key=scores.get)
+    return None
+
+@telemetry.traced("assignment")
 def assign_agent(category, description, context=""):
-    client = Groq(api_key=groq_key)
+    if category in CATEGORY_AGENT:
+        # Category came from the local classifier; no LLM call needed
+        return keyword_agent(category, description) or CATEGORY_AGENT[category]
+
     prompt = f"""
 You are an AI assistant for a customer support system.
 Assign the ticket to the most suitable agent from this list ONLY:
@@ -124,99 +253,283 @@ Previous Customer Tickets (if any):
 Return ONLY one of these exact agent names as plain text.
 """
     try:
-        response = client.chat.completions.create(
+        response = get_llm_client().complete(
             messages=[{"role": "user", "content": prompt}],
             model="llama-3.1-8b-instant",
             temperature=0
         )
-        agent_name = response.choices[0].message.content.strip().lower()
-        # Normalize LLM output
-        mapping = {
-            "sales": "Sales",
-            "marketing": "Marketing",
-            "engineering": "Engineering",
-            "general support": "General Support"
-        }
-        agent_name = next((v for k, v in mapping.items() if k in agent_name), "General Support")
+        agent_name = normalize_agent(response.choices[0].message.content)
     except Exception:
         agent_name = "General Support"
 
-    # Fallback keyword scoring
-    text = f"{category} {description}".lower()
-    scores = {agent: 0 for agent in AGENT_MAPPING}
-    for agent, keywords in AGENT_MAPPING.items():
-        for k in keywords:
-            if k.lower() in text:
-                scores[agent] += 1
-    if max(scores.values()) > 0:
-        agent_name = max(scores, key=scores.get)
-
-    return agent_name
-
-# ================================
-# Google Sheets Headers
-# ================================
-HEADERS = [
-    "ticket_id",
-    "customer_name",
-    "customer_email",
-    "customer_age",
-    "customer_gender",
-    "product_purchased",
-    "date_of_purchase",
-    "ticket_type",
-    "ticket_subject",
-    "ticket_description",
-    "ticket_status",
-    "resolution",
-    "ticket_priority",
-    "ticket_channel",
-    "first_response_time",
-    "customer_satisfaction_rating",
-    "assigned_agent"
-]
+    return keyword_agent(category, description) or agent_name
+
+# ================================
+# Single-pass Triage (category + priority + status + agent)
+# ================================
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+STATUSES = ["Open", "In Progress", "Closed"]
+DEFAULT_TRIAGE = {"category": "General", "priority": "Medium", "status": "Open", "agent": "General Support"}
+
+def _pick(value, allowed, default):
+    value = str(value or "").strip().lower()
+    return next((a for a in allowed if a.lower() == value), default)
+
+def validate_triage(raw):
+    """
+    Coerce LLM JSON into {category, priority, status, agent}.
+    Unknown or missing fields fall back to DEFAULT_TRIAGE individually.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError(f"expected a JSON object, got {type(raw).__name__}")
+    category = raw.get("category")
+    return {
+        "category": category.strip() if isinstance(category, str) and category.strip() else DEFAULT_TRIAGE["category"],
+        "priority": _pick(raw.get("priority"), PRIORITIES, DEFAULT_TRIAGE["priority"]),
+        "status": _pick(raw.get("status"), STATUSES, DEFAULT_TRIAGE["status"]),
+        "agent": normalize_agent(raw.get("agent")),
+    }
+
+@telemetry.traced("triage")
+def triage_ticket(subject, description, context="", product=""):
+    """
+    One LLM call that returns category, priority, status and agent together,
+    replacing categorize_ticket + assign_agent. The AGENT_MAPPING keyword
+    fallback still overrides the agent, and DEFAULT_TRIAGE is used when the
+    call or its JSON fails. Confident local-classifier predictions skip the
+    LLM entirely.
+    """
+    local = classify_locally(subject, description, product)
+    if local:
+        triage = {
+            "category": local["category"],
+            "priority": local["priority"],
+            "status": "Open",
+            "agent": CATEGORY_AGENT.get(local["category"], "General Support"),
+        }
+        triage["agent"] = keyword_agent(triage["category"], description) or triage["agent"]
+        return triage
+
+    prompt = f"""
+You are a customer support triage assistant.
+Read the ticket and return a JSON object with exactly these keys:
+
+- "category": short ticket category (e.g. Billing, Technical Issue, Refund, Account)
+- "priority": one of {", ".join(PRIORITIES)}
+- "status": one of {", ".join(STATUSES)}
+- "agent": one of {", ".join(AGENTS)}
+
+Ticket Subject: {subject}
+Ticket Description: {description}
+
+Previous Customer Tickets and Knowledge Base (if any):
+{context if context else 'None'}
+"""
+    try:
+        response = get_llm_client().complete(
+            messages=[{"role": "user", "content": prompt}],
+            model="llama-3.1-8b-instant",
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        triage = validate_triage(json.loads(response.choices[0].message.content))
+    except (LLMError, ValueError, TypeError) as e:
+        # TypeError: a response without message content
+        telemetry.count("triage_fallback", reason="llm_error" if isinstance(e, LLMError) else "invalid_response")
+        triage = dict(DEFAULT_TRIAGE)
+
+    triage["agent"] = keyword_agent(triage["category"], description) or triage["agent"]
+    return triage
 
 # ================================
 # Save or Update Ticket in Google Sheets
 # ================================
+@telemetry.traced("save")
 def save_ticket_to_sheets(ticket):
     """
-    Saves a ticket to Google Sheets. 
-    Updates the row if ticket_id exists; otherwise appends a new row.
+    Saves a ticket to the local ticket store (tickets.db).
+    The background SheetSyncer pushes it to Google Sheets in batched
+    range updates: existing rows are updated, new ones appended.
+    A new resubmission that reused its original's resolution is first saved
+    locally only, as the original's row already represents it; once it
+    changes again (e.g. closed and rated) it is synced like any other ticket.
     """
-    ticket_ids = sheet.col_values(1)  # Column A = ticket_id
-    try:
-        row_index = ticket_ids.index(ticket["ticket_id"]) + 1
-        for col_index, header in enumerate(HEADERS, start=1):
-            sheet.update_cell(row_index, col_index, ticket.get(header, ""))
-    except ValueError:
-        # Ticket ID not found → append new row
-        row = [ticket.get(h, "") for h in HEADERS]
-        sheet.append_row(row)
+    from dedup import DEDUP_ENABLED, SAME_CUSTOMER
+
+    store = get_ticket_store()
+    if ticket.get("duplicate_reason") == SAME_CUSTOMER and store.get(ticket["ticket_id"]) is None:
+        store.save(ticket, sync=False)
+    else:
+        store.save(ticket)
+        get_sheet_syncer().start()
+    if DEDUP_ENABLED:
+        # Indexed at once so a quick resubmission is caught before the next refresh
+        get_duplicate_detector().add(ticket)
+
+# ================================
+# Customer History Lookup
+# ================================
+_bootstrap_lock = threading.Lock()
+
+def bootstrap_ticket_store():
+    """
+    One-time import of the rows already in Google Sheets into the local
+    store, so the customer-history index also covers older tickets.
+    """
+    ticket_store = get_ticket_store()
+    with _bootstrap_lock:
+        if ticket_store.get_meta("sheet_imported"):
+            return
+        telemetry.count("sheets_api_calls", method="get_all_records")
+        imported = ticket_store.import_rows(get_sheet().get_all_records())
+        ticket_store.set_meta("sheet_imported", datetime.datetime.now().isoformat())
+        print(f"✅ Imported {imported} ticket(s) from Google Sheets into {ticket_store.path}")
+
+@telemetry.traced("history")
+def get_customer_history(customer_email, limit=None):
+    """Previous tickets for a customer from the indexed local store."""
+    bootstrap_ticket_store()
+    return get_ticket_store().customer_history(customer_email, limit=limit)
+
+def load_ticket_snapshot(columns=None):
+    """
+    Typed Parquet snapshot of all tickets for analytics, rewritten from the
+    local store only when tickets changed since it was last written.
+    """
+    from ticket_snapshot import SNAPSHOT_PATH, load_snapshot, write_snapshot, snapshot_is_fresh
+
+    bootstrap_ticket_store()
+    ticket_store = get_ticket_store()
+    if not snapshot_is_fresh(SNAPSHOT_PATH, ticket_store.last_updated()):
+        write_snapshot(ticket_store.all_tickets(), SNAPSHOT_PATH)
+    return load_snapshot(SNAPSHOT_PATH, columns=columns)
+
+def get_dashboard_metrics():
+    """Materialized ticket/agent metrics, maintained incrementally on every save."""
+    bootstrap_ticket_store()
+    return get_ticket_store().metrics()
+
+# ================================
+# Near-duplicate Detection
+# ================================
+@telemetry.traced("dedup")
+def find_duplicate(ticket):
+    """
+    Open or recent ticket that `ticket` nearly duplicates (MinHash/LSH +
+    embedding check, see dedup.py) as {"ticket", "jaccard", "cosine",
+    "reason"}, or None. Always None unless TICKET_DEDUP=1.
+    """
+    from dedup import DEDUP_ENABLED
+    if not DEDUP_ENABLED:
+        return None
+    bootstrap_ticket_store()
+    return get_duplicate_detector().find(ticket)
 
 # ================================
 # Process Ticket Pipeline
 # ================================
-def process_ticket(ticket, vectorstore):
+def process_ticket(ticket, vectorstore, resolve=False, save=True, dedup=True, query_vector=None, ticket_vector=None):
     """
     Full ticket processing pipeline:
-    1. Query KB for context
-    2. Categorize ticket
-    3. Assign agent
-    4. Save to Google Sheets
-    """
-    kb_context = query_kb(ticket["ticket_description"], vectorstore)
-    category_info = categorize_ticket(ticket["ticket_subject"], ticket["ticket_description"])
-    
-    ticket["category"] = category_info.get("category", "General")
-    ticket["ticket_status"] = category_info.get("status", "Open")
-    ticket["ticket_priority"] = category_info.get("priority", "Medium")
-    
-    ticket["assigned_agent"] = assign_agent(ticket["category"], ticket["ticket_description"], kb_context)
-    
-    # Set first_response_time if not already set
-    if "first_response_time" not in ticket or not ticket["first_response_time"]:
-        ticket["first_response_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    save_ticket_to_sheets(ticket)
+    0. A same-customer resubmission of an open or recent ticket reuses its
+       resolution, tags and agent and skips the steps below (no LLM calls);
+       another customer's near-duplicate is only linked to it
+    1. Query KB (and similar resolved tickets) for a token-budgeted context
+    2. Triage ticket (category, priority, status, agent) in one LLM call
+    3. Save to Google Sheets
+    With resolve=True (queued submissions from app.py) the context also
+    covers the customer's history, and a missing resolution is generated
+    alongside triage, as the inline app.py flow does.
+    save=False skips step 3 (retriage.py --dry-run), dedup=False skips
+    step 0. When the caller embedded a whole batch at once, `query_vector`
+    is the description's embedding (KB search) and `ticket_vector` that of
+    ticket_csv.ticket_text(subject, description, product) (similar tickets).
+    Each run is recorded as one ticket trace when telemetry is enabled.
+    """
+    from context_builder import HISTORY_CANDIDATES, assemble_context
+    from dedup import apply_duplicate
+    from response_cache import cache_key
+
+    with telemetry.ticket_trace(ticket.get("ticket_id"), source="process_ticket"):
+        match = find_duplicate(ticket) if dedup else None
+        if match is not None and apply_duplicate(ticket, match):
+            if not ticket.get("first_response_time"):
+                ticket["first_response_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if save:
+                save_ticket_to_sheets(ticket)
+            return ticket
+
+        kb_docs = retrieve_kb(ticket["ticket_description"], vectorstore, product=ticket.get("product_purchased"),
+                              category=ticket.get("ticket_type"), query_vector=query_vector)
+        similar = find_similar_tickets(ticket["ticket_subject"], ticket["ticket_description"],
+                                       ticket.get("product_purchased"), query_vector=ticket_vector,
+                                       exclude_ids=(ticket["ticket_id"],))
+        history = get_customer_history(ticket.get("customer_email"), limit=HISTORY_CANDIDATES) if resolve else ()
+        kb_context = assemble_context(
+            f"{ticket['ticket_subject']}\n{ticket['ticket_description']}",
+            kb_chunks=[d.page_content for d in kb_docs],
+            similar_tickets=similar,
+            history=history,
+        )
+        if resolve and not ticket.get("resolution"):
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                triage_future = pool.submit(
+                    telemetry.bind(triage_ticket), ticket["ticket_subject"], ticket["ticket_description"], kb_context,
+                    ticket.get("product_purchased", "")
+                )
+                ticket["resolution"] = ask_llm(
+                    ticket["ticket_description"], kb_context, cache=get_response_cache(),
+                    cache_key=cache_key([d.page_content for d in kb_docs], similar, history),
+                )
+                triage = triage_future.result()
+        else:
+            triage = triage_ticket(ticket["ticket_subject"], ticket["ticket_description"], kb_context,
+                                   ticket.get("product_purchased", ""))
+
+        ticket["category"] = triage["category"]
+        ticket["ticket_status"] = triage["status"]
+        ticket["ticket_priority"] = triage["priority"]
+        ticket["assigned_agent"] = triage["agent"]
+
+        # Set first_response_time if not already set
+        if "first_response_time" not in ticket or not ticket["first_response_time"]:
+            ticket["first_response_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if save:
+            save_ticket_to_sheets(ticket)
     return ticket
+
+
+# ================================
+# Batch Processing Pipeline
+# ================================
+def _process_one(ticket, vectorstore):
+    try:
+        return process_ticket(ticket, vectorstore)
+    except Exception as e:
+        # Isolate the failure to this ticket so the rest of the batch continues
+        ticket["processing_error"] = f"{type(e).__name__}: {e}"
+        return ticket
+
+def process_tickets(tickets, vectorstore, concurrency=8, max_pending=None):
+    """
+    Runs process_ticket over many tickets at once on a bounded thread pool.
+
+    Tickets are pulled lazily from any iterable and results are yielded in
+    input order. At most `max_pending` tickets (default 2 * concurrency) are
+    in flight at any time, so a slow Groq/Sheets backend throttles how fast
+    the input is consumed. A ticket that raises is yielded back with a
+    `processing_error` key instead of aborting the batch.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    max_pending = max_pending or 2 * concurrency
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="triage") as pool:
+        for ticket in tickets:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(pool.submit(_process_one, ticket, vectorstore))
+        while pending:
+            yield pending.popleft().result()
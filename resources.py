@@ -0,0 +1,278 @@
+# resources.py
+import os
+import atexit
+import threading
+from dotenv import load_dotenv
+
+# ================================
+# Process-wide shared resources
+# ================================
+# Streamlit re-runs app.py on every interaction, but imported modules stay
+# loaded for the life of the server process. Everything expensive (embedding
+# model, FAISS index, LLM client, Sheets handle) is created once here and
+# shared by every session and thread in the process. Nothing here imports a
+# heavy library or opens a connection until its getter is first called, so
+# importing rag (or this module) stays cheap for CLIs and workers.
+load_dotenv()
+
+INDEX_DIR = "faiss_store"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Recompute the chunks.bin checksum on every load (off: header and size checks only)
+VERIFY_INDEX = os.getenv("KB_VERIFY_CHECKSUM", "0").lower() in ("1", "true", "yes")
+# Optional cross-encoder for KB reranking, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2 ("" = off)
+RERANKER_MODEL = os.getenv("KB_RERANKER", "")
+CREDENTIALS_FILE = "credentials/credentials.json"
+SHEET_NAME = "TicketDatabase"
+WORKSHEET = "Sheet2"
+SHEETS_SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+_lock = threading.RLock()
+_embeddings = None
+_vectorstore = None
+_vectorstore_version = None
+_kb_retriever = None
+_kb_registry = None
+_reranker = None
+_llm_client = None
+_gspread_client = None
+_sheet = None
+_response_cache = None
+_ticket_index = None
+_ticket_index_version = None
+_ticket_classifier = None
+_ticket_classifier_version = None
+_ticket_queue = None
+_ticket_store = None
+_duplicate_detector = None
+_sheet_syncer = None
+
+# Handles that override() may replace
+OVERRIDABLE = ("embeddings", "llm_client", "gspread_client", "sheet", "response_cache", "ticket_queue")
+
+
+def override(**handles):
+    """
+    Replace shared handles before anything uses them, e.g. with the offline
+    fakes in benchmarks/fakes.py: override(llm_client=..., sheet=...).
+    """
+    with _lock:
+        for name, value in handles.items():
+            if name not in OVERRIDABLE:
+                raise TypeError(f"Cannot override '{name}'. Overridable: {', '.join(OVERRIDABLE)}")
+            globals()[f"_{name}"] = value
+
+
+def get_embeddings():
+    """MiniLM embedding model, loaded once per process."""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        return _embeddings
+
+
+def get_vector_store():
+    """
+    Memory-mapped KB index (vector_format.MmapVectorStore) shared across
+    sessions; processes on one host share its pages. Reloaded only when the
+    files in faiss_store change on disk (e.g. after build_kb.py runs).
+    """
+    global _vectorstore, _vectorstore_version
+    if not os.path.exists(INDEX_DIR):
+        raise FileNotFoundError("❌ faiss_store not found. Run build_kb.py first.")
+    import vector_format
+    if not vector_format.exists(INDEX_DIR):
+        if not os.path.exists(os.path.join(INDEX_DIR, vector_format.LEGACY_FILE)):
+            raise FileNotFoundError(f"❌ {INDEX_DIR}/{vector_format.CHUNKS_FILE} not found. Run build_kb.py first.")
+        with _lock:
+            if not vector_format.exists(INDEX_DIR):
+                print(f"⏳ Converting the pickled {INDEX_DIR} to the {vector_format.CHUNKS_FILE} format (one time)")
+                vector_format.convert_pickle(INDEX_DIR, get_embeddings())
+    from response_cache import index_version
+    version = index_version(INDEX_DIR)
+    with _lock:
+        if _vectorstore is None or version != _vectorstore_version:
+            _vectorstore = vector_format.MmapVectorStore.load(INDEX_DIR, get_embeddings(), verify=VERIFY_INDEX)
+            _vectorstore_version = version
+        return _vectorstore
+
+
+def get_reranker():
+    """Cross-encoder reranker (KB_RERANKER), loaded once; None when not configured."""
+    global _reranker
+    if not RERANKER_MODEL:
+        return None
+    with _lock:
+        if _reranker is None:
+            from sentence_transformers import CrossEncoder
+            _reranker = CrossEncoder(RERANKER_MODEL)
+        return _reranker
+
+
+def get_kb_retriever(vectorstore=None):
+    """
+    Hybrid BM25 + FAISS retriever for `vectorstore` (default: the shared
+    store), created once per loaded store instead of on every query.
+    """
+    global _kb_retriever
+    if vectorstore is None:
+        vectorstore = get_vector_store()
+    with _lock:
+        if _kb_retriever is None or _kb_retriever.vectorstore is not vectorstore:
+            from hybrid_retriever import HybridRetriever
+            index_dir = getattr(vectorstore, "index_dir", None)  # in-memory stores have no bm25.json
+            _kb_retriever = HybridRetriever.load(vectorstore, index_dir, reranker=get_reranker())
+        return _kb_retriever
+
+
+def _load_shard(path):
+    import vector_format
+    from hybrid_retriever import HybridRetriever
+    store = vector_format.MmapVectorStore.load(path, get_embeddings(), verify=VERIFY_INDEX)
+    return HybridRetriever.load(store, store.index_dir, reranker=get_reranker())
+
+
+def get_kb_registry():
+    """Per-product / per-category KB shards (kb_shards/), loaded on demand within KB_SHARD_CACHE_MB."""
+    global _kb_registry
+    with _lock:
+        if _kb_registry is None:
+            from kb_registry import KBRegistry
+            _kb_registry = KBRegistry(_load_shard)
+        return _kb_registry
+
+
+def get_llm_client():
+    """
+    Shared LLMClient (pooled connections, timeouts, retries, concurrency and
+    token-rate limits). The backend is chosen with LLM_BACKEND / LLM_BASE_URL.
+    """
+    global _llm_client
+    with _lock:
+        if _llm_client is None:
+            from llm_client import create_llm_client
+            _llm_client = create_llm_client()
+        return _llm_client
+
+
+def get_gspread_client():
+    global _gspread_client
+    with _lock:
+        if _gspread_client is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SHEETS_SCOPE)
+            _gspread_client = gspread.authorize(creds)
+        return _gspread_client
+
+
+def open_worksheet(worksheet=None, spreadsheet=SHEET_NAME):
+    """A worksheet of the ticket spreadsheet by name (first worksheet if None)."""
+    book = get_gspread_client().open(spreadsheet)
+    return book.worksheet(worksheet) if worksheet else book.sheet1
+
+
+def get_sheet():
+    """Authorized gspread worksheet (TicketDatabase / Sheet2)."""
+    global _sheet
+    with _lock:
+        if _sheet is None:
+            _sheet = open_worksheet(WORKSHEET)
+        return _sheet
+
+
+def get_response_cache():
+    """Semantic ask_llm cache using the shared embedding model."""
+    global _response_cache
+    with _lock:
+        if _response_cache is None:
+            from response_cache import SemanticCache
+            _response_cache = SemanticCache(get_embeddings().embed_query, index_dir=INDEX_DIR)
+            atexit.register(_response_cache.flush)
+        return _response_cache
+
+
+def get_ticket_index():
+    """
+    Similar-resolved-ticket index (built by ticket_index.py), or None if it
+    has not been built. Reloaded when the files on disk change.
+    """
+    global _ticket_index, _ticket_index_version
+    from response_cache import index_version
+    from vector_format import current_dir
+    from ticket_index import INDEX_FILE, TICKET_INDEX_DIR, TicketIndex
+    if not os.path.exists(os.path.join(current_dir(TICKET_INDEX_DIR), INDEX_FILE)):
+        return None
+    version = index_version(TICKET_INDEX_DIR)
+    with _lock:
+        if _ticket_index is None or version != _ticket_index_version:
+            _ticket_index = TicketIndex(get_embeddings(), TICKET_INDEX_DIR)
+            _ticket_index_version = version
+        return _ticket_index
+
+
+def get_ticket_classifier():
+    """Local fast-path classifier (trained by ticket_classifier.py), or None if not trained."""
+    global _ticket_classifier, _ticket_classifier_version
+    from ticket_classifier import MODEL_PATH, TicketClassifier
+    if not os.path.exists(MODEL_PATH):
+        return None
+    version = os.stat(MODEL_PATH).st_mtime_ns
+    with _lock:
+        if _ticket_classifier is None or version != _ticket_classifier_version:
+            _ticket_classifier = TicketClassifier.load(get_embeddings(), MODEL_PATH)
+            _ticket_classifier_version = version
+        return _ticket_classifier
+
+
+def get_ticket_queue():
+    """Durable intake queue (ticket_queue.db) shared by app sessions."""
+    global _ticket_queue
+    with _lock:
+        if _ticket_queue is None:
+            from ticket_queue import TicketQueue
+            _ticket_queue = TicketQueue()
+        return _ticket_queue
+
+
+def get_ticket_store():
+    """Local ticket store (tickets.db), opened on first use."""
+    global _ticket_store
+    with _lock:
+        if _ticket_store is None:
+            from ticket_store import TicketStore
+            _ticket_store = TicketStore()
+        return _ticket_store
+
+
+def _embed_documents(texts):
+    return get_embeddings().embed_documents(texts)
+
+
+def get_duplicate_detector():
+    """Near-duplicate detector over open and recent tickets in the local ticket store."""
+    global _duplicate_detector
+    with _lock:
+        if _duplicate_detector is None:
+            from dedup import DuplicateDetector
+            _duplicate_detector = DuplicateDetector(get_ticket_store(), embed_fn=_embed_documents)
+        return _duplicate_detector
+
+
+def get_sheet_syncer():
+    """
+    Background ticket store → Google Sheets syncer. It is handed get_sheet
+    rather than the worksheet, so Sheets is only authorized once a flush
+    actually has rows to push.
+    """
+    global _sheet_syncer
+    with _lock:
+        if _sheet_syncer is None:
+            from ticket_store import HEADERS, SheetSyncer
+            _sheet_syncer = SheetSyncer(get_ticket_store(), get_sheet, HEADERS)
+            atexit.register(_sheet_syncer.stop)
+        return _sheet_syncer
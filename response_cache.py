@@ -0,0 +1,239 @@
+# response_cache.py
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import telemetry
+from vector_format import current_dir
+
+# ================================
+# Configuration
+# ================================
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "cache/response_cache.db")
+CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+INDEX_DIR = "faiss_store"
+TOUCH_FLUSH_SECONDS = 5        # hits update last_used in SQLite in batches, at most this often
+INDEX_CHECK_SECONDS = 5        # lookups re-check faiss_store for a new build at most this often
+
+
+def context_fingerprint(context):
+    """Stable hash of the retrieved context a response was generated from."""
+    return hashlib.sha256((context or "").encode("utf-8")).hexdigest()
+
+
+def cache_key(kb_chunks, similar_tickets=(), history=()):
+    """
+    Cache context for a response: the retrieved KB chunks, the similar-ticket
+    IDs and a fingerprint of the customer history the prompt was built
+    with. Customers without history share answers; an answer written from
+    one customer's earlier tickets is never served to another.
+    """
+    ids = sorted(str(t.get("ticket_id", "")) for t in similar_tickets)
+    history_fp = context_fingerprint(json.dumps(list(history), sort_keys=True, default=str)) if history else ""
+    return "\n\0".join(kb_chunks) + "\n\1" + ",".join(ids) + "\n\2" + history_fp
+
+
+def index_version(index_dir=INDEX_DIR):
+    """Changes whenever build_kb.py publishes new index files."""
+    index_dir = current_dir(index_dir)
+    parts = [os.path.basename(index_dir)]
+    if os.path.isdir(index_dir):
+        for name in sorted(os.listdir(index_dir)):
+            st = os.stat(os.path.join(index_dir, name))
+            parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+# ================================
+# Semantic Response Cache
+# ================================
+class SemanticCache:
+    """
+    Caches ask_llm answers keyed on (query embedding, context fingerprint).
+    A lookup hits when an entry with the same context fingerprint has a query
+    embedding whose cosine similarity is >= threshold. Entries are evicted by
+    LRU (max_entries) and TTL, persisted in SQLite, and dropped as a whole
+    when the FAISS index on disk changes.
+    """
+
+    def __init__(self, embed_fn, path=CACHE_PATH, threshold=CACHE_THRESHOLD,
+                 max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                 index_dir=INDEX_DIR):
+        self.embed_fn = embed_fn
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_dir = index_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        # id -> (fingerprint, unit vector, response, created_at), in LRU order
+        self._entries = OrderedDict()
+        self._by_fp = {}
+        self._touched = {}  # id -> last_used not yet written to SQLite
+        self._flushed_at = time.time()
+        self._index_checked_at = time.time()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                context_fp TEXT NOT NULL,
+                embedding  BLOB NOT NULL,
+                response   TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._index_version = None
+        self._load()
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def _load(self):
+        current = index_version(self.index_dir)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+        if not row or row[0] != current:
+            self._reset(current)
+            return
+        self._index_version = current
+        cutoff = time.time() - self.ttl_seconds
+        self._conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,))
+        rows = self._conn.execute(
+            "SELECT id, context_fp, embedding, response, created_at FROM entries ORDER BY last_used"
+        ).fetchall()
+        for entry_id, fp, blob, response, created_at in rows[-self.max_entries:]:
+            self._add(entry_id, fp, np.frombuffer(blob, dtype=np.float32), response, created_at)
+
+    def _reset(self, version):
+        self._entries.clear()
+        self._by_fp.clear()
+        self._touched.clear()
+        self._conn.execute("DELETE FROM entries")
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('index_version', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (version,),
+        )
+        self._index_version = version
+
+    def _flush_touched(self, now, force=False):
+        if not self._touched or (not force and now - self._flushed_at < TOUCH_FLUSH_SECONDS):
+            return
+        with self._conn:
+            self._conn.executemany("UPDATE entries SET last_used = ? WHERE id = ?",
+                                   [(ts, entry_id) for entry_id, ts in self._touched.items()])
+        self._touched.clear()
+        self._flushed_at = now
+
+    def _check_index(self, now):
+        if now - self._index_checked_at < INDEX_CHECK_SECONDS:
+            return
+        self._index_checked_at = now
+        current = index_version(self.index_dir)
+        if current != self._index_version:
+            print("♻️ faiss_store changed, clearing response cache")
+            self._reset(current)
+
+    # -------------------------------
+    # In-memory index
+    # -------------------------------
+    def _add(self, entry_id, fp, vec, response, created_at):
+        self._entries[entry_id] = (fp, vec, response, created_at)
+        self._by_fp.setdefault(fp, []).append(entry_id)
+
+    def _remove(self, entry_id):
+        fp, _, _, _ = self._entries.pop(entry_id)
+        self._touched.pop(entry_id, None)
+        ids = self._by_fp[fp]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_fp[fp]
+        self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+
+    def _embed(self, query):
+        vec = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    # -------------------------------
+    # Public API
+    # -------------------------------
+    def lookup(self, query, context):
+        """
+        Returns (response or None, query vector); pass the vector back to
+        store() on a miss. `context` is what the response depends on,
+        normally cache_key(kb_chunks, similar_tickets, history).
+        """
+        vec = self._embed(query)
+        fp = context_fingerprint(context)
+        now = time.time()
+        with self._lock:
+            self._check_index(now)
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_fp.get(fp, ())):
+                _, cand, _, created_at = self._entries[entry_id]
+                if now - created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(vec, cand))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                telemetry.count("response_cache_lookups", result="miss")
+                return None, vec
+            self.hits += 1
+            telemetry.count("response_cache_lookups", result="hit")
+            self._entries.move_to_end(best_id)
+            self._touched[best_id] = now
+            self._flush_touched(now)
+            return self._entries[best_id][2], vec
+
+    def store(self, query, context, response, vec=None):
+        vec = self._embed(query) if vec is None else vec
+        fp = context_fingerprint(context)
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO entries (context_fp, embedding, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (fp, vec.astype(np.float32).tobytes(), response, now, now),
+            )
+            self._add(cur.lastrowid, fp, vec, response, now)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._flush_touched(now)
+
+    def flush(self):
+        """Write pending last_used updates (at exit; the LRU order survives restarts)."""
+        with self._lock:
+            self._flush_touched(time.time(), force=True)
+
+    def clear(self):
+        with self._lock:
+            self._reset(index_version(self.index_dir))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,210 @@
+# retriage.py
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from ticket_csv import TICKETS_CSV, iter_ticket_chunks, ticket_text
+from ticket_store import HEADERS
+
+# ================================
+# Configuration
+# ================================
+# Re-runs rag.process_ticket (KB context + triage) over a whole ticket CSV,
+# e.g. after a prompt or model change. Output is written after every batch
+# and the checkpoint lists finished ticket IDs, so an interrupted run
+# continues where it stopped.
+DEFAULT_OUT = "retriaged_tickets.csv"
+BATCH_SIZE = 256               # tickets embedded together and written per checkpoint
+OUTPUT_COLUMNS = HEADERS + ["category", "processing_error"]
+
+
+# ================================
+# Checkpointing
+# ================================
+def checkpoint_path(out):
+    return f"{out}.checkpoint.json"
+
+
+def load_done(path, csv_path):
+    """Ticket IDs already written by an earlier run over the same CSV."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("csv") != os.path.abspath(csv_path):
+        print(f"⚠️ Checkpoint {path} is for {checkpoint.get('csv')}, ignoring it")
+        return set()
+    return set(checkpoint.get("done", []))
+
+
+def save_done(path, csv_path, done):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"csv": os.path.abspath(csv_path), "done": sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+# ================================
+# Incremental output
+# ================================
+class ResultWriter:
+    """
+    Appends result batches to a CSV, or, for a .parquet target, writes
+    one part file per batch into a directory (readable as one dataset
+    with pandas.read_parquet).
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.parquet = out.endswith(".parquet")
+        if self.parquet:
+            os.makedirs(out, exist_ok=True)
+            self._part = len(self._parts())
+
+    def _parts(self):
+        return sorted(f for f in os.listdir(self.out) if f.startswith("part-") and f.endswith(".parquet"))
+
+    def written_ids(self):
+        """
+        Ticket IDs already in the output. A run that stopped between a write
+        and its checkpoint has written more than the checkpoint lists.
+        """
+        import pandas as pd
+
+        if self.parquet:
+            frames = [pd.read_parquet(os.path.join(self.out, f), columns=["ticket_id"]) for f in self._parts()]
+            return set().union(*(set(df["ticket_id"]) for df in frames))
+        if not os.path.exists(self.out) or os.path.getsize(self.out) == 0:
+            return set()
+        return set(pd.read_csv(self.out, usecols=["ticket_id"], dtype=str, keep_default_na=False)["ticket_id"])
+
+    def write(self, rows):
+        import pandas as pd
+
+        df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS).astype(str)
+        if self.parquet:
+            # Renamed into place, so a crash never leaves a half-written part behind
+            name = f"part-{self._part:05d}.parquet"
+            tmp_path = os.path.join(self.out, f".{name}.tmp")
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(self.out, name))
+            self._part += 1
+            return
+        new_file = not os.path.exists(self.out) or os.path.getsize(self.out) == 0
+        with open(self.out, "a", newline="", encoding="utf-8") as f:
+            df.to_csv(f, header=new_file, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# ================================
+# Re-triage
+# ================================
+def _ticket(row):
+    ticket = {h: row.get(h, "") for h in HEADERS}
+    # The dataset's templated descriptions contain a literal "{product_purchased}"
+    ticket["ticket_description"] = str(ticket["ticket_description"]).replace(
+        "{product_purchased}", ticket["product_purchased"] or "the product")
+    return ticket
+
+
+def _retriage_one(rag, ticket, vectorstore, vectors, save):
+    try:
+        return rag.process_ticket(ticket, vectorstore, save=save, dedup=False,
+                                  query_vector=vectors[0], ticket_vector=vectors[1])
+    except Exception as e:
+        # One failing ticket is reported in the output instead of stopping the run
+        ticket["processing_error"] = f"{type(e).__name__}: {e}"
+        return ticket
+
+
+def _batches(csv_path, chunksize, batch_size, done, limit):
+    batch, taken = [], 0
+    for chunk in iter_ticket_chunks(csv_path, chunksize):
+        for row in chunk.to_dict("records"):
+            if str(row.get("ticket_id", "")) in done:
+                continue
+            if limit and taken >= limit:
+                if batch:
+                    yield batch
+                return
+            batch.append(_ticket(row))
+            taken += 1
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def retriage(csv_path=TICKETS_CSV, out=DEFAULT_OUT, workers=8, batch_size=BATCH_SIZE,
+             chunksize=5000, dry_run=False, resume=True, limit=None):
+    """
+    Triage every ticket of `csv_path` with rag.process_ticket on `workers`
+    threads. Each batch is embedded in one call (descriptions for KB
+    retrieval, ticket_text for similar-ticket retrieval). With dry_run the
+    results are only written to `out`; otherwise tickets are also saved to
+    the ticket store, and from there to Google Sheets.
+    Returns {"done", "errors", "skipped", "seconds"}.
+    """
+    import rag
+    from resources import get_embeddings
+
+    ckpt = checkpoint_path(out)
+    writer = ResultWriter(out)
+    # The output is written before the checkpoint; IDs found only in the
+    # output were written just before an interruption
+    done = load_done(ckpt, csv_path) | writer.written_ids() if resume else set()
+    if done:
+        print(f"↩️ Resuming: skipping {len(done)} already re-triaged ticket(s)")
+    vectorstore = rag.load_vector_store()
+    embeddings = get_embeddings()
+    stats = {"done": 0, "errors": 0, "skipped": len(done)}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retriage") as pool:
+        for batch in _batches(csv_path, chunksize, batch_size, done, limit):
+            texts = [t["ticket_description"] for t in batch]
+            texts += [ticket_text(t["ticket_subject"], t["ticket_description"], t["product_purchased"]) for t in batch]
+            vectors = embeddings.embed_documents(texts)
+            results = list(pool.map(
+                lambda tv: _retriage_one(rag, tv[0], vectorstore, tv[1:], not dry_run),
+                zip(batch, vectors[:len(batch)], vectors[len(batch):])
+            ))
+            writer.write([[t.get(c, "") for c in OUTPUT_COLUMNS] for t in results])
+            done.update(str(t["ticket_id"]) for t in results)
+            save_done(ckpt, csv_path, done)
+
+            stats["done"] += len(results)
+            stats["errors"] += sum(1 for t in results if t.get("processing_error"))
+            rate = stats["done"] / (time.perf_counter() - start)
+            print(f"   {stats['done']} ticket(s) re-triaged ({stats['errors']} error(s), {rate:.1f} tickets/s)")
+
+    if not dry_run:
+        print("⏳ Pushing re-triaged tickets to Google Sheets...")
+        rag.get_sheet_syncer().flush()
+    stats["seconds"] = round(time.perf_counter() - start, 1)
+    return stats
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-triage a ticket CSV with the current prompts and models.")
+    parser.add_argument("--csv", default=TICKETS_CSV)
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Output .csv, or .parquet (a directory of part files)")
+    parser.add_argument("--workers", type=int, default=8, help="Tickets processed concurrently")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Tickets embedded and checkpointed together")
+    parser.add_argument("--chunksize", type=int, default=5000, help="CSV rows read per chunk")
+    parser.add_argument("--limit", type=int, help="Stop after this many tickets")
+    parser.add_argument("--dry-run", action="store_true", help="Only write --out; no ticket store or Sheets writes")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and re-triage every ticket")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.out):
+        parser.error(f"{args.out} already exists; remove it before --restart")
+    stats = retriage(args.csv, args.out, workers=args.workers, batch_size=args.batch_size,
+                     chunksize=args.chunksize, dry_run=args.dry_run, resume=not args.restart, limit=args.limit)
+    print(f"✅ Re-triaged {stats['done']} ticket(s) in {stats['seconds']}s "
+          f"({stats['errors']} error(s), {stats['skipped']} skipped from the checkpoint). Results in '{args.out}'")
@@ -0,0 +1,278 @@
+# telemetry.py
+import os
+import json
+import time
+import datetime
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# ================================
+# Configuration
+# ================================
+# Off by default; when disabled every hook below returns after one flag check.
+ENABLED = os.getenv("TELEMETRY_ENABLED", "0").lower() in ("1", "true", "yes")
+TRACE_PATH = os.getenv("TELEMETRY_TRACE_PATH", "traces.jsonl")
+METRICS_PORT = int(os.getenv("TELEMETRY_METRICS_PORT", "0"))  # 0 = no /metrics endpoint
+METRICS_HOST = os.getenv("TELEMETRY_METRICS_HOST", "127.0.0.1")  # 0.0.0.0 to expose it beyond this host
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current_trace = contextvars.ContextVar("ticket_trace", default=None)
+_metrics_lock = threading.Lock()
+_write_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+_server = None
+
+
+def enable(trace_path=None):
+    global ENABLED, TRACE_PATH
+    ENABLED = True
+    TRACE_PATH = trace_path or TRACE_PATH
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+# ================================
+# Counters / histograms
+# ================================
+def count(name, n=1, **labels):
+    """Add `n` to a process-wide counter and to the current ticket trace, if any."""
+    if not ENABLED or not n:
+        return
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + n
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name if not labels else f"{name}:{':'.join(map(str, labels.values()))}", n)
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(DURATION_BUCKETS) + 2)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+
+# ================================
+# Per-ticket traces and stage spans
+# ================================
+class Trace:
+    """Stage spans and counters for one ticket, written as one JSONL record."""
+
+    def __init__(self, ticket_id, source):
+        self.ticket_id = ticket_id
+        self.source = source
+        self.started_at = datetime.datetime.now().isoformat(timespec="milliseconds")
+        self.start = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()  # spans may finish on worker threads
+
+    def add_span(self, stage, start, end, error=None):
+        span = {
+            "stage": stage,
+            "start_ms": round((start - self.start) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+        }
+        if error:
+            span["error"] = error
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name, n):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, error=None):
+        out = {
+            "ticket_id": self.ticket_id,
+            "source": self.source,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "counters": self.counters,
+        }
+        if error:
+            out["error"] = error
+        return out
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        error = f"{exc_type.__name__}: {exc}" if exc_type else None
+        observe("stage_duration_seconds", end - self.start, stage=self.stage)
+        if error:
+            count("stage_errors", stage=self.stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(self.stage, self.start, end, error)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage):
+    """Context manager timing one pipeline stage (a shared no-op when disabled)."""
+    return _Span(stage) if ENABLED else _NOOP_SPAN
+
+
+def traced(stage):
+    """Decorator form of span() for a whole function."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def ticket_trace(ticket_id, source):
+    """
+    Collects the spans/counters of everything run inside it for one ticket
+    and appends them to TRACE_PATH as one JSON line. Nested calls (e.g.
+    process_ticket inside an app.py trace) join the outer trace.
+    """
+    if not ENABLED or _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+    trace = Trace(ticket_id, source)
+    token = _current_trace.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_trace.reset(token)
+        count("tickets_traced", source=source)
+        _write(trace.record(error))
+
+
+def bind(fn):
+    """Run `fn` in the caller's context, e.g. on a thread pool, so its spans join the current trace."""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
+
+
+def _write(record):
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        if os.path.dirname(TRACE_PATH):
+            os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+        with open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# ================================
+# Prometheus text exposition
+# ================================
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_metrics():
+    """All counters and stage histograms in the Prometheus text format."""
+    lines = []
+    with _metrics_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            lines.append(f"# TYPE {name}_total counter")
+            seen.add(name)
+        lines.append(f"{name}_total{_format_labels(labels)} {value}")
+    for (name, labels), hist in histograms:
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        for bound, n in zip(DURATION_BUCKETS, hist):
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {n}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist[-2]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serve render_metrics() at http://<host>:<port>/metrics from a daemon
+    thread. No-op unless telemetry is enabled and a port is configured;
+    safe to call repeatedly. Called by the entry points (app.py, queue
+    workers), never on import.
+    """
+    global _server
+    port = port or METRICS_PORT
+    host = host or METRICS_HOST
+    if not ENABLED or not port or _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📊 Metrics at http://{host}:{port}/metrics")
+    return _server
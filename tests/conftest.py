@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# The modules under test are flat scripts in the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
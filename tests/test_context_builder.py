@@ -0,0 +1,29 @@
+# tests/test_context_builder.py
+from context_builder import dedupe_chunks
+
+
+def test_short_distinct_lines_are_kept():
+    chunks = [
+        "Can I get a refund after 30 days?\nNo\nRefunds are issued to the original payment method.",
+        "Is express shipping available?\nYes\nRefunds\n14",
+    ]
+    assert dedupe_chunks(chunks) == chunks
+
+
+def test_identical_lines_are_dropped():
+    chunks = ["Reset the router.\nWait 30 seconds.", "Wait 30 seconds.\nReconnect the cable."]
+    assert dedupe_chunks(chunks) == ["Reset the router.\nWait 30 seconds.", "Reconnect the cable."]
+
+
+def test_splitter_overlap_is_trimmed():
+    first = ("To reset the device, hold the power button for ten seconds. "
+             "The light blinks twice when the reset has started.")
+    second = ("The light blinks twice when the reset has started.\n"
+              "If it does not blink, contact support.")
+    assert dedupe_chunks([first, second]) == [first, "If it does not blink, contact support."]
+
+
+def test_overlap_ending_mid_line_keeps_the_rest_of_the_line():
+    first = "Refunds take 5 business days. Store credit is issued"
+    second = "Store credit is issued immediately after approval."
+    assert dedupe_chunks([first, second]) == [first, "immediately after approval."]
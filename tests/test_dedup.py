@@ -0,0 +1,84 @@
+# tests/test_dedup.py
+import datetime
+
+import pytest
+
+from dedup import NEAR_DUPLICATE, SAME_CUSTOMER, TIMESTAMP_FORMAT, DuplicateDetector, apply_duplicate
+from ticket_store import TicketStore
+
+DESCRIPTION = ("My smart watch stopped syncing with the phone app after the latest firmware update, "
+               "I tried restarting both devices and reinstalling the app but nothing works")
+
+
+def make_ticket(ticket_id, email="ann@example.com", **fields):
+    ticket = {
+        "ticket_id": ticket_id, "customer_email": email, "product_purchased": "Fitbit Versa",
+        "ticket_subject": "Watch not syncing", "ticket_description": DESCRIPTION,
+        "ticket_status": "Open", "resolution": "Re-pair the watch from the app settings.",
+        "first_response_time": datetime.datetime.now().strftime(TIMESTAMP_FORMAT),
+    }
+    ticket.update(fields)
+    return ticket
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TicketStore(str(tmp_path / "tickets.db"))
+
+
+def test_ticket_saved_in_process_is_matched_at_once(store):
+    detector = DuplicateDetector(store)
+    assert detector.find(make_ticket("T0", ticket_description="unrelated")) is None  # refresh just ran
+
+    original = make_ticket("T1")
+    store.save(original)
+    detector.add(original)
+
+    match = detector.find(make_ticket("T2", resolution=""))
+    assert match["ticket"]["ticket_id"] == "T1"
+
+
+def test_tickets_from_other_processes_are_picked_up_on_refresh(store):
+    detector = DuplicateDetector(store)
+    detector.find(make_ticket("T0", ticket_description="unrelated"))
+    store.save(make_ticket("T1"))
+
+    detector.refresh(force=True)
+    assert detector.find(make_ticket("T2", resolution=""))["ticket"]["ticket_id"] == "T1"
+
+
+def test_resolution_is_reused_for_the_same_customer_only(store):
+    detector = DuplicateDetector(store)
+    original = make_ticket("T1", ticket_priority="High", assigned_agent="Engineering")
+    store.save(original)
+    detector.add(original)
+
+    resubmission = make_ticket("T2", resolution="")
+    match = detector.find(resubmission)
+    assert match["reason"] == SAME_CUSTOMER
+    assert apply_duplicate(resubmission, match) is True
+    assert resubmission["resolution"] == original["resolution"]
+    assert resubmission["assigned_agent"] == "Engineering"
+
+    other = make_ticket("T3", email="bob@example.com", resolution="")
+    match = detector.find(other)
+    assert match["reason"] == NEAR_DUPLICATE
+    assert apply_duplicate(other, match) is False
+    assert other["resolution"] == ""
+    assert other["duplicate_of"] == "T1"
+
+
+def test_open_tickets_age_out(store):
+    detector = DuplicateDetector(store, window_days=14, open_window_days=30)
+    opened = datetime.datetime.now() - datetime.timedelta(days=31)
+    for ticket in (make_ticket("T1", first_response_time=opened.strftime(TIMESTAMP_FORMAT)),
+                   make_ticket("T2", ticket_status="Closed", ticket_description=DESCRIPTION + " again",
+                               first_response_time=opened.strftime(TIMESTAMP_FORMAT))):
+        store.save(ticket)
+        detector.add(ticket)
+    assert len(detector.index) == 0
+
+    recent = make_ticket("T3")
+    store.save(recent)
+    detector.add(recent)
+    assert len(detector.index) == 1
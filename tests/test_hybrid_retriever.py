@@ -0,0 +1,53 @@
+# tests/test_hybrid_retriever.py
+from types import SimpleNamespace
+
+import numpy as np
+
+from hybrid_retriever import BM25Index, HybridRetriever
+
+
+class RecordingIndex:
+    """FAISS-shaped index returning positions in order and recording each k."""
+
+    def __init__(self, ntotal):
+        self.ntotal = ntotal
+        self.ks = []
+
+    def search(self, vectors, k):
+        self.ks.append(k)
+        return np.zeros((1, k)), np.arange(k).reshape(1, k)
+
+
+def make_retriever(n=200, billing_every=50):
+    docs = {
+        f"d{i}": SimpleNamespace(page_content=f"how to reset the router step {i}",
+                                 metadata={"section": "Billing" if i % billing_every == 0 else "Technical"})
+        for i in range(n)
+    }
+    vectorstore = SimpleNamespace(
+        index=RecordingIndex(n),
+        index_to_docstore_id={i: f"d{i}" for i in range(n)},
+        docstore=SimpleNamespace(search=docs.get),
+        embeddings=SimpleNamespace(embed_query=lambda q: [0.0] * 4),
+    )
+    return HybridRetriever(vectorstore, BM25Index.from_vectorstore(vectorstore))
+
+
+def test_unfiltered_query_searches_fetch_k():
+    retriever = make_retriever()
+    assert len(retriever.retrieve("reset router", top_k=3, fetch_k=20)) == 3
+    assert retriever.vectorstore.index.ks == [20]
+
+
+def test_filtered_query_grows_fetch_k_until_enough_matches():
+    retriever = make_retriever()
+    docs = retriever.retrieve("reset router", top_k=2, fetch_k=20, filter={"section": "Billing"})
+    assert [d.metadata["section"] for d in docs] == ["Billing", "Billing"]
+    assert retriever.vectorstore.index.ks == [20, 40, 80]  # d0 and d50 are the first two matches
+
+
+def test_filter_with_too_few_matches_stops_at_the_whole_kb():
+    retriever = make_retriever()
+    docs = retriever.retrieve("reset router", top_k=3, fetch_k=20, filter={"section": "Refunds"})
+    assert docs == []
+    assert retriever.vectorstore.index.ks == [20, 40, 80, 160, 200]
@@ -0,0 +1,41 @@
+# tests/test_kb_registry.py
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from kb_registry import KBRegistry
+
+
+class FakeRetriever:
+    """Returns the same Document objects on every query, like a cached shard retriever."""
+
+    def __init__(self, texts):
+        self.docs = [SimpleNamespace(page_content=t, metadata={"source": "kb.txt"}) for t in texts]
+
+    def retrieve(self, query, top_k=3, filter=None, query_vector=None):
+        return self.docs[:top_k]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    retrievers = {"phones": FakeRetriever(["Reset the phone.", "Charge it overnight."]),
+                  "laptops": FakeRetriever(["Update the BIOS."])}
+    for name in retrievers:
+        (tmp_path / name).mkdir()
+    return KBRegistry(lambda path: retrievers[os.path.basename(path)], shards_dir=str(tmp_path)), retrievers
+
+
+def test_results_are_tagged_copies(registry):
+    registry, retrievers = registry
+    docs = registry.retrieve("reset", ["phones"], top_k=2)
+    assert [d.metadata["kb_shard"] for d in docs] == ["phones", "phones"]
+    assert all("kb_shard" not in d.metadata for d in retrievers["phones"].docs)
+
+
+def test_multi_shard_results_keep_their_own_shard(registry):
+    registry, retrievers = registry
+    docs = registry.retrieve("reset", ["phones", "laptops"], top_k=3)
+    assert {(d.page_content, d.metadata["kb_shard"]) for d in docs} == {
+        ("Reset the phone.", "phones"), ("Update the BIOS.", "laptops"), ("Charge it overnight.", "phones")}
+    assert all("kb_shard" not in d.metadata for r in retrievers.values() for d in r.docs)
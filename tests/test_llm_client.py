@@ -0,0 +1,130 @@
+# tests/test_llm_client.py
+import gc
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+from benchmarks.fakes import FakeAPIError, FakeLLMBackend
+from llm_client import LLMClient, LLMError, TokenBucket
+
+MESSAGES = [{"role": "user", "content": "My order never arrived"}]
+
+
+def test_complete_returns_the_backend_response():
+    client = LLMClient(FakeLLMBackend(latency=0), backoff_base=0)
+    response = client.complete(MESSAGES, model="fake")
+    assert response.choices[0].message.content.startswith("Thank you")
+    assert client.stats["calls"] == 1
+    assert client.stats["prompt_tokens"] > 0
+
+
+def test_retries_then_raises_llm_error():
+    client = LLMClient(FakeLLMBackend(latency=0, error_rate=1.0), max_retries=2, backoff_base=0)
+    with pytest.raises(LLMError) as excinfo:
+        client.complete(MESSAGES, model="fake")
+    assert isinstance(excinfo.value.__cause__, FakeAPIError)
+    assert client.stats["retries"] == 2
+    assert client.stats["failures"] == 1
+
+
+@pytest.mark.parametrize("status", [400, 409])
+def test_non_retryable_error_is_not_retried(status):
+    class Rejecting:
+        def create(self, **kwargs):
+            raise FakeAPIError(status, "rejected")
+
+    client = LLMClient(Rejecting(), max_retries=3, backoff_base=0)
+    with pytest.raises(LLMError, match=str(status)):
+        client.complete(MESSAGES, model="fake")
+    assert client.stats["retries"] == 0
+
+
+# ================================
+# Streaming slots
+# ================================
+def slot_is_free(client):
+    if not client._slots.acquire(blocking=False):
+        return False
+    client._slots.release()
+    return True
+
+
+@pytest.fixture
+def client():
+    return LLMClient(FakeLLMBackend(latency=0), max_concurrency=1, backoff_base=0)
+
+
+def test_exhausted_stream_releases_its_slot(client):
+    stream = client.complete(MESSAGES, model="fake", stream=True)
+    assert not slot_is_free(client)
+    assert "".join(c.choices[0].delta.content for c in stream if c.choices).startswith("Thank you")
+    assert slot_is_free(client)
+    assert client.stats["completion_tokens"] > 0  # usage from the last chunk
+
+
+def test_abandoned_stream_releases_its_slot(client):
+    stream = client.complete(MESSAGES, model="fake", stream=True)
+    next(stream)
+    stream.close()
+    assert slot_is_free(client)
+    stream.close()  # released exactly once (BoundedSemaphore would raise)
+
+    stream = client.complete(MESSAGES, model="fake", stream=True)
+    next(stream)
+    del stream
+    gc.collect()
+    assert slot_is_free(client)
+
+
+def test_stream_failing_midway_releases_its_slot():
+    class Breaking:
+        def create(self, **kwargs):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Hello"))])
+            raise ConnectionError("stream reset")
+
+    client = LLMClient(Breaking(), max_concurrency=1, backoff_base=0)
+    stream = client.complete(MESSAGES, model="fake", stream=True)
+    with pytest.raises(ConnectionError):
+        list(stream)
+    assert slot_is_free(client)
+
+
+# ================================
+# Token bucket
+# ================================
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_throttles_to_the_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client, "time", clock)
+    bucket = TokenBucket(tokens_per_minute=600)  # 10 tokens/s
+
+    bucket.acquire(600)  # a full bucket is available at once
+    assert clock.sleeps == []
+    bucket.acquire(50)
+    assert clock.now == pytest.approx(5.0)
+    bucket.acquire(10_000)  # capped at capacity so it can still proceed
+    assert clock.now == pytest.approx(65.0)
+
+
+def test_client_waits_for_tokens_before_calling(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client, "time", clock)
+    client = LLMClient(FakeLLMBackend(latency=0), tokens_per_minute=60, backoff_base=0)
+
+    client.complete(MESSAGES, model="fake", max_tokens=50)
+    assert clock.sleeps == []
+    client.complete(MESSAGES, model="fake", max_tokens=50)
+    assert clock.now > 0
@@ -0,0 +1,109 @@
+# tests/test_response_cache.py
+import time
+
+import numpy as np
+import pytest
+
+import response_cache
+from response_cache import SemanticCache, cache_key
+
+VECTORS = {
+    "how do I get a refund": [1.0, 0.0, 0.0],
+    "how can I get a refund": [0.99, 0.1, 0.0],
+    "my router keeps dropping": [0.0, 1.0, 0.0],
+}
+
+
+def embed(query):
+    return np.array(VECTORS[query], dtype=np.float32)
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    path = tmp_path / "faiss_store"
+    path.mkdir()
+    (path / "index.faiss").write_bytes(b"v1")
+    return path
+
+
+def make_cache(tmp_path, index_dir, **kwargs):
+    return SemanticCache(embed, path=str(tmp_path / "cache.db"), threshold=0.95,
+                         index_dir=str(index_dir), **kwargs)
+
+
+def test_similar_query_with_same_context_hits(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir)
+    assert cache.lookup("how do I get a refund", "ctx")[0] is None
+    cache.store("how do I get a refund", "ctx", "Refunds take 5 days.")
+
+    assert cache.lookup("how can I get a refund", "ctx")[0] == "Refunds take 5 days."
+    assert cache.lookup("my router keeps dropping", "ctx")[0] is None
+    assert cache.lookup("how do I get a refund", "other ctx")[0] is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir, ttl_seconds=0.05)
+    cache.store("how do I get a refund", "ctx", "Refunds take 5 days.")
+    time.sleep(0.1)
+
+    assert cache.lookup("how do I get a refund", "ctx")[0] is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir, max_entries=1)
+    cache.store("how do I get a refund", "ctx", "refund")
+    cache.store("my router keeps dropping", "ctx", "router")
+
+    assert cache.lookup("how do I get a refund", "ctx")[0] is None
+    assert cache.lookup("my router keeps dropping", "ctx")[0] == "router"
+
+
+def test_entries_survive_a_restart(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir)
+    cache.store("how do I get a refund", "ctx", "Refunds take 5 days.")
+    cache.lookup("how do I get a refund", "ctx")
+    cache.flush()
+
+    reopened = make_cache(tmp_path, index_dir)
+    assert reopened.lookup("how do I get a refund", "ctx")[0] == "Refunds take 5 days."
+
+
+def test_index_change_invalidates_the_cache(tmp_path, index_dir, monkeypatch):
+    cache = make_cache(tmp_path, index_dir)
+    cache.store("how do I get a refund", "ctx", "Refunds take 5 days.")
+    (index_dir / "index.faiss").write_bytes(b"v2, rebuilt")
+    # Noticed on the first lookup after INDEX_CHECK_SECONDS
+    assert cache.lookup("how do I get a refund", "ctx")[0] is not None
+    monkeypatch.setattr(response_cache, "INDEX_CHECK_SECONDS", 0)
+
+    assert cache.lookup("how do I get a refund", "ctx")[0] is None
+    assert cache.stats()["entries"] == 0
+    assert make_cache(tmp_path, index_dir).stats()["entries"] == 0
+
+
+def test_cache_key_ignores_similar_ticket_order():
+    tickets = [{"ticket_id": 7}, {"ticket_id": 3}]
+    assert cache_key(["a", "b"], tickets) == cache_key(["a", "b"], tickets[::-1])
+    assert cache_key(["a", "b"], tickets) != cache_key(["a", "b"], tickets[:1])
+    assert cache_key(["a", "b"]) != cache_key(["b", "a"])
+
+
+def test_customers_with_different_history_do_not_share_answers(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir)
+    kb = ["Refunds are issued within 5 days."]
+    history_a = [{"ticket_id": 11, "ticket_subject": "Refund for order 1234", "resolution": "Refunded $40"}]
+    history_b = [{"ticket_id": 12, "ticket_subject": "Router setup", "resolution": "Reset the router"}]
+    cache.store("how do I get a refund", cache_key(kb, (), history_a), "Your $40 refund for order 1234 ...")
+
+    assert cache.lookup("how do I get a refund", cache_key(kb, (), history_b))[0] is None
+    assert cache.lookup("how do I get a refund", cache_key(kb))[0] is None
+    assert cache.lookup("how do I get a refund", cache_key(kb, (), history_a))[0] is not None
+
+
+def test_customers_without_history_share_answers(tmp_path, index_dir):
+    cache = make_cache(tmp_path, index_dir)
+    kb = ["Refunds are issued within 5 days."]
+    cache.store("how do I get a refund", cache_key(kb, [{"ticket_id": 3}], ()), "Refunds take 5 days.")
+    assert cache.lookup("how can I get a refund", cache_key(kb, [{"ticket_id": 3}]))[0] == "Refunds take 5 days."
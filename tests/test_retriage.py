@@ -0,0 +1,53 @@
+# tests/test_retriage.py
+import pytest
+
+pytest.importorskip("pandas")
+
+from retriage import OUTPUT_COLUMNS, ResultWriter, _batches, checkpoint_path, load_done, save_done
+
+
+@pytest.fixture
+def tickets_csv(tmp_path):
+    path = tmp_path / "tickets.csv"
+    rows = ["Ticket ID,Ticket Subject,Ticket Description,Product Purchased"]
+    rows += [f"{i},Subject {i},Issue with {{product_purchased}},Router" for i in range(1, 8)]
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def test_checkpoint_roundtrip(tmp_path, tickets_csv):
+    path = checkpoint_path(str(tmp_path / "out.csv"))
+    assert load_done(path, tickets_csv) == set()
+
+    save_done(path, tickets_csv, {"3", "1"})
+    assert load_done(path, tickets_csv) == {"1", "3"}
+
+
+def test_checkpoint_for_another_csv_is_ignored(tmp_path, tickets_csv):
+    path = checkpoint_path(str(tmp_path / "out.csv"))
+    save_done(path, str(tmp_path / "other.csv"), {"1"})
+    assert load_done(path, tickets_csv) == set()
+
+
+def test_batches_skip_done_tickets(tickets_csv):
+    batches = list(_batches(tickets_csv, chunksize=2, batch_size=3, done={"2", "5"}, limit=None))
+    assert [[t["ticket_id"] for t in b] for b in batches] == [["1", "3", "4"], ["6", "7"]]
+    assert batches[0][0]["ticket_description"] == "Issue with Router"
+
+
+def test_batches_respect_limit(tickets_csv):
+    batches = list(_batches(tickets_csv, chunksize=5, batch_size=3, done={"1"}, limit=4))
+    assert [[t["ticket_id"] for t in b] for b in batches] == [["2", "3", "4"], ["5"]]
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.parquet"])
+def test_written_ids_cover_rows_written_after_the_last_checkpoint(tmp_path, name):
+    if name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    out = str(tmp_path / name)
+    assert ResultWriter(out).written_ids() == set()
+
+    writer = ResultWriter(out)
+    writer.write([[t.get(c, "") for c in OUTPUT_COLUMNS] for t in ({"ticket_id": "1"}, {"ticket_id": "2"})])
+    writer.write([[t.get(c, "") for c in OUTPUT_COLUMNS] for t in ({"ticket_id": "3"},)])
+    assert ResultWriter(out).written_ids() == {"1", "2", "3"}
@@ -0,0 +1,48 @@
+# tests/test_telemetry.py
+import sys
+import socket
+import urllib.request
+
+import pytest
+
+import telemetry
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(telemetry, "ENABLED", True)
+    yield
+    if telemetry._server is not None:
+        telemetry._server.shutdown()
+        telemetry._server.server_close()
+        telemetry._server = None
+
+
+def test_metrics_server_is_off_without_a_port(enabled, monkeypatch):
+    monkeypatch.setattr(telemetry, "METRICS_PORT", 0)
+    assert telemetry.start_metrics_server() is None
+
+
+def test_metrics_server_binds_loopback_by_default(enabled):
+    port = free_port()
+    server = telemetry.start_metrics_server(port)
+    assert server.server_address == ("127.0.0.1", port)
+    assert telemetry.start_metrics_server(port) is server
+
+    telemetry.count("tickets_processed")
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert b"tickets_processed" in response.read()
+
+
+def test_import_rag_does_not_start_the_server(enabled, monkeypatch):
+    pytest.importorskip("dotenv")
+    monkeypatch.setattr(telemetry, "METRICS_PORT", free_port())
+    monkeypatch.delitem(sys.modules, "rag", raising=False)
+    import rag  # noqa: F401
+    assert telemetry._server is None
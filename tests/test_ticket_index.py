@@ -0,0 +1,83 @@
+# tests/test_ticket_index.py
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("pandas")
+
+from ticket_index import TicketIndex, build_ticket_index
+from vector_format import current_dir
+
+
+class HashEmbeddings:
+    """Deterministic bag-of-words vectors, enough for exact-match search."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        vec = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vec
+
+
+class FailingEmbeddings(HashEmbeddings):
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding model crashed")
+
+
+def write_csv(path, subjects):
+    rows = ["Ticket ID,Ticket Subject,Ticket Description,Product Purchased,Ticket Type,Resolution,Ticket Priority"]
+    rows += [f"{i},{s},{s} details,Router,Technical issue,Fixed {s},High" for i, s in enumerate(subjects, start=1)]
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def test_rebuild_publishes_a_new_version(tmp_path):
+    out = str(tmp_path / "ticket_index")
+    embeddings = HashEmbeddings()
+    build_ticket_index(embeddings, write_csv(tmp_path / "a.csv", ["wifi drops", "login fails"]),
+                       out_dir=out, index_type="flat")
+    first = TicketIndex(embeddings, out)
+    first_dir = current_dir(out)
+
+    build_ticket_index(embeddings, write_csv(tmp_path / "b.csv", ["battery drains", "screen cracked", "wifi drops"]),
+                       out_dir=out, index_type="flat")
+    assert current_dir(out) != first_dir
+    second = TicketIndex(embeddings, out)
+    assert second.meta["count"] == 3
+    assert second.search("battery drains", "battery drains details", "Router", top_k=1)[0]["resolution"] \
+        == "Fixed battery drains"
+
+    # A reader that loaded the previous version keeps a consistent index/table pair
+    assert first.search("login fails", "login fails details", "Router", top_k=1)[0]["resolution"] \
+        == "Fixed login fails"
+
+
+def test_failed_build_keeps_the_live_index(tmp_path):
+    out = str(tmp_path / "ticket_index")
+    build_ticket_index(HashEmbeddings(), write_csv(tmp_path / "a.csv", ["wifi drops"]), out_dir=out,
+                       index_type="flat")
+    live = current_dir(out)
+
+    with pytest.raises(RuntimeError):
+        build_ticket_index(FailingEmbeddings(), write_csv(tmp_path / "b.csv", ["login fails"]), out_dir=out,
+                           index_type="flat")
+    assert current_dir(out) == live
+    assert TicketIndex(HashEmbeddings(), out).meta["count"] == 1
+
+
+def test_excluded_ids_are_not_returned(tmp_path):
+    out = str(tmp_path / "ticket_index")
+    embeddings = HashEmbeddings()
+    build_ticket_index(embeddings, write_csv(tmp_path / "a.csv", ["wifi drops", "wifi drops often", "login fails"]),
+                       out_dir=out, index_type="flat")
+    index = TicketIndex(embeddings, out)
+
+    hits = index.search("wifi drops", "wifi drops details", "Router", top_k=2)
+    assert hits[0]["ticket_id"] == "1"
+    hits = index.search("wifi drops", "wifi drops details", "Router", top_k=2, exclude_ids=[1])
+    assert [h["ticket_id"] for h in hits] == ["2", "3"]
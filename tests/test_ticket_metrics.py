@@ -0,0 +1,40 @@
+# tests/test_ticket_metrics.py
+import pytest
+
+from ticket_store import HEADERS, TicketStore
+
+
+def make_ticket(ticket_id, **fields):
+    ticket = {h: "" for h in HEADERS}
+    ticket.update(ticket_id=ticket_id, ticket_status="Open", ticket_priority="High",
+                  ticket_channel="Email", assigned_agent="Sales")
+    ticket.update(fields)
+    return ticket
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TicketStore(str(tmp_path / "tickets.db"))
+
+
+def test_metrics_follow_inserts_and_updates(store):
+    store.save(make_ticket("T1"))
+    store.save(make_ticket("T2", assigned_agent="Engineering"))
+    store.save(make_ticket("T1", ticket_status="Closed", customer_satisfaction_rating="4"))
+
+    metrics = store.metrics(reconcile_ttl=0)
+    assert metrics["total_tickets"] == 2
+    assert metrics["tickets_by_status"] == {"Open": 1, "Closed": 1}
+    assert metrics["tickets_per_agent"] == {"Sales": 1, "Engineering": 1}
+    assert metrics["overall_avg_csat"] == 4
+
+
+def test_metric_deltas_match_a_full_recompute(store):
+    for i in range(5):
+        store.save(make_ticket(f"T{i}", ticket_priority=["Low", "High"][i % 2]))
+    store.save(make_ticket("T0", ticket_status="Closed", customer_satisfaction_rating="5"))
+    store.save(make_ticket("T3", ticket_status="Closed", customer_satisfaction_rating="2"))
+
+    incremental = store.metrics(reconcile_ttl=0)
+    store.reconcile_metrics()
+    assert store.metrics(reconcile_ttl=0) == incremental
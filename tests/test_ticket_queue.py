@@ -0,0 +1,79 @@
+# tests/test_ticket_queue.py
+import pytest
+
+import ticket_queue
+from ticket_queue import DONE, FAILED, QUEUED, RUNNING, TicketQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TicketQueue(str(tmp_path / "queue.db"))
+
+
+def test_claim_and_complete(queue):
+    queue.enqueue({"ticket_id": "T1", "ticket_subject": "Refund"})
+    job = queue.claim("worker-a")
+    assert job == {"ticket_id": "T1", "ticket": {"ticket_id": "T1", "ticket_subject": "Refund"}, "attempts": 1}
+    assert queue.claim("worker-b") is None
+
+    queue.complete("T1", "worker-a", {"category": "Refund request"})
+    status = queue.status("T1")
+    assert status["status"] == DONE
+    assert status["result"] == {"category": "Refund request"}
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue({"ticket_id": "T1"})
+    queue.claim("worker-a", lease_seconds=-1)  # worker-a stalls past its lease
+
+    job = queue.claim("worker-b")
+    assert job["ticket_id"] == "T1"
+    assert job["attempts"] == 2
+    assert queue.renew("T1", "worker-a") is False
+    assert queue.renew("T1", "worker-b") is True
+
+    # The stalled worker's late result is ignored
+    queue.complete("T1", "worker-a", {"category": "stale"})
+    assert queue.status("T1")["status"] == RUNNING
+    queue.complete("T1", "worker-b", {"category": "fresh"})
+    assert queue.status("T1")["result"] == {"category": "fresh"}
+
+
+def test_job_that_keeps_losing_its_worker_is_failed(queue, monkeypatch):
+    monkeypatch.setattr(ticket_queue, "MAX_ATTEMPTS", 2)
+    queue.enqueue({"ticket_id": "T1"})
+    queue.claim("worker-a", lease_seconds=-1)
+    queue.claim("worker-b", lease_seconds=-1)
+
+    assert queue.claim("worker-c") is None
+    status = queue.status("T1")
+    assert status["status"] == FAILED
+    assert "too many times" in status["error"]
+
+
+def test_fail_requeues_until_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(ticket_queue, "MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(ticket_queue, "RETRY_DELAY_SECONDS", 0)
+    queue.enqueue({"ticket_id": "T1"})
+
+    queue.claim("worker-a")
+    queue.fail("T1", "worker-a", "LLMError: 503")
+    assert queue.status("T1")["status"] == QUEUED
+
+    assert queue.claim("worker-a")["attempts"] == 2
+    queue.fail("T1", "worker-a", "LLMError: 503")
+    status = queue.status("T1")
+    assert status["status"] == FAILED
+    assert status["error"] == "LLMError: 503"
+    assert queue.counts() == {FAILED: 1}
+
+
+def test_reenqueue_only_restarts_finished_jobs(queue):
+    queue.enqueue({"ticket_id": "T1", "v": 1})
+    queue.claim("worker-a")
+    queue.enqueue({"ticket_id": "T1", "v": 2})
+    assert queue.status("T1")["status"] == RUNNING
+
+    queue.complete("T1", "worker-a", {})
+    queue.enqueue({"ticket_id": "T1", "v": 2})
+    assert queue.claim("worker-a")["ticket"] == {"ticket_id": "T1", "v": 2}
@@ -0,0 +1,99 @@
+# tests/test_ticket_store.py
+import pytest
+
+from benchmarks.fakes import FakeWorksheet
+from ticket_store import HEADERS, SheetSyncer, TicketStore
+
+
+def make_ticket(ticket_id, **fields):
+    ticket = {h: "" for h in HEADERS}
+    ticket.update(ticket_id=ticket_id, ticket_status="Open", ticket_priority="High",
+                  ticket_channel="Email", assigned_agent="Sales")
+    ticket.update(fields)
+    return ticket
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TicketStore(str(tmp_path / "tickets.db"))
+
+
+# ================================
+# Sync leases
+# ================================
+def test_claim_dirty_leases_rows_to_one_claimer(store):
+    for i in range(3):
+        store.save(make_ticket(f"T{i}"))
+
+    first = store.claim_dirty(2)
+    second = store.claim_dirty(2)
+    assert [b["ticket_id"] for b in first] == ["T0", "T1"]
+    assert [b["ticket_id"] for b in second] == ["T2"]
+    assert store.claim_dirty(2) == []
+
+
+def test_expired_lease_is_claimed_again(store):
+    store.save(make_ticket("T1"))
+    assert len(store.claim_dirty(10, lease_seconds=-1)) == 1
+    assert [b["ticket_id"] for b in store.claim_dirty(10)] == ["T1"]
+
+
+def test_mark_synced_clears_dirty(store):
+    store.save(make_ticket("T1"))
+    batch = store.claim_dirty(10)
+    store.mark_synced([(b["ticket_id"], b["version"], 2) for b in batch])
+
+    assert store.pending_sync_count() == 0
+    assert store.claim_dirty(10) == []
+
+
+def test_row_saved_during_sync_stays_dirty(store):
+    store.save(make_ticket("T1"))
+    batch = store.claim_dirty(10)
+    store.save(make_ticket("T1", ticket_status="Closed"))
+    store.mark_synced([(b["ticket_id"], b["version"], 2) for b in batch])
+
+    assert store.pending_sync_count() == 1
+    retry = store.claim_dirty(10)
+    assert retry[0]["version"] == batch[0]["version"] + 1
+    assert retry[0]["sheet_row"] == 2
+    assert retry[0]["ticket"]["ticket_status"] == "Closed"
+
+
+def test_release_makes_rows_claimable(store):
+    store.save(make_ticket("T1"))
+    batch = store.claim_dirty(10)
+    store.release([b["ticket_id"] for b in batch])
+    assert [b["ticket_id"] for b in store.claim_dirty(10)] == ["T1"]
+
+
+# ================================
+# SheetSyncer
+# ================================
+def test_syncer_appends_new_rows_then_updates_in_place(store):
+    sheet = FakeWorksheet(rows=[HEADERS], latency=0)
+    syncer = SheetSyncer(store, sheet, HEADERS)
+    store.save(make_ticket("T1"))
+    store.save(make_ticket("T2"))
+
+    assert syncer.flush() == 2
+    assert [r[0] for r in sheet.rows] == ["ticket_id", "T1", "T2"]
+
+    store.save(make_ticket("T1", ticket_status="Closed"))
+    assert syncer.flush() == 1
+    assert len(sheet.rows) == 3
+    assert sheet.rows[1][HEADERS.index("ticket_status")] == "Closed"
+    assert sheet.log.calls["append_rows"] == 1
+    assert sheet.log.calls["batch_update"] == 1
+    assert store.pending_sync_count() == 0
+
+
+def test_syncer_failure_releases_the_batch(store):
+    sheet = FakeWorksheet(rows=[HEADERS], latency=0, error_rate=1.0)
+    syncer = SheetSyncer(store, sheet, HEADERS)
+    store.save(make_ticket("T1"))
+
+    with pytest.raises(Exception, match="429"):
+        syncer.flush()
+    assert store.pending_sync_count() == 1
+    assert [b["ticket_id"] for b in store.claim_dirty(10)] == ["T1"]
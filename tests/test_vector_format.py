@@ -0,0 +1,141 @@
+# tests/test_vector_format.py
+import os
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+import vector_format
+from vector_format import ChunkFile, current_dir, publish, write_chunks
+
+
+def make_docs(n):
+    return [SimpleNamespace(page_content=f"chunk {i} ✓", metadata={"source": "terms.txt", "i": i})
+            for i in range(n)]
+
+
+@pytest.fixture
+def chunks_path(tmp_path):
+    path = str(tmp_path / "chunks.bin")
+    write_chunks(path, [f"id{i}" for i in range(3)], make_docs(3))
+    return path
+
+
+# ================================
+# Chunks file
+# ================================
+def test_header_and_ids(chunks_path):
+    chunks = ChunkFile(chunks_path, verify=True)
+    assert chunks.count == 3
+    assert chunks.ids == ["id0", "id1", "id2"]
+    assert chunks.position["id2"] == 2
+    chunks.close()
+
+
+def test_documents_roundtrip(chunks_path):
+    pytest.importorskip("langchain_core")
+    chunks = ChunkFile(chunks_path)
+    doc = chunks.document(1)
+    assert doc.page_content == "chunk 1 ✓"
+    assert doc.metadata == {"source": "terms.txt", "i": 1}
+    chunks.close()
+
+
+def test_mismatched_ids_and_docs(tmp_path):
+    with pytest.raises(ValueError):
+        write_chunks(str(tmp_path / "chunks.bin"), ["id0"], make_docs(2))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "chunks.bin"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError, match="is empty"):
+        ChunkFile(str(path))
+
+
+def test_truncated_header(chunks_path):
+    with open(chunks_path, "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(ValueError, match="truncated"):
+        ChunkFile(chunks_path)
+
+
+def test_truncated_body(chunks_path):
+    with open(chunks_path, "r+b") as f:
+        f.truncate(os.path.getsize(chunks_path) - 5)
+    with pytest.raises(ValueError, match="truncated"):
+        ChunkFile(chunks_path)
+
+
+def test_bad_magic(chunks_path):
+    with open(chunks_path, "r+b") as f:
+        f.write(b"NOTCHUNK")
+    with pytest.raises(ValueError, match="not a KB chunks file"):
+        ChunkFile(chunks_path)
+
+
+def test_wrong_format_version(chunks_path):
+    with open(chunks_path, "r+b") as f:
+        f.seek(len(vector_format.MAGIC))
+        f.write(struct.pack("<H", vector_format.FORMAT_VERSION + 1))
+    with pytest.raises(ValueError, match="format version"):
+        ChunkFile(chunks_path)
+
+
+def test_checksum_mismatch_only_checked_on_verify(chunks_path):
+    with open(chunks_path, "r+b") as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b"XYZ")
+    ChunkFile(chunks_path).close()  # same size, so the cheap open succeeds
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        ChunkFile(chunks_path, verify=True)
+
+
+# ================================
+# Versioned publish
+# ================================
+def write_marker(text):
+    def write(version_dir):
+        with open(os.path.join(version_dir, "marker.txt"), "w") as f:
+            f.write(text)
+    return write
+
+
+def read_marker(index_dir):
+    with open(os.path.join(current_dir(index_dir), "marker.txt")) as f:
+        return f.read()
+
+
+def test_publish_switches_current_and_prunes(tmp_path):
+    index_dir = str(tmp_path / "faiss_store")
+    assert current_dir(index_dir) == index_dir  # flat layout until the first publish
+
+    for i in range(vector_format.KEEP_VERSIONS + 3):
+        publish(index_dir, write_marker(str(i)))
+        assert read_marker(index_dir) == str(i)
+    assert len(vector_format._versions(index_dir)) == vector_format.KEEP_VERSIONS + 1
+
+
+def test_failed_publish_keeps_the_live_version(tmp_path):
+    index_dir = str(tmp_path / "faiss_store")
+    publish(index_dir, write_marker("good"))
+
+    def broken(version_dir):
+        write_marker("half")(version_dir)
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        publish(index_dir, broken)
+    assert read_marker(index_dir) == "good"
+    assert len(vector_format._versions(index_dir)) == 1
+
+
+def test_publish_removes_flat_files_one_publish_later(tmp_path):
+    index_dir = tmp_path / "faiss_store"
+    index_dir.mkdir()
+    (index_dir / vector_format.INDEX_FILE).write_bytes(b"old")
+
+    publish(str(index_dir), write_marker("1"))
+    assert (index_dir / vector_format.INDEX_FILE).exists()  # a reader may still be loading it
+    publish(str(index_dir), write_marker("2"))
+    assert not (index_dir / vector_format.INDEX_FILE).exists()
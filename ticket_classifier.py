@@ -0,0 +1,191 @@
+# ticket_classifier.py
+import os
+import argparse
+
+import numpy as np
+
+from ticket_csv import TICKETS_CSV, iter_ticket_chunks, ticket_text
+
+# ================================
+# Configuration
+# ================================
+MODEL_PATH = os.getenv("TICKET_CLASSIFIER_PATH", "models/ticket_classifier.joblib")
+DEFAULT_THRESHOLD = float(os.getenv("TICKET_CLASSIFIER_THRESHOLD", "0.8"))
+EVAL_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+# ================================
+# Local fast-path classifier
+# ================================
+class TicketClassifier:
+    """
+    MiniLM embeddings + one logistic-regression head per label
+    (ticket_type → category, ticket_priority → priority). A prediction is
+    only trusted when both heads are at least `threshold` confident;
+    otherwise the caller falls back to the LLM.
+    """
+
+    def __init__(self, embeddings, heads, threshold=DEFAULT_THRESHOLD, split=None):
+        self.embeddings = embeddings
+        self.heads = heads  # {"category": LogisticRegression, "priority": LogisticRegression}
+        self.threshold = threshold
+        self.split = split  # {"csv": training CSV, "test_ids": held-out ticket IDs}, None if unknown
+
+    @classmethod
+    def load(cls, embeddings, path=MODEL_PATH, threshold=None):
+        import joblib
+
+        saved = joblib.load(path)
+        return cls(embeddings, saved["heads"], threshold if threshold is not None else saved["threshold"],
+                   saved.get("split"))
+
+    def save(self, path=MODEL_PATH):
+        import joblib
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump({"heads": self.heads, "threshold": self.threshold, "split": self.split}, path)
+
+    def predict_vectors(self, vectors):
+        """Per-head (labels, confidences) for a batch of embeddings."""
+        out = {}
+        for name, head in self.heads.items():
+            proba = head.predict_proba(vectors)
+            best = proba.argmax(axis=1)
+            out[name] = (head.classes_[best], proba[np.arange(len(best)), best])
+        return out
+
+    def predict(self, subject, description, product=""):
+        """
+        Returns {"category", "priority", "confidence"} when confident enough,
+        else None.
+        """
+        vec = np.asarray([self.embeddings.embed_query(ticket_text(subject, description, product))])
+        preds = self.predict_vectors(vec)
+        confidence = float(min(conf[0] for _, conf in preds.values()))
+        if confidence < self.threshold:
+            return None
+        return {
+            "category": str(preds["category"][0][0]),
+            "priority": str(preds["priority"][0][0]),
+            "confidence": confidence,
+        }
+
+
+# ================================
+# Training / Evaluation
+# ================================
+def load_training_data(embeddings, csv_path=TICKETS_CSV, batch_size=512, limit=None, only_ids=None):
+    """Embedded labeled tickets as (vectors, categories, priorities, ticket IDs); `only_ids` restricts the rows."""
+    vectors, categories, priorities, ids = [], [], [], []
+    for chunk in iter_ticket_chunks(csv_path):
+        chunk = chunk[(chunk["ticket_type"] != "") & (chunk["ticket_priority"] != "")]
+        if only_ids is not None:
+            chunk = chunk[chunk["ticket_id"].astype(str).isin(only_ids)]
+        for start in range(0, len(chunk), batch_size):
+            batch = chunk.iloc[start:start + batch_size]
+            texts = [
+                ticket_text(r.ticket_subject, r.ticket_description, r.product_purchased)
+                for r in batch.itertuples()
+            ]
+            vectors.extend(embeddings.embed_documents(texts))
+            categories.extend(batch["ticket_type"])
+            priorities.extend(batch["ticket_priority"])
+            ids.extend(batch["ticket_id"].astype(str))
+            print(f"   embedded {len(vectors)} ticket(s)")
+            if limit and len(vectors) >= limit:
+                break
+        if limit and len(vectors) >= limit:
+            break
+    return np.asarray(vectors, dtype=np.float32), np.asarray(categories), np.asarray(priorities), ids
+
+
+def evaluate(classifier, vectors, labels, thresholds=EVAL_THRESHOLDS):
+    """Accuracy per head, plus coverage / accuracy / LLM call rate per threshold."""
+    preds = classifier.predict_vectors(vectors)
+    report = {
+        f"{name}_accuracy": float((preds[name][0] == labels[name]).mean())
+        for name in preds
+    }
+    confidence = np.min([conf for _, conf in preds.values()], axis=0)
+    both_correct = np.all([preds[name][0] == labels[name] for name in preds], axis=0)
+    report["thresholds"] = {}
+    for t in thresholds:
+        confident = confidence >= t
+        report["thresholds"][t] = {
+            "coverage": float(confident.mean()),
+            "confident_accuracy": float(both_correct[confident].mean()) if confident.any() else None,
+            "llm_call_rate": float(1 - confident.mean()),
+        }
+    return report
+
+
+def print_report(report, threshold):
+    print(f"📊 Category accuracy: {report['category_accuracy']:.3f}")
+    print(f"📊 Priority accuracy: {report['priority_accuracy']:.3f}")
+    print("   threshold  coverage  confident_acc  llm_call_rate")
+    for t, r in sorted(report["thresholds"].items()):
+        acc = f"{r['confident_accuracy']:.3f}" if r["confident_accuracy"] is not None else "  -  "
+        marker = "  ←" if t == threshold else ""
+        print(f"   {t:9.2f}  {r['coverage']:8.3f}  {acc:>13}  {r['llm_call_rate']:13.3f}{marker}")
+
+
+def train(embeddings, csv_path=TICKETS_CSV, threshold=DEFAULT_THRESHOLD, test_size=0.2, limit=None):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+
+    vectors, categories, priorities, ids = load_training_data(embeddings, csv_path, limit=limit)
+    X_train, X_test, c_train, c_test, p_train, p_test, _, test_ids = train_test_split(
+        vectors, categories, priorities, ids, test_size=test_size, random_state=42, stratify=categories
+    )
+    heads = {
+        "category": LogisticRegression(max_iter=1000).fit(X_train, c_train),
+        "priority": LogisticRegression(max_iter=1000).fit(X_train, p_train),
+    }
+    split = {"csv": os.path.abspath(csv_path), "test_ids": sorted(test_ids)}
+    classifier = TicketClassifier(embeddings, heads, threshold, split)
+    thresholds = sorted(set(EVAL_THRESHOLDS) | {threshold})
+    report = evaluate(classifier, X_test, {"category": c_test, "priority": p_test}, thresholds)
+    return classifier, report
+
+
+# MAIN
+if __name__ == "__main__":
+    from resources import get_embeddings
+
+    parser = argparse.ArgumentParser(description="Train / evaluate the local ticket classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_train = sub.add_parser("train", help="Train on a ticket CSV and report held-out accuracy")
+    p_train.add_argument("--csv", default=TICKETS_CSV)
+    p_train.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    p_train.add_argument("--limit", type=int, help="Only use the first N tickets")
+    p_train.add_argument("--out", default=MODEL_PATH)
+
+    p_eval = sub.add_parser("evaluate", help="Evaluate a saved model on a labeled ticket CSV")
+    p_eval.add_argument("--csv", required=True,
+                        help="Held-out labeled CSV; the training CSV is reduced to the train command's test split")
+    p_eval.add_argument("--model", default=MODEL_PATH)
+    p_eval.add_argument("--threshold", type=float)
+    p_eval.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+    embeddings = get_embeddings()
+
+    if args.command == "train":
+        classifier, report = train(embeddings, args.csv, args.threshold, limit=args.limit)
+        print_report(report, args.threshold)
+        classifier.save(args.out)
+        print(f"✅ Classifier saved at '{args.out}'")
+    else:
+        classifier = TicketClassifier.load(embeddings, args.model, args.threshold)
+        only_ids = None
+        if classifier.split and classifier.split["csv"] == os.path.abspath(args.csv):
+            only_ids = set(classifier.split["test_ids"])
+            print(f"ℹ️ {args.csv} is the training CSV: evaluating on its {len(only_ids)} held-out ticket(s)")
+        elif classifier.split is None:
+            print("⚠️ Model has no record of its training split; make sure --csv was not used for training")
+        vectors, categories, priorities, _ = load_training_data(embeddings, args.csv, limit=args.limit, only_ids=only_ids)
+        thresholds = sorted(set(EVAL_THRESHOLDS) | {classifier.threshold})
+        report = evaluate(classifier, vectors, {"category": categories, "priority": priorities}, thresholds)
+        print_report(report, classifier.threshold)
@@ -0,0 +1,29 @@
+# ticket_csv.py
+import pandas as pd
+
+# ================================
+# Helpers for the historical ticket CSVs
+# ================================
+# data/customer_support_tickets.csv uses "Ticket ID"-style headers while the
+# sheet and processed_tickets.csv use snake_case; normalize to the latter.
+TICKETS_CSV = "data/customer_support_tickets.csv"
+
+
+def normalize_column(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+
+def iter_ticket_chunks(csv_path=TICKETS_CSV, chunksize=5000):
+    """Stream a ticket CSV as DataFrames of `chunksize` rows with snake_case columns."""
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str, keep_default_na=False):
+        chunk.columns = [normalize_column(c) for c in chunk.columns]
+        yield chunk
+
+
+def ticket_text(subject, description, product=""):
+    """
+    Text used for embedding/classifying a ticket. The dataset's templated
+    descriptions contain a literal "{product_purchased}" placeholder.
+    """
+    description = str(description or "").replace("{product_purchased}", str(product or "the product"))
+    return f"{subject or ''}\n{description}".strip()
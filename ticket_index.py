@@ -0,0 +1,236 @@
+# ticket_index.py
+import os
+import json
+import sqlite3
+import argparse
+import threading
+
+import numpy as np
+
+from ticket_csv import TICKETS_CSV, iter_ticket_chunks, ticket_text
+from vector_format import current_dir, publish
+
+# ================================
+# Configuration
+# ================================
+TICKET_INDEX_DIR = "ticket_index"
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.json"
+DOCS_FILE = "tickets.sqlite"
+FLAT_FILES = (INDEX_FILE, META_FILE, DOCS_FILE)  # layout written before versioned publishing
+
+# Search-time knobs (recall vs latency); overridable per TicketIndex
+DEFAULT_NPROBE = int(os.getenv("TICKET_INDEX_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("TICKET_INDEX_EF_SEARCH", "64"))
+
+
+def index_factory_string(index_type, count, nlist=None, pq_m=0, hnsw_m=32):
+    """
+    FAISS factory string for the ticket index:
+      flat → exact search (small corpora)
+      ivf  → IVF{nlist}[,PQ{m}]   – inverted lists, tune with nprobe
+      hnsw → HNSW{M}[_PQ{m}]      – graph search, tune with efSearch
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf":
+        nlist = nlist or max(16, int(4 * np.sqrt(max(count, 1))))
+        return f"IVF{nlist},PQ{pq_m}" if pq_m else f"IVF{nlist},Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}_PQ{pq_m}" if pq_m else f"HNSW{hnsw_m}"
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+# ================================
+# Build
+# ================================
+def iter_resolved_tickets(csv_path=TICKETS_CSV, chunksize=5000):
+    """Rows with a non-empty resolution, streamed in chunks."""
+    for chunk in iter_ticket_chunks(csv_path, chunksize):
+        resolved = chunk[chunk["resolution"].str.strip() != ""]
+        if not resolved.empty:
+            yield resolved
+
+
+def build_ticket_index(embeddings, csv_path=TICKETS_CSV, out_dir=TICKET_INDEX_DIR,
+                       index_type="ivf", nlist=None, pq_m=0, hnsw_m=32,
+                       batch_size=1024, train_size=50000):
+    """
+    Embed resolved tickets in batches and write a FAISS index plus an SQLite
+    table of ticket fields keyed by vector position. IVF/PQ indexes are
+    trained on the first `train_size` vectors before the rest are streamed in.
+    The files go to a new version directory that is published atomically
+    (vector_format.publish), so a running app never loads a half-written or
+    mismatched index/table pair.
+    """
+    built = {}
+
+    def write(version_dir):
+        built["spec"], built["count"] = _write_ticket_index(
+            embeddings, csv_path, version_dir, index_type, nlist, pq_m, hnsw_m, batch_size, train_size)
+
+    publish(out_dir, write, flat_files=FLAT_FILES)
+    print(f"✅ Ticket index ({built['spec']}, {built['count']} tickets) saved at '{out_dir}/'")
+
+
+def _write_ticket_index(embeddings, csv_path, out_dir, index_type, nlist, pq_m, hnsw_m, batch_size, train_size):
+    import faiss
+
+    conn = sqlite3.connect(os.path.join(out_dir, DOCS_FILE))
+    conn.execute("""
+        CREATE TABLE tickets (
+            id INTEGER PRIMARY KEY, ticket_id TEXT, product_purchased TEXT,
+            ticket_type TEXT, ticket_subject TEXT, ticket_description TEXT,
+            resolution TEXT, ticket_priority TEXT
+        )
+    """)
+
+    index, spec = None, None
+    pending = []  # vectors waiting for the index to be trained
+    next_id = 0
+
+    def create(train):
+        nonlocal spec
+        spec = index_factory_string(index_type, len(train), nlist, pq_m, hnsw_m)
+        # L2 on unit vectors ranks like cosine and is supported by every index type (HNSW-PQ is L2-only)
+        new_index = faiss.index_factory(train.shape[1], spec, faiss.METRIC_L2)
+        if not new_index.is_trained:
+            print(f"🔧 Training {spec} on {len(train)} vectors...")
+            new_index.train(train)
+        new_index.add(train)
+        return new_index
+
+    def add(vectors):
+        nonlocal index
+        if index is not None:
+            index.add(vectors)
+            return
+        pending.append(vectors)
+        if sum(len(v) for v in pending) >= train_size:
+            index = create(np.vstack(pending))
+            pending.clear()
+
+    for chunk in iter_resolved_tickets(csv_path):
+        for start in range(0, len(chunk), batch_size):
+            batch = chunk.iloc[start:start + batch_size]
+            texts = [
+                ticket_text(r.ticket_subject, r.ticket_description, r.product_purchased)
+                for r in batch.itertuples()
+            ]
+            add(_normalize(embeddings.embed_documents(texts)))
+            conn.executemany(
+                "INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (next_id + i, r.ticket_id, r.product_purchased, r.ticket_type,
+                     r.ticket_subject, r.ticket_description, r.resolution, r.ticket_priority)
+                    for i, r in enumerate(batch.itertuples())
+                ],
+            )
+            next_id += len(batch)
+            print(f"   embedded {next_id} ticket(s)")
+
+    if index is None:
+        if not pending:
+            raise ValueError(f"No resolved tickets found in {csv_path}")
+        index = create(np.vstack(pending))
+
+    conn.commit()
+    conn.close()
+    faiss.write_index(index, os.path.join(out_dir, INDEX_FILE))
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump({"factory": spec, "count": int(index.ntotal), "source": csv_path}, f, indent=2)
+    return spec, int(index.ntotal)
+
+
+# ================================
+# Search
+# ================================
+class TicketIndex:
+    """Top-k similar resolved tickets over the historical ticket corpus."""
+
+    def __init__(self, embeddings, index_dir=TICKET_INDEX_DIR, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+        import faiss
+
+        self.embeddings = embeddings
+        index_dir = current_dir(index_dir)
+        self.index = faiss.read_index(os.path.join(index_dir, INDEX_FILE))
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self._conn = sqlite3.connect(os.path.join(index_dir, DOCS_FILE), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Higher nprobe / efSearch → better recall, slower queries."""
+        import faiss
+
+        if nprobe is not None:
+            try:
+                faiss.extract_index_ivf(self.index).nprobe = nprobe
+            except RuntimeError:
+                pass  # not an IVF index
+        if ef_search is not None and hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = ef_search
+
+    def search(self, subject, description, product="", top_k=3, exclude_ids=()):
+        """Tickets similar to a new one, embedded as ticket_text() like the indexed tickets."""
+        vec = _normalize([self.embeddings.embed_query(ticket_text(subject, description, product))])
+        return self.search_by_vector(vec[0], top_k, exclude_ids)
+
+    def search_by_vector(self, vector, top_k=3, exclude_ids=()):
+        """
+        `vector` must embed ticket_text(subject, description, product) of the
+        query ticket. Tickets in `exclude_ids` (e.g. the query ticket itself,
+        when it is part of the indexed corpus) are left out.
+        """
+        exclude_ids = {str(i) for i in exclude_ids}
+        distances, ids = self.index.search(_normalize([vector]), top_k + len(exclude_ids))
+        # squared L2 between unit vectors → cosine similarity
+        hits = [(int(i), 1.0 - float(d) / 2) for i, d in zip(ids[0], distances[0]) if i >= 0]
+        if not hits:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tickets WHERE id IN ({','.join('?' * len(hits))})",
+                [i for i, _ in hits],
+            ).fetchall()
+        by_id = {r["id"]: dict(r) for r in rows if str(r["ticket_id"]) not in exclude_ids}
+        return [dict(by_id[i], score=s) for i, s in hits if i in by_id][:top_k]
+
+
+def format_similar_tickets(tickets):
+    """Render similar resolved tickets as LLM context."""
+    return "\n".join(
+        f"- [{t['ticket_type']}] {t['ticket_subject']} ({t['product_purchased']}): {t['resolution']}"
+        for t in tickets
+    )
+
+
+# MAIN
+if __name__ == "__main__":
+    from resources import get_embeddings
+
+    parser = argparse.ArgumentParser(description="Build the similar-resolved-ticket index.")
+    parser.add_argument("--csv", default=TICKETS_CSV)
+    parser.add_argument("--out", default=TICKET_INDEX_DIR)
+    parser.add_argument("--type", choices=["flat", "ivf", "hnsw"], default="ivf")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default ~4*sqrt(N))")
+    parser.add_argument("--pq", type=int, default=0, help="Product-quantization sub-vectors (must divide 384; 0 = none)")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--train-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    build_ticket_index(
+        get_embeddings(), csv_path=args.csv, out_dir=args.out, index_type=args.type,
+        nlist=args.nlist, pq_m=args.pq, hnsw_m=args.hnsw_m,
+        batch_size=args.batch_size, train_size=args.train_size,
+    )
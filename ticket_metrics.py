@@ -0,0 +1,145 @@
+# ticket_metrics.py
+import re
+import datetime
+
+# ================================
+# Materialized dashboard metrics
+# ================================
+# Counters and running sums live next to the tickets table in tickets.db and
+# are updated with per-ticket deltas inside the same transaction as the save,
+# so the dashboard reads them at constant cost instead of scanning every row.
+DEFAULT_AGENT = "General Support"
+ALL = "__all__"
+
+DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$", re.IGNORECASE)
+UNIT_SECONDS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_counts (
+            metric TEXT NOT NULL,
+            key    TEXT NOT NULL,
+            count  INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, key)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_sums (
+            metric TEXT NOT NULL,
+            key    TEXT NOT NULL,
+            total  REAL NOT NULL DEFAULT 0,
+            n      INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, key)
+        )
+    """)
+
+
+def parse_duration_seconds(value, first_response_time=None):
+    """
+    Seconds from a time_to_resolution value: "123s"/"2h"/"45" as written by
+    app.py, or a resolution timestamp (as in the historical CSV) measured
+    from first_response_time. None when it cannot be parsed or is negative.
+    """
+    if value in (None, ""):
+        return None
+    match = DURATION_PATTERN.match(str(value))
+    if match:
+        return float(match.group(1)) * UNIT_SECONDS[match.group(2).lower()]
+    try:
+        resolved = datetime.datetime.strptime(str(value), TIMESTAMP_FORMAT)
+        opened = datetime.datetime.strptime(str(first_response_time), TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    seconds = (resolved - opened).total_seconds()
+    return seconds if seconds >= 0 else None
+
+
+def parse_rating(value):
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if rating == rating else None  # drop NaN
+
+
+def contributions(ticket):
+    """What one ticket adds to the counters and sums."""
+    status = str(ticket.get("ticket_status") or "")
+    agent = str(ticket.get("assigned_agent") or DEFAULT_AGENT)
+    counts = [
+        ("total", ALL),
+        ("status", status),
+        ("priority", str(ticket.get("ticket_priority") or "")),
+        ("channel", str(ticket.get("ticket_channel") or "")),
+        ("agent", agent),
+        ("agent_status", f"{agent}|{status}"),
+    ]
+    sums = []
+    rating = parse_rating(ticket.get("customer_satisfaction_rating"))
+    if rating is not None:
+        sums += [("csat", agent, rating), ("csat", ALL, rating)]
+    seconds = parse_duration_seconds(ticket.get("time_to_resolution"), ticket.get("first_response_time"))
+    if seconds is not None:
+        sums += [("resolution_seconds", agent, seconds), ("resolution_seconds", ALL, seconds)]
+    return counts, sums
+
+
+def apply_delta(conn, old, new):
+    """Subtract `old`'s contribution (if any) and add `new`'s. Caller owns the transaction."""
+    for ticket, sign in ((old, -1), (new, 1)):
+        if not ticket:
+            continue
+        counts, sums = contributions(ticket)
+        conn.executemany("""
+            INSERT INTO metric_counts (metric, key, count) VALUES (?, ?, ?)
+            ON CONFLICT(metric, key) DO UPDATE SET count = count + excluded.count
+        """, [(m, k, sign) for m, k in counts])
+        conn.executemany("""
+            INSERT INTO metric_sums (metric, key, total, n) VALUES (?, ?, ?, ?)
+            ON CONFLICT(metric, key) DO UPDATE SET
+                total = total + excluded.total, n = n + excluded.n
+        """, [(m, k, sign * v, sign) for m, k, v in sums])
+
+
+def recompute(conn, tickets):
+    """Rebuild all metrics from scratch (reconciliation). Caller owns the transaction."""
+    conn.execute("DELETE FROM metric_counts")
+    conn.execute("DELETE FROM metric_sums")
+    for ticket in tickets:
+        apply_delta(conn, None, ticket)
+
+
+def read_snapshot(conn):
+    """
+    Metrics in the shape of dashboard.ticket_overview_metrics +
+    agent_performance_metrics (resolution time in seconds).
+    """
+    counts = {}
+    for metric, key, count in conn.execute("SELECT metric, key, count FROM metric_counts WHERE count != 0"):
+        counts.setdefault(metric, {})[key] = count
+    averages = {}
+    for metric, key, total, n in conn.execute("SELECT metric, key, total, n FROM metric_sums WHERE n > 0"):
+        averages.setdefault(metric, {})[key] = total / n
+
+    resolved_pending = {}
+    for key, count in counts.get("agent_status", {}).items():
+        agent, status = key.split("|", 1)
+        resolved_pending.setdefault(agent, {})[status] = count
+
+    def agent_avg(metric):
+        return {k: v for k, v in averages.get(metric, {}).items() if k != ALL}
+
+    return {
+        "total_tickets": counts.get("total", {}).get(ALL, 0),
+        "tickets_by_status": counts.get("status", {}),
+        "tickets_by_priority": counts.get("priority", {}),
+        "tickets_by_channel": counts.get("channel", {}),
+        "tickets_per_agent": counts.get("agent", {}),
+        "avg_resolution_time": agent_avg("resolution_seconds"),
+        "avg_csat": agent_avg("csat"),
+        "overall_avg_resolution_time": averages.get("resolution_seconds", {}).get(ALL),
+        "overall_avg_csat": averages.get("csat", {}).get(ALL),
+        "resolved_pending": resolved_pending,
+    }
@@ -0,0 +1,270 @@
+# ticket_queue.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+# ================================
+# Configuration
+# ================================
+QUEUE_PATH = os.getenv("TICKET_QUEUE_PATH", "ticket_queue.db")
+JOB_LEASE_SECONDS = float(os.getenv("TICKET_QUEUE_LEASE", "60"))  # renewed while a job runs
+MAX_ATTEMPTS = int(os.getenv("TICKET_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = 10
+POLL_INTERVAL = 0.5
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# ================================
+# Durable job queue
+# ================================
+class TicketQueue:
+    """
+    SQLite-backed intake queue. app.py enqueues submitted tickets and returns
+    at once; worker processes claim jobs under a renewable lease, so a job
+    whose worker crashed is picked up again once its lease expires.
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                ticket_id    TEXT PRIMARY KEY,
+                payload      TEXT NOT NULL,
+                status       TEXT NOT NULL,
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner  TEXT,
+                lease_until  REAL,
+                result       TEXT,
+                error        TEXT,
+                enqueued_at  REAL NOT NULL,
+                started_at   REAL,
+                finished_at  REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, available_at)")
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def enqueue(self, ticket):
+        """Queue a ticket for processing; returns its ticket_id. Re-enqueueing a finished ticket requeues it."""
+        ticket_id = str(ticket["ticket_id"])
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (ticket_id, payload, status, available_at, enqueued_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(ticket_id) DO UPDATE SET
+                    payload = excluded.payload, status = excluded.status, attempts = 0,
+                    available_at = excluded.available_at, result = NULL, error = NULL,
+                    enqueued_at = excluded.enqueued_at, started_at = NULL, finished_at = NULL
+                WHERE jobs.status IN (?, ?)
+            """, (ticket_id, json.dumps(ticket, default=str), QUEUED, now, now, DONE, FAILED))
+        return ticket_id
+
+    def claim(self, owner, lease_seconds=JOB_LEASE_SECONDS):
+        """
+        Lease the oldest runnable job to `owner`: a queued job whose retry
+        delay has passed, or a running job whose lease expired (its worker
+        died). Returns {"ticket_id", "ticket", "attempts"} or None.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            # Jobs that keep killing their worker are given up on
+            self._conn.execute("""
+                UPDATE jobs SET status = ?, error = 'worker lost the job too many times',
+                    lease_owner = NULL, lease_until = NULL, finished_at = ?
+                WHERE status = ? AND lease_until < ? AND attempts >= ?
+            """, (FAILED, now, RUNNING, now, MAX_ATTEMPTS))
+            row = self._conn.execute("""
+                SELECT ticket_id, payload, attempts FROM jobs
+                WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?)
+                ORDER BY enqueued_at LIMIT 1
+            """, (QUEUED, now, RUNNING, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("""
+                UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?,
+                    lease_until = ?, started_at = ?
+                WHERE ticket_id = ?
+            """, (RUNNING, owner, now + lease_seconds, now, row["ticket_id"]))
+        return {"ticket_id": row["ticket_id"], "ticket": json.loads(row["payload"]), "attempts": row["attempts"] + 1}
+
+    def renew(self, ticket_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        """Extend a lease; False if the job was taken over (e.g. after a long stall)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE ticket_id = ? AND lease_owner = ? AND status = ?",
+                (time.time() + lease_seconds, ticket_id, owner, RUNNING),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, ticket_id, owner, result):
+        with self._lock:
+            self._conn.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = NULL, lease_owner = NULL,
+                    lease_until = NULL, finished_at = ?
+                WHERE ticket_id = ? AND lease_owner = ?
+            """, (DONE, json.dumps(result, default=str), time.time(), ticket_id, owner))
+
+    def fail(self, ticket_id, owner, error):
+        """Requeue with a delay, or mark failed once MAX_ATTEMPTS is reached."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                UPDATE jobs SET
+                    status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                    available_at = ? + ? * attempts,
+                    finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END,
+                    error = ?, lease_owner = NULL, lease_until = NULL
+                WHERE ticket_id = ? AND lease_owner = ?
+            """, (MAX_ATTEMPTS, FAILED, QUEUED, now, RETRY_DELAY_SECONDS, MAX_ATTEMPTS, now,
+                  error, ticket_id, owner))
+
+    def status(self, ticket_id):
+        """{"status", "attempts", "result", "error", "position"} for a job, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, result, error, enqueued_at FROM jobs WHERE ticket_id = ?",
+                (str(ticket_id),),
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND enqueued_at < ?",
+                    (QUEUED, row["enqueued_at"]),
+                ).fetchone()[0]
+        return {
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "position": position,
+        }
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+# ================================
+# Workers
+# ================================
+def _renew_lease(queue, job, owner, done):
+    while not done.wait(JOB_LEASE_SECONDS / 3):
+        if not queue.renew(job["ticket_id"], owner):
+            return
+
+
+def run_worker(queue_path=QUEUE_PATH, stop=None, poll_interval=POLL_INTERVAL, metrics_port=None):
+    """
+    Worker loop: claim a job, run rag.process_ticket (generating the
+    resolution), store the result. Runs until `stop` is set; a job in
+    progress is finished first. With telemetry enabled the worker serves
+    its own /metrics on `metrics_port` (default TELEMETRY_METRICS_PORT).
+    """
+    import rag
+    import telemetry
+
+    telemetry.start_metrics_server(metrics_port)
+    queue = TicketQueue(queue_path)
+    vectorstore = rag.load_vector_store()
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    print(f"✅ Worker {owner} ready")
+
+    while not (stop and stop.is_set()):
+        job = queue.claim(owner)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        if job["attempts"] > 1:
+            print(f"↩️ Resuming {job['ticket_id']} (attempt {job['attempts']})")
+        done = threading.Event()
+        threading.Thread(target=_renew_lease, args=(queue, job, owner, done), daemon=True).start()
+        try:
+            ticket = rag.process_ticket(job["ticket"], vectorstore, resolve=True)
+            queue.complete(job["ticket_id"], owner, ticket)
+        except Exception as e:
+            print(f"⚠️ {job['ticket_id']} failed: {type(e).__name__}: {e}")
+            queue.fail(job["ticket_id"], owner, f"{type(e).__name__}: {e}")
+        finally:
+            done.set()
+
+
+def _worker_main(queue_path, stop, metrics_port=None):
+    try:
+        run_worker(queue_path, stop, metrics_port=metrics_port)
+    except KeyboardInterrupt:
+        pass
+
+
+def _metrics_port(i):
+    # One /metrics endpoint per worker process: TELEMETRY_METRICS_PORT + i
+    from telemetry import METRICS_PORT
+    return METRICS_PORT + i if METRICS_PORT else None
+
+
+def run_workers(n, queue_path=QUEUE_PATH):
+    """Start `n` worker processes and supervise them until Ctrl+C."""
+    stop = multiprocessing.Event()
+    procs = [
+        multiprocessing.Process(target=_worker_main, args=(queue_path, stop, _metrics_port(i)),
+                                name=f"ticket-worker-{i}")
+        for i in range(n)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        while True:
+            for i, p in enumerate(procs):
+                if not p.is_alive() and not stop.is_set():
+                    # Its in-flight job is resumed by any worker once the lease expires
+                    print(f"⚠️ {p.name} exited ({p.exitcode}), restarting")
+                    procs[i] = multiprocessing.Process(target=_worker_main, args=(queue_path, stop, _metrics_port(i)),
+                                                       name=p.name)
+                    procs[i].start()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("⏳ Stopping workers after their current job...")
+        stop.set()
+        for p in procs:
+            p.join()
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable ticket intake queue and its workers.")
+    parser.add_argument("--queue", default=QUEUE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_worker = sub.add_parser("worker", help="Run worker processes")
+    p_worker.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    sub.add_parser("stats", help="Show job counts by status")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_workers(args.workers, args.queue)
+    else:
+        print(f"📊 {TicketQueue(args.queue).counts()}")
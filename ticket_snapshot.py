@@ -0,0 +1,113 @@
+# ticket_snapshot.py
+import os
+import argparse
+
+import pandas as pd
+
+from ticket_csv import normalize_column
+from ticket_metrics import DURATION_PATTERN, UNIT_SECONDS, TIMESTAMP_FORMAT
+
+# ================================
+# Typed, columnar ticket snapshot
+# ================================
+# Analytics read a Parquet snapshot of the ticket table with proper dtypes
+# instead of the live sheet's all-string rows.
+SNAPSHOT_PATH = os.getenv("TICKET_SNAPSHOT_PATH", "snapshots/tickets.parquet")
+
+PRIORITY_ORDER = ["Low", "Medium", "High", "Critical"]
+CATEGORICAL_COLUMNS = [
+    "ticket_status", "ticket_channel", "assigned_agent", "ticket_type",
+    "customer_gender", "product_purchased", "category",
+]
+TIMESTAMP_COLUMNS = ["first_response_time"]
+DATE_COLUMNS = ["date_of_purchase"]
+
+
+def parse_durations(values, first_response_time=None):
+    """
+    Vectorized time_to_resolution → float seconds.
+    Accepts "123s"/"2h"/"45" (as written by app.py) and resolution timestamps
+    (as in the historical CSV), the latter measured from first_response_time.
+    Unparseable or negative values become NaN.
+    """
+    values = values.astype("string").str.strip()
+    parts = values.str.extract(DURATION_PATTERN)
+    unit = parts[1].str.lower().map(UNIT_SECONDS)
+    seconds = pd.to_numeric(parts[0], errors="coerce") * unit
+
+    if first_response_time is not None:
+        resolved = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors="coerce")
+        opened = pd.to_datetime(first_response_time, format=TIMESTAMP_FORMAT, errors="coerce")
+        seconds = seconds.fillna((resolved - opened).dt.total_seconds())
+    # A resolution before the first response is a data error, not a duration
+    return seconds.where(seconds >= 0).astype("float32")
+
+
+def to_typed_frame(records):
+    """Rows (dicts or a DataFrame) → DataFrame with numeric, datetime and categorical dtypes."""
+    df = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(list(records))
+    df.columns = [normalize_column(c) for c in df.columns]
+    df = df.replace({"": None})
+
+    if "ticket_id" in df:
+        df["ticket_id"] = df["ticket_id"].astype("string")
+    if "time_to_resolution" in df:
+        df["time_to_resolution"] = parse_durations(df["time_to_resolution"], df.get("first_response_time"))
+    for col in TIMESTAMP_COLUMNS:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], format=TIMESTAMP_FORMAT, errors="coerce")
+    for col in DATE_COLUMNS:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+    if "customer_satisfaction_rating" in df:
+        df["customer_satisfaction_rating"] = pd.to_numeric(
+            df["customer_satisfaction_rating"], errors="coerce").astype("float32")
+    if "customer_age" in df:
+        df["customer_age"] = pd.to_numeric(df["customer_age"], errors="coerce").astype("Int16")
+    if "ticket_priority" in df:
+        df["ticket_priority"] = pd.Categorical(df["ticket_priority"], categories=PRIORITY_ORDER, ordered=True)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype("string")
+    return df
+
+
+def write_snapshot(records, path=SNAPSHOT_PATH):
+    """Write a typed Parquet snapshot atomically (temp file + rename)."""
+    df = to_typed_frame(records)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return df
+
+
+def load_snapshot(path=SNAPSHOT_PATH, columns=None):
+    return pd.read_parquet(path, columns=columns)
+
+
+def snapshot_is_fresh(path, last_updated):
+    """True if the snapshot exists and was written after the last ticket change."""
+    return os.path.exists(path) and os.path.getmtime(path) >= (last_updated or 0)
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a typed Parquet snapshot of the ticket table.")
+    parser.add_argument("--from-csv", help="Build from a ticket CSV instead of the local ticket store")
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.from_csv:
+        source = pd.read_csv(args.from_csv, dtype=str, keep_default_na=False)
+    else:
+        from ticket_store import TicketStore
+        source = pd.DataFrame(TicketStore().all_tickets())
+
+    raw_mb = source.memory_usage(deep=True).sum() / 1e6
+    df = write_snapshot(source, args.out)
+    typed_mb = df.memory_usage(deep=True).sum() / 1e6
+    print(f"✅ {len(df)} tickets → '{args.out}' ({raw_mb:.1f} MB as strings → {typed_mb:.1f} MB typed)")
@@ -0,0 +1,434 @@
+# ticket_store.py
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+import ticket_metrics
+import telemetry
+
+# ================================
+# Configuration
+# ================================
+DB_PATH = os.getenv("TICKET_DB_PATH", "tickets.db")
+SYNC_INTERVAL = float(os.getenv("SHEETS_SYNC_INTERVAL", "5"))
+SYNC_BATCH_SIZE = int(os.getenv("SHEETS_SYNC_BATCH_SIZE", "500"))
+SYNC_LEASE_SECONDS = 120
+# Full metrics recompute at most this often (seconds); 0 disables reconciliation
+METRICS_RECONCILE_TTL = float(os.getenv("METRICS_RECONCILE_TTL", "3600"))
+
+
+# ================================
+# Google Sheets Headers
+# ================================
+HEADERS = [
+    "ticket_id",
+    "customer_name",
+    "customer_email",
+    "customer_age",
+    "customer_gender",
+    "product_purchased",
+    "date_of_purchase",
+    "ticket_type",
+    "ticket_subject",
+    "ticket_description",
+    "ticket_status",
+    "resolution",
+    "ticket_priority",
+    "ticket_channel",
+    "first_response_time",
+    "customer_satisfaction_rating",
+    "assigned_agent"
+]
+
+
+def normalize_email(email):
+    return str(email or "").strip().lower() or None
+
+
+def column_letter(n):
+    """1 -> A, 17 -> Q, 27 -> AA"""
+    letters = ""
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+# ================================
+# Local Ticket Store (system of record)
+# ================================
+class TicketStore:
+    """
+    SQLite-backed ticket table. Every save bumps the row version and marks it
+    dirty; the SheetSyncer later pushes dirty rows to Google Sheets.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id   TEXT PRIMARY KEY,
+                data        TEXT NOT NULL,
+                version     INTEGER NOT NULL DEFAULT 1,
+                dirty       INTEGER NOT NULL DEFAULT 1,
+                sheet_row   INTEGER,
+                lease_owner TEXT,
+                lease_until REAL,
+                updated_at  REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(tickets)")}
+        if "customer_email" not in columns:
+            self._conn.execute("ALTER TABLE tickets ADD COLUMN customer_email TEXT")
+            self._conn.execute("""
+                UPDATE tickets SET customer_email = lower(trim(json_extract(data, '$.customer_email')))
+            """)
+        ticket_metrics.create_tables(self._conn)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_dirty ON tickets(dirty)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_email ON tickets(customer_email)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_updated ON tickets(updated_at)")
+
+    def save(self, ticket, sync=True):
+        """Insert or update a ticket and mark it for the next Sheets sync (unless sync=False)."""
+        ticket_id = str(ticket["ticket_id"])
+        data = json.dumps(ticket, default=str)
+        with self._lock, self._transaction():
+            row = self._conn.execute(
+                "SELECT data FROM tickets WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+            self._conn.execute("""
+                INSERT INTO tickets (ticket_id, data, customer_email, dirty, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(ticket_id) DO UPDATE SET
+                    data = excluded.data,
+                    customer_email = excluded.customer_email,
+                    version = tickets.version + 1,
+                    dirty = MAX(tickets.dirty, excluded.dirty),
+                    updated_at = excluded.updated_at
+            """, (ticket_id, data, normalize_email(ticket.get("customer_email")), int(sync), time.time()))
+            ticket_metrics.apply_delta(self._conn, json.loads(row["data"]) if row else None, json.loads(data))
+
+    def import_rows(self, records, first_row=2):
+        """
+        Load rows already present in the sheet (e.g. from get_all_records) as
+        clean, synced tickets. Local tickets that have not been synced yet win.
+        """
+        now = time.time()
+        params = [
+            (str(r["ticket_id"]), json.dumps(r, default=str),
+             normalize_email(r.get("customer_email")), first_row + i, now)
+            for i, r in enumerate(records) if r.get("ticket_id") not in ("", None)
+        ]
+        with self._lock, self._transaction():
+            self._conn.executemany("""
+                INSERT INTO tickets (ticket_id, data, customer_email, dirty, sheet_row, updated_at)
+                VALUES (?, ?, ?, 0, ?, ?)
+                ON CONFLICT(ticket_id) DO UPDATE SET sheet_row = excluded.sheet_row
+            """, params)
+            self._recompute_metrics()
+        return len(params)
+
+    def customer_history(self, email, limit=None):
+        """Previous tickets for one customer, oldest first, via the email index."""
+        email = normalize_email(email)
+        if not email:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM tickets WHERE customer_email = ? ORDER BY rowid DESC LIMIT ?",
+                (email, limit or -1),
+            ).fetchall()
+        rows.reverse()
+        return [json.loads(r["data"]) for r in rows]
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value)),
+            )
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get(self, ticket_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM tickets WHERE ticket_id = ?", (str(ticket_id),)
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def all_tickets(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM tickets ORDER BY rowid").fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    def updated_since(self, since):
+        """(updated_at, ticket) for every ticket saved or imported at or after `since`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT updated_at, data FROM tickets WHERE updated_at >= ? ORDER BY updated_at", (since,)
+            ).fetchall()
+        return [(r["updated_at"], json.loads(r["data"])) for r in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def last_updated(self):
+        """Timestamp of the most recent save/import (None if empty)."""
+        with self._lock:
+            return self._conn.execute("SELECT MAX(updated_at) FROM tickets").fetchone()[0]
+
+    def pending_sync_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets WHERE dirty = 1").fetchone()[0]
+
+    # -------------------------------
+    # Dashboard metrics
+    # -------------------------------
+    def _recompute_metrics(self):
+        rows = self._conn.execute("SELECT data FROM tickets").fetchall()
+        ticket_metrics.recompute(self._conn, (json.loads(r["data"]) for r in rows))
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('metrics_reconciled_at', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(time.time()),),
+        )
+
+    def reconcile_metrics(self):
+        """Full recompute of the materialized metrics from the tickets table."""
+        with self._lock, self._transaction():
+            self._recompute_metrics()
+
+    def metrics(self, reconcile_ttl=METRICS_RECONCILE_TTL):
+        """
+        Materialized dashboard metrics (constant cost). If the last full
+        recompute is older than `reconcile_ttl` seconds, one is run first.
+        """
+        if reconcile_ttl:
+            reconciled_at = float(self.get_meta("metrics_reconciled_at", 0))
+            if time.time() - reconciled_at > reconcile_ttl:
+                self.reconcile_metrics()
+        with self._lock:
+            return ticket_metrics.read_snapshot(self._conn)
+
+    # -------------------------------
+    # Sync bookkeeping
+    # -------------------------------
+    def claim_dirty(self, limit, lease_seconds=SYNC_LEASE_SECONDS):
+        """
+        Lease up to `limit` dirty rows to the caller so that several processes
+        sharing one database never push the same row twice.
+        """
+        owner = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._transaction():
+            self._conn.execute("""
+                UPDATE tickets SET lease_owner = ?, lease_until = ?
+                WHERE ticket_id IN (
+                    SELECT ticket_id FROM tickets
+                    WHERE dirty = 1 AND (lease_until IS NULL OR lease_until < ?)
+                    ORDER BY updated_at LIMIT ?
+                )
+            """, (owner, now + lease_seconds, now, limit))
+            rows = self._conn.execute("""
+                SELECT ticket_id, data, version, sheet_row FROM tickets
+                WHERE lease_owner = ? ORDER BY updated_at
+            """, (owner,)).fetchall()
+        return [
+            {"ticket_id": r["ticket_id"], "ticket": json.loads(r["data"]),
+             "version": r["version"], "sheet_row": r["sheet_row"]}
+            for r in rows
+        ]
+
+    def mark_synced(self, synced):
+        """
+        `synced` is a list of (ticket_id, version, sheet_row). Rows saved again
+        while the sync was in flight keep their dirty flag.
+        """
+        with self._lock:
+            self._conn.executemany("""
+                UPDATE tickets SET
+                    sheet_row = ?,
+                    dirty = CASE WHEN version = ? THEN 0 ELSE dirty END,
+                    lease_owner = NULL, lease_until = NULL
+                WHERE ticket_id = ?
+            """, [(row, version, tid) for tid, version, row in synced])
+
+    def release(self, ticket_ids):
+        """Drop the lease on rows whose sync failed so they are retried."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE tickets SET lease_owner = NULL, lease_until = NULL WHERE ticket_id = ?",
+                [(tid,) for tid in ticket_ids],
+            )
+
+    def set_sheet_rows(self, row_by_id):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE tickets SET sheet_row = ? WHERE ticket_id = ? AND sheet_row IS NULL",
+                [(row, tid) for tid, row in row_by_id.items()],
+            )
+
+
+# ================================
+# Background Google Sheets Syncer
+# ================================
+_UPDATED_RANGE = re.compile(r"![A-Z]+(\d+)")
+
+
+class SheetSyncer:
+    """
+    Write-behind flusher: groups dirty rows into one `batch_update` for rows
+    already in the sheet and one `append_rows` for new ones.
+    """
+
+    def __init__(self, store, sheet, headers, interval=SYNC_INTERVAL, batch_size=SYNC_BATCH_SIZE):
+        self.store = store
+        self.sheet = sheet
+        self.headers = headers
+        self.interval = interval
+        self.batch_size = batch_size
+        self._last_col = column_letter(len(headers))
+        self._row_index = None
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sheet_handle(self):
+        # Accept either a worksheet or a zero-arg factory returning one
+        return self.sheet() if callable(self.sheet) else self.sheet
+
+    def _load_row_index(self, sheet):
+        # One column read per process instead of one per save
+        telemetry.count("sheets_api_calls", method="col_values")
+        ticket_ids = sheet.col_values(1)
+        self._row_index = {tid: i for i, tid in enumerate(ticket_ids, start=1) if tid}
+
+    def flush(self):
+        """Push every dirty row to Sheets. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self.store.claim_dirty(self.batch_size)
+                if not batch:
+                    return written
+                try:
+                    written += self._flush_batch(batch)
+                except Exception:
+                    self.store.release([b["ticket_id"] for b in batch])
+                    raise
+
+    def _flush_batch(self, batch):
+        sheet = self._sheet_handle()
+        if self._row_index is None:
+            self._load_row_index(sheet)
+            self.store.set_sheet_rows({
+                b["ticket_id"]: self._row_index[b["ticket_id"]]
+                for b in batch if b["ticket_id"] in self._row_index
+            })
+
+        updates, appends = [], []
+        for b in batch:
+            b["sheet_row"] = b["sheet_row"] or self._row_index.get(b["ticket_id"])
+            (updates if b["sheet_row"] else appends).append(b)
+
+        synced = []
+        if updates:
+            telemetry.count("sheets_api_calls", method="batch_update")
+            sheet.batch_update([
+                {
+                    "range": f"A{b['sheet_row']}:{self._last_col}{b['sheet_row']}",
+                    "values": [self._row_values(b["ticket"])],
+                }
+                for b in updates
+            ])
+            synced += [(b["ticket_id"], b["version"], b["sheet_row"]) for b in updates]
+
+        if appends:
+            telemetry.count("sheets_api_calls", method="append_rows")
+            response = sheet.append_rows([self._row_values(b["ticket"]) for b in appends])
+            first_row = self._first_appended_row(response)
+            if not first_row:
+                # Unknown positions: re-read column A before the next flush
+                self._row_index = None
+            for offset, b in enumerate(appends):
+                row = first_row + offset if first_row else None
+                if row and self._row_index is not None:
+                    self._row_index[b["ticket_id"]] = row
+                synced.append((b["ticket_id"], b["version"], row))
+
+        self.store.mark_synced(synced)
+        telemetry.count("sheets_rows_synced", len(synced))
+        return len(synced)
+
+    def _row_values(self, ticket):
+        return [ticket.get(h, "") for h in self.headers]
+
+    @staticmethod
+    def _first_appended_row(response):
+        # e.g. {"updates": {"updatedRange": "Sheet2!A120:Q124", ...}}
+        try:
+            match = _UPDATED_RANGE.search(response["updates"]["updatedRange"])
+            return int(match.group(1)) if match else None
+        except (TypeError, KeyError):
+            return None
+
+    # -------------------------------
+    # Background thread
+    # -------------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sheets-sync", daemon=True)
+        self._thread.start()
+
+    def request_flush(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Sheets sync failed, will retry: {e}")
+
+    def stop(self, flush=True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        if flush:
+            self.flush()
@@ -0,0 +1,333 @@
+# vector_format.py
+import os
+import json
+import mmap
+import time
+import shutil
+import struct
+import hashlib
+import argparse
+import functools
+
+# ================================
+# On-disk KB format (no pickle)
+# ================================
+# faiss_store/
+#   CURRENT       name of the live version directory; build_kb.py writes a
+#                 new version next to it and repoints CURRENT with one
+#                 atomic os.replace (a directory without CURRENT, as built by
+#                 older versions, holds its files directly)
+#   v<ns>/
+#     index.faiss   FAISS index, opened memory-mapped (pages shared between
+#                   processes through the page cache)
+#     chunks.bin    chunk text + metadata, read lazily by docstore ID:
+#
+#     header   magic "KBCHUNKS" | version u16 | flags u16 | count u32 |
+#              ids_len u64 | sha256 of everything after the header
+#     ids      JSON list of docstore IDs, in FAISS position order
+#     offsets  (count + 1) x u64, record boundaries within the records block
+#     records  one UTF-8 JSON object per chunk: {"page_content", "metadata"}
+#     bm25.json     BM25 inverted index (hybrid_retriever.py)
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+LEGACY_FILE = "index.pkl"      # docstore pickled by langchain's FAISS.save_local (older builds)
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2              # superseded versions kept for readers that have not reloaded yet
+FLAT_FILES = (INDEX_FILE, CHUNKS_FILE, "bm25.json", LEGACY_FILE)
+MAGIC = b"KBCHUNKS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sHHIQ32s")
+DOC_CACHE_SIZE = 1024  # decoded chunks kept per process
+
+
+def _documents():
+    from langchain_core.documents import Document
+    return Document
+
+
+def chunk_id(doc):
+    """Content hash used as the docstore ID, so unchanged chunks keep their ID across builds."""
+    source = doc.metadata.get("source", "")
+    return hashlib.sha256(f"{source}\0{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+# ================================
+# Versions
+# ================================
+def current_dir(index_dir):
+    """Directory holding the live index files of `index_dir` (see CURRENT above)."""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return index_dir
+    return os.path.join(index_dir, name)
+
+
+def _versions(index_dir):
+    return sorted(name for name in os.listdir(index_dir)
+                  if name.startswith("v") and os.path.isdir(os.path.join(index_dir, name)))
+
+
+def publish(index_dir, write, flat_files=FLAT_FILES):
+    """
+    Call write(version_dir) to fill a new version directory, then make it
+    live by atomically replacing CURRENT. Readers see either the old or the
+    new version, never a missing or half-written one, and a crash before
+    the replace leaves the old version live. The KEEP_VERSIONS previous
+    versions stay on disk for readers still using them; `flat_files` are
+    the files of the unversioned layout, removed one publish later.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    had_versions = os.path.exists(os.path.join(index_dir, CURRENT_FILE))
+    name = f"v{time.time_ns()}"
+    version_dir = os.path.join(index_dir, name)
+    os.makedirs(version_dir)
+    try:
+        write(version_dir)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    tmp_path = os.path.join(index_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+
+    for old in _versions(index_dir)[:-(KEEP_VERSIONS + 1)]:
+        shutil.rmtree(os.path.join(index_dir, old), ignore_errors=True)  # still mapped on Windows: next time
+    if had_versions:
+        # Files of the flat layout were superseded one publish ago
+        for flat in flat_files:
+            if os.path.exists(os.path.join(index_dir, flat)):
+                os.remove(os.path.join(index_dir, flat))
+    return version_dir
+
+
+# ================================
+# Writer
+# ================================
+def write_chunks(path, ids, docs):
+    """Write `docs` (langchain Documents, aligned with `ids`) as a chunks file."""
+    ids, docs = list(ids), list(docs)
+    if len(ids) != len(docs):
+        raise ValueError("ids and docs must have the same length")
+    ids_block = json.dumps(ids).encode("utf-8")
+    records, offsets = [], [0]
+    for doc in docs:
+        records.append(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                                  ensure_ascii=False, default=str).encode("utf-8"))
+        offsets.append(offsets[-1] + len(records[-1]))
+
+    body = [ids_block, struct.pack(f"<{len(offsets)}Q", *offsets)] + records
+    digest = hashlib.sha256()
+    for part in body:
+        digest.update(part)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(records), len(ids_block), digest.digest()))
+        for part in body:
+            f.write(part)
+
+
+def save(vectorstore, index_dir):
+    """
+    Write any FAISS-like store (langchain FAISS or MmapVectorStore) to
+    `index_dir` as index.faiss + chunks.bin.
+    """
+    import faiss
+
+    os.makedirs(index_dir, exist_ok=True)
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    faiss.write_index(vectorstore.index, os.path.join(index_dir, INDEX_FILE))
+    write_chunks(os.path.join(index_dir, CHUNKS_FILE), ids, [vectorstore.docstore.search(i) for i in ids])
+
+
+def convert_pickle(index_dir, embeddings):
+    """
+    One-time, in-place conversion of an index saved by an older build_kb.py
+    (index.faiss + index.pkl): writes bm25.json and chunks.bin next to the
+    unchanged index.faiss, so nothing is re-embedded. Docstore IDs become
+    chunk_id() content hashes, which the next incremental build_kb.py run
+    matches against its chunks.
+    """
+    from langchain_community.vectorstores import FAISS
+    from hybrid_retriever import BM25_FILE, BM25Index
+
+    legacy = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    ids, docs = [], []
+    for i in range(len(legacy.index_to_docstore_id)):
+        doc = legacy.docstore.search(legacy.index_to_docstore_id[i])
+        doc_id = chunk_id(doc)
+        if doc_id in ids:
+            doc_id = f"{doc_id}-{i}"  # repeated chunk: unmatched, so the next build drops it
+        ids.append(doc_id)
+        docs.append(doc)
+
+    # chunks.bin last: its presence marks the conversion as done
+    suffix = f".{os.getpid()}.tmp"
+    bm25_path = os.path.join(index_dir, BM25_FILE)
+    BM25Index.build(ids, [doc.page_content for doc in docs]).save(bm25_path + suffix)
+    os.replace(bm25_path + suffix, bm25_path)
+    chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+    write_chunks(chunks_path + suffix, ids, docs)
+    os.replace(chunks_path + suffix, chunks_path)
+    return len(ids)
+
+
+# ================================
+# Reader
+# ================================
+class ChunkFile:
+    """
+    Memory-mapped chunks file. Opening it parses only the header and the ID
+    list; each chunk is decoded on first lookup.
+    """
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"❌ {path} is empty. Run build_kb.py to rebuild the index.")
+        if len(self._mm) < _HEADER.size:
+            self.close()
+            raise ValueError(f"❌ {path} is truncated. Run build_kb.py to rebuild the index.")
+
+        magic, version, _, self.count, ids_len, self.checksum = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"❌ {path} is not a KB chunks file.")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"❌ {path} has format version {version}, expected {FORMAT_VERSION}. "
+                             "Run build_kb.py to rebuild the index.")
+
+        self._offsets_at = _HEADER.size + ids_len
+        self._records_at = self._offsets_at + 8 * (self.count + 1)
+        if len(self._mm) < self._records_at or len(self._mm) != self._records_at + self._offset(self.count):
+            self.close()
+            raise ValueError(f"❌ {path} is truncated. Run build_kb.py to rebuild the index.")
+        if verify:
+            self.verify()
+
+        self.ids = json.loads(self._mm[_HEADER.size:self._offsets_at])
+        self.position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.document = functools.lru_cache(maxsize=DOC_CACHE_SIZE)(self._read)
+
+    def _offset(self, i):
+        return struct.unpack_from("<Q", self._mm, self._offsets_at + 8 * i)[0]
+
+    def _read(self, i):
+        start, end = self._offset(i), self._offset(i + 1)
+        record = json.loads(self._mm[self._records_at + start:self._records_at + end])
+        return _documents()(page_content=record["page_content"], metadata=record["metadata"])
+
+    def verify(self):
+        """Recompute the body checksum; raises ValueError if the file was modified or corrupted."""
+        digest = hashlib.sha256()
+        view = memoryview(self._mm)
+        for start in range(_HEADER.size, len(self._mm), 1 << 20):
+            digest.update(view[start:start + (1 << 20)])
+        view.release()
+        if digest.digest() != self.checksum:
+            raise ValueError(f"❌ Checksum mismatch in {self.path}. Run build_kb.py to rebuild the index.")
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+class ChunkDocstore:
+    """Docstore facade over a ChunkFile (same search() contract as langchain's InMemoryDocstore)."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def search(self, search):
+        i = self.chunks.position.get(search)
+        if i is None:
+            return f"ID {search} not found."
+        return self.chunks.document(i)
+
+
+class MmapVectorStore:
+    """
+    Read-only KB vector store over index.faiss + chunks.bin. Exposes what
+    the retrieval code uses from langchain's FAISS (index,
+    index_to_docstore_id, docstore, embeddings, similarity_search) without
+    unpickling anything or reading the whole index into process memory.
+    """
+
+    def __init__(self, index, chunks, embeddings):
+        self.index = index
+        self.chunks = chunks
+        self.index_dir = os.path.dirname(chunks.path)  # the version directory it was loaded from
+        self.docstore = ChunkDocstore(chunks)
+        self.index_to_docstore_id = dict(enumerate(chunks.ids))
+        self.embeddings = embeddings
+
+    @classmethod
+    def load(cls, index_dir, embeddings, verify=False):
+        import faiss
+
+        index_dir = current_dir(index_dir)
+        chunks = ChunkFile(os.path.join(index_dir, CHUNKS_FILE), verify=verify)
+        index_path = os.path.join(index_dir, INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+                                     | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(index_path)  # index type without mmap support
+        if index.ntotal != chunks.count:
+            chunks.close()
+            raise ValueError(f"❌ {index_path} has {index.ntotal} vectors but {CHUNKS_FILE} has "
+                             f"{chunks.count} chunks. Run build_kb.py to rebuild the index.")
+        return cls(index, chunks, embeddings)
+
+    def similarity_search_with_score(self, query, k=4):
+        import numpy as np
+
+        vec = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        scores, positions = self.index.search(vec, min(k, self.index.ntotal))
+        return [(self.chunks.document(int(p)), float(s)) for s, p in zip(scores[0], positions[0]) if p >= 0]
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def to_langchain(self):
+        """Mutable in-memory langchain FAISS copy, for incremental rebuilds in build_kb.py."""
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        docstore = InMemoryDocstore({doc_id: self.chunks.document(i) for i, doc_id in enumerate(self.chunks.ids)})
+        index = faiss.read_index(os.path.join(self.index_dir, INDEX_FILE))
+        return FAISS(self.embeddings, index, docstore, dict(self.index_to_docstore_id))
+
+    def close(self):
+        self.chunks.close()
+
+
+def exists(index_dir):
+    index_dir = current_dir(index_dir)
+    return all(os.path.exists(os.path.join(index_dir, name)) for name in (INDEX_FILE, CHUNKS_FILE))
+
+
+# MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or verify a KB index in the chunks.bin format.")
+    parser.add_argument("index_dir", nargs="?", default="faiss_store")
+    parser.add_argument("--verify", action="store_true", help="Recompute the chunks.bin checksum")
+    args = parser.parse_args()
+
+    chunks = ChunkFile(os.path.join(current_dir(args.index_dir), CHUNKS_FILE), verify=args.verify)
+    size_kb = os.path.getsize(chunks.path) / 1024
+    print(f"✅ {chunks.path}: format v{FORMAT_VERSION}, {chunks.count} chunk(s), {size_kb:.1f} KB"
+          + (", checksum OK" if args.verify else ""))
+    chunks.close()